@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: co-favorite pair counting (recommendations.PairCounter +
+rank_pairs) on synthetic baskets, with the peak memory of each partition
+pass (in-process, no database; the Mongo stream is not measured).
+
+Usage (from backend/):
+    python benchmarks/co_favorites.py --users 300000 --races 20000 --favorites 3000000 --partitions 4
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recommendations import PairCounter, rank_pairs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300000)
+    parser.add_argument("--races", type=int, default=20000)
+    parser.add_argument("--favorites", type=int, default=3000000)
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--max-user-favorites", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Popularity follows a Zipf-like curve, basket sizes a geometric one
+    popularity = 1 / np.arange(1, args.races + 1) ** 0.8
+    popularity /= popularity.sum()
+    sizes = np.minimum(rng.geometric(args.users / args.favorites, args.users), args.max_user_favorites)
+    draws = rng.choice(args.races, int(sizes.sum()), p=popularity)
+    baskets = [np.unique(basket) for basket in np.split(draws, np.cumsum(sizes)[:-1])]
+    followers = np.bincount(np.concatenate(baskets), minlength=args.races).astype(np.float64)
+    print(f"{args.users} users, {int(followers.sum())} favorites, {args.races} races")
+
+    total = time.perf_counter()
+    for partition in range(args.partitions):
+        tracemalloc.start()
+        started = time.perf_counter()
+        counter = PairCounter()
+        for ids in baskets:
+            anchors = ids[ids % args.partitions == partition]
+            if len(ids) < 2 or not len(anchors):
+                continue
+            pairs = anchors[:, None] * args.races + ids
+            counter.add(pairs[anchors[:, None] != ids])
+            if counter.full:
+                counter.reduce()
+        counter.reduce()
+        anchors, _, _, _ = rank_pairs(counter.keys, counter.counts, followers, args.races, 20, 2)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"partition {partition + 1}/{args.partitions}: {len(counter.keys)} pairs, "
+              f"{len(np.unique(anchors))} races ranked, {(time.perf_counter() - started):.1f} s, "
+              f"peak {peak / 1024 / 1024:.0f} MB")
+    print(f"total: {time.perf_counter() - total:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold-start profile of the API.
+
+1. Per-module import cost of `server` (python -X importtime), heaviest first
+2. Time-to-first-byte of GET /api/ for a freshly started uvicorn process
+
+Usage (from backend/):
+    python benchmarks/cold_start.py --top 25 --runs 3
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_profile(top):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    rows = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | <2 spaces per nesting level>package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, raw_name = line.split(":", 1)[1].split("|")
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        name = raw_name.strip()
+        if depth == 0 and name == "server":
+            total_us = int(cumulative_us)
+        elif depth == 1:
+            # Modules imported directly by server.py (the ones a lazy import can defer)
+            rows.append((int(cumulative_us), int(self_us), name))
+    rows.sort(reverse=True)
+    print(f"import server: {total_us / 1000:.1f} ms")
+    for cumulative, self_time, name in rows[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  (self {self_time / 1000:6.1f} ms)  {name}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_byte(timeout=30.0):
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy()
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/", timeout=1) as response:
+                    response.read(1)
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise SystemExit("Server did not answer within the timeout")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    import_profile(args.top)
+    timings = sorted(time_to_first_byte() for _ in range(args.runs))
+    print(f"Time to first byte on /api/ over {args.runs} run(s): "
+          f"best {timings[0]:.0f} ms, median {timings[len(timings) // 2]:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: gazetteer load time, bulk geocoding throughput and department
+assignment from coordinates (gazetteer.Gazetteer.lookup_rows / check_many /
+locate_many, in-process, no network).
+
+Usage (from backend/):
+    python benchmarks/geocode.py --lookups 500000 --distinct 5000 --points 100000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gazetteer import Gazetteer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=500000)
+    parser.add_argument("--distinct", type=int, default=5000, help="distinct (location, department) pairs")
+    parser.add_argument("--points", type=int, default=100000, help="coordinates for locate_many")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    gazetteer = Gazetteer.load()
+    print(f"load: {len(gazetteer)} communes in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rng = random.Random(args.seed)
+    rows = [rng.randrange(len(gazetteer)) for _ in range(args.distinct)]
+    # Free-text variants as typed in imports: case, missing accents, "(74)" suffix
+    pairs = []
+    for row in rows:
+        name = gazetteer.names[row]
+        department = gazetteer.department_names[gazetteer.department[row]]
+        pairs.append(rng.choice([(name, department), (name.upper(), department),
+                                 (f"{name} ({gazetteer.department_codes[gazetteer.department[row]]})", None)]))
+    locations, departments = zip(*(rng.choice(pairs) for _ in range(args.lookups)))
+    latitudes = [45.0] * args.lookups
+    longitudes = [5.0] * args.lookups
+
+    started = time.perf_counter()
+    for location, department in pairs:
+        gazetteer.lookup(location, department)
+    elapsed = time.perf_counter() - started
+    print(f"lookup (uncached): {len(pairs) / elapsed:,.0f} lookups/s")
+
+    started = time.perf_counter()
+    found, _ = gazetteer.lookup_rows(locations, departments)
+    elapsed = time.perf_counter() - started
+    print(f"lookup_rows: {args.lookups / elapsed:,.0f} lookups/s, {(found >= 0).mean():.1%} found")
+
+    started = time.perf_counter()
+    gazetteer.check_many(locations, departments, latitudes, longitudes)
+    elapsed = time.perf_counter() - started
+    print(f"check_many: {args.lookups / elapsed:,.0f} rows/s")
+
+    # Races a few km around random communes, as in a whole-collection backfill
+    origins = [rng.randrange(len(gazetteer)) for _ in range(args.points)]
+    point_lat = [gazetteer.latitude[row] + rng.uniform(-0.05, 0.05) for row in origins]
+    point_lon = [gazetteer.longitude[row] + rng.uniform(-0.05, 0.05) for row in origins]
+    started = time.perf_counter()
+    located = gazetteer.locate_many(point_lat, point_lon)
+    elapsed = time.perf_counter() - started
+    same = (located == gazetteer.department[origins]).mean()
+    print(f"locate_many: {args.points / elapsed:,.0f} points/s, {same:.1%} in the department of their origin commune")
+
+    started = time.perf_counter()
+    for lat, lon in zip(point_lat[:2000], point_lon[:2000]):
+        gazetteer.locate(lat, lon)
+    elapsed = time.perf_counter() - started
+    print(f"locate (one write): {elapsed / min(2000, args.points) * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
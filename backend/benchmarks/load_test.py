@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+In-process load test of the FastAPI app.
+
+Boots `server.app` inside this process (httpx ASGI transport, no network)
+against a throw-away database on a local mongod, or against an in-memory
+motor-compatible stand-in (`--stand-in memory`, needs mongomock-motor).
+Seeds synthetic French races, drives a weighted mix of workloads and writes
+throughput plus p50/p95/p99 per endpoint as JSON, comparable across commits.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --races 10000 --duration 30 --concurrency 20 \\
+        --output bench-$(git rev-parse --short HEAD).json --compare bench-previous.json
+
+Import storm: `--storm 8` keeps 8 admin Excel imports running during the
+measured window. Browse latency should stay flat; compare with a run where
+CONCURRENCY_LIMITS_ENABLED=false to see what load shedding buys:
+    python benchmarks/load_test.py --mix browse=70,detail=30 --storm 8 --output shed.json
+    CONCURRENCY_LIMITS_ENABLED=false python benchmarks/load_test.py --mix browse=70,detail=30 \\
+        --storm 8 --compare shed.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+DEFAULT_MIX = "browse=40,search=15,detail=30,favorite=8,report=2,login=5"
+BENCH_PASSWORD = "bench-password"
+SEARCH_TERMS = ["trail", "ultra", "crêtes", "lacs", "grenoble", "annecy", "raid", "nocturne"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def build_import_workbook(rows: int, seed: int) -> bytes:
+    """An Excel file in the admin import format, filled with synthetic races"""
+    import pandas as pd
+    from synthetic import generate_races
+
+    records = []
+    for race in generate_races(rows, seed=seed + 1):
+        records.append({
+            **{key: race[key] for key in ("name", "description", "location", "region", "department",
+                                          "latitude", "longitude", "distance_km", "elevation_gain", "is_utmb")},
+            **{key: race[key].strftime("%Y-%m-%d") for key in
+               ("race_date", "registration_open_date", "registration_close_date")},
+        })
+    buffer = io.BytesIO()
+    pd.DataFrame(records).to_excel(buffer, sheet_name="Courses", index=False)
+    return buffer.getvalue()
+
+
+class Workloads:
+    def __init__(self, client, race_ids, users, regions, admin_token=None, workbook=None):
+        self.client = client
+        self.race_ids = race_ids
+        self.users = users
+        self.regions = regions
+        self.admin_token = admin_token
+        self.workbook = workbook
+
+    async def browse(self, rng):
+        params = {}
+        if rng.random() < 0.6:
+            params["region"] = rng.choice(self.regions)
+        if rng.random() < 0.4:
+            params["min_distance"] = rng.choice([10, 20, 40])
+            params["max_distance"] = params["min_distance"] + rng.choice([20, 60, 120])
+        if rng.random() < 0.2:
+            params["registration_status"] = "open"
+        return "GET /api/races", await self.client.get("/api/races", params=params)
+
+    async def search(self, rng):
+        return "GET /api/races?search", await self.client.get("/api/races", params={"search": rng.choice(SEARCH_TERMS)})
+
+    async def detail(self, rng):
+        # Zipf-like popularity: a few races get most of the traffic
+        race_id = self.race_ids[min(int(rng.paretovariate(1.2)) - 1, len(self.race_ids) - 1)]
+        return "GET /api/races/{race_id}", await self.client.get(f"/api/races/{race_id}")
+
+    async def favorite(self, rng):
+        user = rng.choice(self.users)
+        race_id = rng.choice(self.race_ids)
+        headers = {"Authorization": f"Bearer {user['token']}"}
+        response = await self.client.post(f"/api/favorites/{race_id}", headers=headers)
+        if response.status_code == 400:  # already a favorite: exercise the delete path instead
+            return "DELETE /api/favorites/{race_id}", await self.client.delete(f"/api/favorites/{race_id}", headers=headers)
+        return "POST /api/favorites/{race_id}", response
+
+    async def report(self, rng):
+        race_id = rng.choice(self.race_ids)
+        return "POST /api/races/{race_id}/report-closed", await self.client.post(
+            f"/api/races/{race_id}/report-closed", json={"reason": "Benchmark"}
+        )
+
+    async def excel_import(self, rng):
+        # Same file every time: the first run imports, later runs parse it and skip existing names
+        files = {"file": ("courses.xlsx", self.workbook,
+                          "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+        return "POST /api/admin/import", await self.client.post(
+            "/api/admin/import", files=files, headers={"Authorization": f"Bearer {self.admin_token}"}
+        )
+
+    async def login(self, rng):
+        user = rng.choice(self.users)
+        return "POST /api/auth/login", await self.client.post(
+            "/api/auth/login", json={"email": user["email"], "password": BENCH_PASSWORD}
+        )
+
+
+async def run_workers(workloads, mix, duration, concurrency, seed, storm=0):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {}
+    errors = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        while time.perf_counter() < deadline:
+            workload = getattr(workloads, rng.choices(names, weights)[0])
+            started = time.perf_counter()
+            try:
+                label, response = await workload(rng)
+                failed = response.status_code >= 500
+            except Exception:
+                label, failed = workload.__name__, True
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            samples.setdefault(label, []).append(elapsed_ms)
+            if failed:
+                errors[label] = errors.get(label, 0) + 1
+
+    async def storm_worker(worker_id):
+        # Outside the mix: imports hammer the server back to back, shed (503) or not
+        rng = random.Random(seed - worker_id - 1)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                label, response = await workloads.excel_import(rng)
+            except Exception:
+                errors["storm"] = errors.get("storm", 0) + 1
+                continue
+            label = f"{label} (storm {response.status_code})"
+            samples.setdefault(label, []).append((time.perf_counter() - started) * 1000)
+            if response.status_code == 503:
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)) / 10)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)], *[storm_worker(i) for i in range(storm)])
+    return samples, errors, time.perf_counter() - started
+
+
+def summarize(samples, errors, elapsed):
+    endpoints = {}
+    all_latencies = []
+    for label, values in sorted(samples.items()):
+        values.sort()
+        all_latencies.extend(values)
+        endpoints[label] = {
+            "count": len(values),
+            "errors": errors.get(label, 0),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values), 2),
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+        }
+    all_latencies.sort()
+    total = {
+        "count": len(all_latencies),
+        "errors": sum(errors.values()),
+        "throughput_rps": round(len(all_latencies) / elapsed, 2),
+        "p50_ms": round(percentile(all_latencies, 0.50) or 0, 2),
+        "p95_ms": round(percentile(all_latencies, 0.95) or 0, 2),
+        "p99_ms": round(percentile(all_latencies, 0.99) or 0, 2),
+    }
+    return endpoints, total
+
+
+def print_report(result, previous=None):
+    print(f"\n{'endpoint':<42}{'count':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for label, stats in rows:
+        line = (f"{label:<42}{stats['count']:>8}{stats['throughput_rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['errors']:>6}")
+        if previous:
+            before = previous["endpoints"].get(label) if label != "TOTAL" else previous.get("total")
+            if before and before.get("p95_ms"):
+                delta = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+                line += f"   p95 {delta:+.1f}% vs {previous['meta'].get('commit')}"
+        print(line)
+
+
+async def main_async(args):
+    db_name = f"ttd_bench_{uuid.uuid4().hex[:8]}"
+    os.environ["DB_NAME"] = db_name
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+
+    import httpx
+    import server
+    from synthetic import load_departments, seed_races
+
+    if args.stand_in == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.read_db = server.client[db_name]
+
+    db = server.db
+    print(f"Seeding {args.races} races into {db_name}...")
+    seed_started = time.perf_counter()
+    race_ids = await seed_races(db, args.races, seed=args.seed)
+    print(f"Seeded in {time.perf_counter() - seed_started:.1f}s")
+
+    password_hash = server.hash_password(BENCH_PASSWORD)
+    users = []
+    for index in range(args.users):
+        user_id = str(uuid.uuid4())
+        users.append({
+            "id": user_id, "email": f"bench{index}@example.com", "password": password_hash,
+            "name": f"Bench {index}", "role": server.UserRole.USER, "email_notifications": False,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    admin_id = str(uuid.uuid4())
+    await db.users.insert_many([dict(user) for user in users] + [{
+        "id": admin_id, "email": "bench-admin@example.com", "password": password_hash, "name": "Bench admin",
+        "role": server.UserRole.ADMIN, "email_notifications": False, "created_at": datetime.now(timezone.utc).isoformat(),
+    }])
+    for user in users:
+        user["token"] = server.create_token(user["id"], server.UserRole.USER)
+    admin_token = server.create_token(admin_id, server.UserRole.ADMIN)
+    needs_workbook = args.storm or "excel_import" in parse_mix(args.mix)
+    workbook = build_import_workbook(args.import_rows, args.seed) if needs_workbook else None
+
+    regions = sorted({department["region"] for department in load_departments()})
+    await server.app.router.startup()
+    if args.stand_in != "memory":
+        await server.reconcile_indexes(db)
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            workloads = Workloads(client, race_ids, users, regions, admin_token, workbook)
+            if args.warmup:
+                await run_workers(workloads, parse_mix(args.mix), args.warmup, args.concurrency, args.seed)
+            samples, errors, elapsed = await run_workers(
+                workloads, parse_mix(args.mix), args.duration, args.concurrency, args.seed, args.storm
+            )
+    finally:
+        await server.app.router.shutdown()
+        if not args.keep:
+            await server.client.drop_database(db_name)
+
+    endpoints, total = summarize(samples, errors, elapsed)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "races": args.races,
+            "users": args.users,
+            "duration_s": round(elapsed, 2),
+            "concurrency": args.concurrency,
+            "mix": parse_mix(args.mix),
+            "storm": args.storm,
+            "concurrency_limits": os.environ.get("CONCURRENCY_LIMITS_ENABLED", "true"),
+            "stand_in": args.stand_in,
+            "python": platform.python_version(),
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Workload weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--storm", type=int, default=0, help="Concurrent admin imports running during the test")
+    parser.add_argument("--import-rows", type=int, default=300, help="Rows in the imported workbook")
+    parser.add_argument("--mongo-url", default=None, help="Defaults to MONGO_URL or mongodb://localhost:27017")
+    parser.add_argument("--stand-in", choices=["mongod", "memory"], default="mongod")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--compare", help="Previous JSON result to compare p95 against")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    previous = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, previous)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
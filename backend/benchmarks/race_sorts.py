@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /api/races?sort=... on a large collection.
+
+Seeds synthetic races into a throw-away database on a local mongod, fills
+the stored sort keys with the startup backfill, reconciles the indexes,
+then for every sort (alone, with upcoming_only and with a region filter):
+- prints the winning plan, flagging blocking SORT stages and collection scans;
+- times the endpoint in-process (httpx ASGI transport, no network).
+
+Usage (from backend/):
+    python benchmarks/race_sorts.py --races 100000 --rounds 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Proximity origin: Grenoble
+ORIGIN = {"lat": 45.1885, "lon": 5.7245}
+VARIANTS = {
+    "all": {},
+    "upcoming": {"upcoming_only": "true"},
+    "region": {"region": "Auvergne-Rhône-Alpes"},
+}
+
+
+async def explain(server, sort: str, params: dict) -> dict:
+    """Winning plan of the query get_races runs for these parameters"""
+    query = {"status": server.RaceStatus.APPROVED}
+    if "region" in params:
+        query["region_code"] = server.get_gazetteer().region_of(params["region"])
+    if params.get("upcoming_only"):
+        query["race_date"] = {"$gte": server.datetime.now(server.timezone.utc)}
+    if sort == "proximity":
+        pipeline = [{"$geoNear": {
+            "near": {"type": "Point", "coordinates": [ORIGIN["lon"], ORIGIN["lat"]]}, "key": "location_point",
+            "query": query, "distanceField": "proximity_km", "spherical": True,
+        }}, {"$limit": 500}]
+        plan = await server.db.command("aggregate", "races", pipeline=pipeline, explain=True)
+    else:
+        plan = await server.db.command(
+            "explain", {"find": "races", "filter": query, "sort": dict(server.RACE_SORTS[sort]), "limit": 500},
+            verbosity="queryPlanner",
+        )
+    return server.summarize_explain(plan)
+
+
+async def main_async(args):
+    db_name = f"ttd_bench_{uuid.uuid4().hex[:8]}"
+    os.environ["DB_NAME"] = db_name
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+
+    import httpx
+    import server
+    from synthetic import seed_races
+
+    db = server.db
+    print(f"Seeding {args.races} races into {db_name}...")
+    await seed_races(db, args.races, seed=args.seed)
+    started = time.perf_counter()
+    await server.backfill_race_sort_keys()
+    await server.backfill_race_regions()
+    print(f"Sort keys and region codes backfilled in {time.perf_counter() - started:.1f}s")
+    await server.reconcile_indexes(db)
+
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"\n{'sort':<12}{'filter':<10}{'p50 ms':>9}{'p95 ms':>9}  plan")
+            for sort in [*server.RACE_SORTS, "proximity"]:
+                for variant, params in VARIANTS.items():
+                    params = {**params, "sort": sort, **(ORIGIN if sort == "proximity" else {})}
+                    durations = []
+                    for _ in range(args.rounds):
+                        server.response_cache.clear()
+                        started = time.perf_counter()
+                        response = await client.get("/api/races", params=params)
+                        durations.append((time.perf_counter() - started) * 1000)
+                        response.raise_for_status()
+                    durations.sort()
+                    plan = await explain(server, sort, params)
+                    flags = " BLOCKING SORT" if "SORT" in plan["stages"].split(" <- ") else ""
+                    flags += " COLLSCAN" if plan["collection_scan"] else ""
+                    print(f"{sort:<12}{variant:<10}{statistics.median(durations):>9.1f}"
+                          f"{durations[int(0.95 * (len(durations) - 1))]:>9.1f}  "
+                          f"{', '.join(plan['indexes']) or plan['stages']}{flags}")
+    finally:
+        if not args.keep:
+            await server.client.drop_database(db_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=20, help="Requests per sort and filter")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=None, help="Defaults to MONGO_URL or mongodb://localhost:27017")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /api/races/batch vs N sequential GET /api/races/{id}
+
+Usage:
+    REACT_APP_BACKEND_URL=http://localhost:8001 python benchmarks/races_batch.py --count 50 --rounds 5
+"""
+import argparse
+import os
+import statistics
+import time
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
+
+
+def sequential(session, race_ids):
+    for race_id in race_ids:
+        response = session.get(f"{BASE_URL}/api/races/{race_id}")
+        response.raise_for_status()
+
+
+def batched(session, race_ids):
+    response = session.get(f"{BASE_URL}/api/races/batch", params={"ids": ",".join(race_ids)})
+    response.raise_for_status()
+    assert [item['id'] for item in response.json()] == race_ids
+
+
+def timed(fn, session, race_ids, rounds):
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(session, race_ids)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=50, help="Number of race ids per lookup")
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    races = session.get(f"{BASE_URL}/api/races").json()
+    race_ids = [race['id'] for race in races][:args.count]
+    if not race_ids:
+        raise SystemExit("No races available - seed the database first (POST /api/seed)")
+
+    print(f"{len(race_ids)} races, {args.rounds} rounds against {BASE_URL}")
+    for label, fn in (("sequential", sequential), ("batch", batched)):
+        durations = timed(fn, session, race_ids, args.rounds)
+        print(f"{label:>10}: median {statistics.median(durations):8.1f} ms   "
+              f"min {min(durations):8.1f} ms   max {max(durations):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark: similarity.RaceFeatureIndex build, incremental update and top-k
+query latency on synthetic races (in-process, no database).
+
+Usage (from backend/):
+    python benchmarks/similar_races.py --races 100000 --queries 2000 --k 6
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from similarity import RaceFeatureIndex  # noqa: E402
+from synthetic import generate_races  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    races = list(generate_races(args.races, seed=args.seed))
+    index = RaceFeatureIndex()
+    started = time.perf_counter()
+    index.build(races)
+    print(f"build: {len(index)} races in {(time.perf_counter() - started) * 1000:.0f} ms, "
+          f"matrix {index.matrix.nbytes / 1024 / 1024:.1f} MB")
+
+    rng = random.Random(args.seed)
+    updated = rng.sample(races, min(1000, len(races)))
+    started = time.perf_counter()
+    for race in updated:
+        index.upsert({**race, "distance_km": race["distance_km"] * 1.1})
+    print(f"upsert: {(time.perf_counter() - started) * 1e6 / len(updated):.1f} us/race")
+
+    for registration_open in (False, True):
+        durations = []
+        for _ in range(args.queries):
+            race_id = rng.choice(races)["id"]
+            started = time.perf_counter()
+            index.query(race_id, k=args.k, registration_open=registration_open)
+            durations.append((time.perf_counter() - started) * 1000)
+        print(f"query (registration_open={registration_open}): "
+              f"mean {statistics.mean(durations):.2f} ms, p50 {percentile(durations, 0.5):.2f} ms, "
+              f"p99 {percentile(durations, 0.99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
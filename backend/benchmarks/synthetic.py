@@ -0,0 +1,104 @@
+"""
+Synthetic French trail races for benchmarks.
+
+Races are spread over the departments of data/departements.csv, weighted
+towards mountain departments, with coordinates scattered around each
+prefecture, a realistic mix of distances (short trails dominate) and dates
+over the coming year with a summer peak.
+"""
+import csv
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# Departments with a dense trail calendar (Alps, Pyrenees, Massif central, Corsica...)
+MOUNTAIN_DEPARTMENTS = {
+    "04", "05", "06", "09", "15", "2A", "2B", "25", "26", "38", "39", "43", "48",
+    "63", "64", "65", "66", "73", "74", "88", "68", "12", "07", "01",
+}
+NAME_PATTERNS = [
+    "Trail de {town}", "Ultra Trail de {town}", "Trail des {word} de {town}", "Grand Raid de {town}",
+    "Skyrace de {town}", "Trail nocturne de {town}", "Course des {word}", "Tour des {word}",
+]
+WORDS = [
+    "Crêtes", "Cimes", "Lacs", "Gorges", "Sangliers", "Chamois", "Vignes", "Falaises", "Forts",
+    "Balcons", "Sources", "Volcans", "Glaciers", "Châteaux", "Bruyères", "Aiguilles", "Calanques",
+]
+# (min km, max km, weight)
+DISTANCE_CLASSES = [(8, 25, 45), (25, 50, 30), (50, 100, 17), (100, 180, 8)]
+# Relative number of races per month, peaking in summer
+MONTH_WEIGHTS = [2, 3, 5, 8, 10, 12, 13, 12, 11, 10, 6, 3]
+
+
+def load_departments():
+    with open(DATA_DIR / "departements.csv", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    for row in rows:
+        row["latitude"] = float(row["latitude"])
+        row["longitude"] = float(row["longitude"])
+        row["weight"] = 4 if row["code"] in MOUNTAIN_DEPARTMENTS else 1
+    return rows
+
+
+def generate_races(count: int, seed: int = 42, status: str = "approved"):
+    rng = random.Random(seed)
+    departments = load_departments()
+    department_weights = [department["weight"] for department in departments]
+    distance_weights = [weight for _, _, weight in DISTANCE_CLASSES]
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    created_at = datetime.now(timezone.utc)
+
+    for index in range(count):
+        department = rng.choices(departments, department_weights)[0]
+        low, high, _ = rng.choices(DISTANCE_CLASSES, distance_weights)[0]
+        distance = round(rng.uniform(low, high), 1)
+        mountain = department["code"] in MOUNTAIN_DEPARTMENTS
+        elevation = int(distance * rng.uniform(35, 75) if mountain else distance * rng.uniform(8, 30))
+
+        month = rng.choices(range(1, 13), MONTH_WEIGHTS)[0]
+        race_date = today.replace(month=month, day=rng.randint(1, 28))
+        if race_date < today:
+            race_date = race_date.replace(year=today.year + 1)
+        open_date = race_date - timedelta(days=rng.randint(60, 240))
+
+        town = department["prefecture"]
+        name = rng.choice(NAME_PATTERNS).format(town=town, word=rng.choice(WORDS))
+        yield {
+            "id": str(uuid.uuid4()),
+            "name": f"{name} #{index}",
+            "description": f"Trail de {distance} km et {elevation} m D+ en {department['name']}.",
+            "location": town,
+            "region": department["region"],
+            "department": department["name"],
+            "latitude": round(department["latitude"] + rng.gauss(0, 0.25), 5),
+            "longitude": round(department["longitude"] + rng.gauss(0, 0.3), 5),
+            "distance_km": distance,
+            "elevation_gain": elevation,
+            "race_date": race_date,
+            "registration_open_date": open_date,
+            "registration_close_date": race_date - timedelta(days=rng.randint(3, 30)),
+            "is_utmb": rng.random() < 0.03,
+            "website_url": None,
+            "image_url": None,
+            "status": status,
+            "submitted_by": None,
+            "favorite_count": 0,
+            "created_at": created_at,
+        }
+
+
+async def seed_races(db, count: int, seed: int = 42, batch_size: int = 10000) -> list:
+    """Insert `count` synthetic races and return their ids"""
+    ids, batch = [], []
+    for race in generate_races(count, seed):
+        ids.append(race["id"])
+        batch.append(race)
+        if len(batch) >= batch_size:
+            await db.races.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.races.insert_many(batch, ordered=False)
+    return ids
@@ -0,0 +1,369 @@
+"""
+In-process caching helpers for hot read paths.
+
+SingleFlightCache combines:
+- single-flight: concurrent lookups of the same key share one loader call
+- TTL + stale-while-revalidate: fresh entries are served directly, stale ones
+  are served immediately while a single background refresh runs
+- per-key hit metrics to spot hot keys (e.g. a big race opening registration)
+
+ResponseCache / ResponseCacheMiddleware cache whole anonymous GET responses
+(gzip-compressed, byte-bounded LRU, tag invalidation, stale-while-revalidate).
+"""
+import asyncio
+import gzip
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightCache:
+    def __init__(self, ttl: float = 30, stale_ttl: float = 300, max_entries: int = 5000, max_tracked_keys: int = 1000):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_tracked_keys = max_tracked_keys
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Invalidation stamps from a shared clock, bounded like the entries: a pruned key reads
+        # as invalidated at the newest pruned stamp, so pruning can only drop fills, never keep stale ones
+        self._generations: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._clock = 0
+        self._pruned_generation = 0
+        self._epoch = 0  # bumped by clear()
+        self._key_stats: Dict[Hashable, Dict[str, int]] = {}
+        self.totals = {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self._record(key, "hits")
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self._record(key, "stale")
+                self._refresh(key, loader)
+                return value
+
+        if key in self._inflight:
+            self._record(key, "coalesced")
+        else:
+            self._record(key, "misses")
+        return await asyncio.shield(self._refresh(key, loader))
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (fresh or stale) without loading or counting a hit"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else default
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since the cached value was loaded (None when absent)"""
+        entry = self._entries.get(key)
+        return time.monotonic() - entry[1] if entry is not None else None
+
+    def generation(self, key: Hashable) -> tuple:
+        """Token for set(): changes whenever the key is invalidated or the cache cleared"""
+        return self._epoch, self._generations.get(key, self._pruned_generation)
+
+    def set(self, key: Hashable, value: Any, generation: Optional[tuple] = None):
+        """Store a value; dropped when `generation` was read before an invalidation of the key"""
+        if generation is not None and generation != self.generation(key):
+            return
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        for key in keys:
+            self._entries.pop(key, None)
+            # A load started before the invalidation must not repopulate the cache
+            self._clock += 1
+            self._generations[key] = self._clock
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                self._pruned_generation = self._generations.popitem(last=False)[1]
+            self._inflight.pop(key, None)
+            self.totals["invalidations"] += 1
+
+    def clear(self):
+        self._epoch += 1
+        self._entries.clear()
+        self._inflight.clear()
+        self.totals["invalidations"] += 1
+
+    def hot_keys(self, limit: int = 20) -> List[dict]:
+        ranked = sorted(
+            self._key_stats.items(),
+            key=lambda item: item[1]["hits"] + item[1]["stale"] + item[1]["coalesced"],
+            reverse=True
+        )
+        return [{"key": key, **stats} for key, stats in ranked[:limit]]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "inflight": len(self._inflight), **self.totals}
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, self.generation(key)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: tuple) -> Any:
+        value = await loader()
+        self.set(key, value, generation)
+        return value
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Cache load failed for {key!r}: {task.exception()}")
+
+    def _record(self, key: Hashable, kind: str):
+        self.totals[kind] += 1
+        stats = self._key_stats.get(key)
+        if stats is None:
+            if len(self._key_stats) >= self.max_tracked_keys:
+                # Forget the coldest tracked key to keep metrics bounded
+                coldest = min(self._key_stats, key=lambda k: sum(self._key_stats[k].values()))
+                del self._key_stats[coldest]
+            stats = self._key_stats[key] = {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0}
+        stats[kind] += 1
+
+
+class ResponseCache:
+    """Byte-bounded LRU of gzip-compressed HTTP responses with tag invalidation"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_invalidated_tags: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_invalidated_tags = max_invalidated_tags
+        self.size = 0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        # Invalidation clock: fills read it before rendering and set() drops them when one of
+        # their tags (or the whole cache) was invalidated since. Stamps are bounded (oldest pruned
+        # first); a pruned tag reads as invalidated at the newest pruned stamp.
+        self.generation = 0
+        self._invalidated_at: "OrderedDict[str, int]" = OrderedDict()
+        self._pruned_at = 0
+        self._cleared_at = 0
+        self.totals = {
+            "hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0, "stale_on_error": 0,
+        }
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def lookup(self, key: str):
+        """get() counting the hit or miss, for callers serving entries themselves"""
+        entry = self.get(key)
+        self.totals["hits" if entry is not None else "misses"] += 1
+        return entry
+
+    def is_current(self, tags, generation: int) -> bool:
+        """No invalidation of these tags (nor clear()) since `generation` was read"""
+        return self._cleared_at <= generation and all(
+            self._invalidated_at.get(tag, self._pruned_at) <= generation for tag in tags
+        )
+
+    def set(self, key: str, entry: dict, generation: int):
+        if not self.is_current(entry["tags"], generation) or len(entry["body"]) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = entry
+        self.size += len(entry["body"])
+        for tag in entry["tags"]:
+            self._tags.setdefault(tag, set()).add(key)
+        while self.size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.totals["evictions"] += 1
+
+    def invalidate_tags(self, *tags: str):
+        self.generation += 1
+        self.totals["invalidations"] += 1
+        for tag in tags:
+            self._invalidated_at[tag] = self.generation
+            self._invalidated_at.move_to_end(tag)
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+        while len(self._invalidated_at) > self.max_invalidated_tags:
+            self._pruned_at = self._invalidated_at.popitem(last=False)[1]
+
+    def clear(self):
+        self.generation += 1
+        self._cleared_at = self.generation
+        self._invalidated_at.clear()
+        self._pruned_at = 0
+        self._entries.clear()
+        self._tags.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes, **self.totals}
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry["body"])
+        for tag in entry["tags"]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class ResponseCacheMiddleware:
+    """Caches anonymous GET responses of selected routes (pure ASGI).
+
+    `routes` maps a path to {"ttl": seconds, "stale": seconds, "tags": [...]}.
+    Keys are the path plus the sorted, non-empty query parameters. Fresh
+    entries are served directly, stale ones are served while a single
+    background request refreshes them. Cache-Control lets a CDN do the same.
+    When a refresh fails (5xx, e.g. database down) the last good entry is
+    served instead, flagged with X-Data-Stale (its age in seconds).
+    """
+
+    def __init__(self, app, cache: ResponseCache, routes: Dict[str, dict]):
+        self.app = app
+        self.cache = cache
+        self.routes = routes
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def cache_key(scope) -> str:
+        params = sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        return scope["path"] + ("?" + urlencode(params) if params else "")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        if b"authorization" in headers:
+            await self.app(scope, receive, send)
+            return
+
+        config = self.routes[scope["path"]]
+        key = self.cache_key(scope)
+        accepts_gzip = b"gzip" in headers.get(b"accept-encoding", b"")
+        entry = self.cache.get(key)
+        now = time.monotonic()
+
+        if entry is not None:
+            age = now - entry["stored_at"]
+            if age < config["ttl"]:
+                self.cache.totals["hits"] += 1
+                await self._send(scope, send, entry, config, accepts_gzip, "HIT", age)
+                return
+            if age < config["ttl"] + config["stale"]:
+                self.cache.totals["stale"] += 1
+                self._fill(key, scope, config)
+                await self._send(scope, send, entry, config, accepts_gzip, "STALE", age)
+                return
+
+        # Past the stale window, but still the last known good response
+        last_good = entry
+        if key in self._inflight:
+            self.cache.totals["coalesced"] += 1
+        else:
+            self.cache.totals["misses"] += 1
+        try:
+            entry = await asyncio.shield(self._fill(key, scope, config))
+        except Exception:
+            if last_good is None:
+                raise
+            entry = None
+        if last_good is not None and (entry is None or entry["status"] >= 500):
+            self.cache.totals["stale_on_error"] += 1
+            await self._send(scope, send, last_good, config, accepts_gzip, "STALE-ERROR", now - last_good["stored_at"])
+            return
+        await self._send(scope, send, entry, config, accepts_gzip, "MISS", 0)
+
+    def _fill(self, key: str, scope, config) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(key, scope, config))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._on_done(key, done))
+        return future
+
+    def _on_done(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Response cache fill failed for {key}: {future.exception()}")
+
+    async def _render(self, key: str, scope, config) -> dict:
+        generation = self.cache.generation
+        status = {}
+        chunks = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["headers"] = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in (b"content-length", b"content-encoding")
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        inner_scope = dict(scope)
+        inner_scope["headers"] = [(name, value) for name, value in scope.get("headers", []) if name != b"accept-encoding"]
+        await self.app(inner_scope, receive, capture)
+        entry = {
+            "status": status.get("code", 500),
+            "body": gzip.compress(b"".join(chunks), compresslevel=6),
+            "headers": status.get("headers", []),
+            "tags": tuple(config.get("tags", ())),
+            "stored_at": time.monotonic(),
+            # Set by the router on the copied scope; handed back to the outer middlewares (metrics)
+            "route": inner_scope.get("route"),
+            "endpoint": inner_scope.get("endpoint"),
+        }
+        # Only successful responses are kept; errors are just shared with coalesced waiters
+        if entry["status"] == 200:
+            self.cache.set(key, entry, generation)
+        return entry
+
+    async def _send(self, scope, send, entry: dict, config: dict, accepts_gzip: bool, state: str, age: float):
+        for name in ("route", "endpoint"):
+            if entry.get(name) is not None:
+                scope[name] = entry[name]
+        body = entry["body"] if accepts_gzip else gzip.decompress(entry["body"])
+        headers = list(entry["headers"]) + [
+            (b"content-length", str(len(body)).encode()),
+            (b"vary", b"Accept-Encoding"),
+            (b"x-cache", state.encode()),
+        ]
+        if state == "STALE-ERROR":
+            headers += [(b"cache-control", b"no-cache"), (b"x-data-stale", str(int(age)).encode())]
+        elif entry["status"] == 200:
+            cache_control = f"public, max-age={int(config['ttl'])}, stale-while-revalidate={int(config['stale'])}"
+            headers += [(b"cache-control", cache_control.encode()), (b"age", str(int(age)).encode())]
+        if accepts_gzip:
+            headers.append((b"content-encoding", b"gzip"))
+        await send({"type": "http.response.start", "status": entry["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
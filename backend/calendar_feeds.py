@@ -0,0 +1,141 @@
+"""
+iCalendar (RFC 5545) feeds of races.
+
+Calendar apps poll their subscriptions every few minutes, so a feed is
+assembled from pieces that outlive a request:
+- race_to_ics() serializes one race into its VEVENT blocks (race day, and
+  the registration opening when known) once; the server keeps the bytes
+  per race until that race changes;
+- build_calendar() only concatenates the header, the cached blocks and the
+  footer, and feed_etag() gives the result a strong ETag so an unchanged
+  feed costs clients a 304.
+
+Blocks only depend on the race itself (no "today", no user), which is what
+makes them reusable across feeds and identical between rebuilds.
+"""
+import hashlib
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Optional
+
+PRODID = "-//Trouve Ton Dossard//Courses trail//FR"
+UID_DOMAIN = "trouvetondossard.fr"
+REFRESH_INTERVAL = "PT1H"  # polling hint for the clients that honour it
+LINE_OCTETS = 75
+# DTSTAMP of races without a usable created_at (must stay stable for the ETag)
+DEFAULT_STAMP = "20250101T000000Z"
+
+
+def escape_text(value) -> str:
+    """TEXT value escaping: backslash, semicolon, comma and newlines"""
+    text = str(value or "")
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n"))
+
+
+def fold(line: str) -> bytes:
+    """One content line, folded at 75 octets without splitting a UTF-8 character"""
+    data = line.encode("utf-8")
+    if len(data) <= LINE_OCTETS:
+        return data + b"\r\n"
+    chunks = []
+    start, limit = 0, LINE_OCTETS
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Continuation bytes are 0b10xxxxxx: back off to the start of the character
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(data[start:end])
+        start, limit = end, LINE_OCTETS - 1  # continuation lines start with a space
+    return b"\r\n ".join(chunks) + b"\r\n"
+
+
+def _day(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _stamp(value) -> str:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return DEFAULT_STAMP
+    if not isinstance(value, datetime):
+        return DEFAULT_STAMP
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _all_day(uid: str, stamp: str, day: date, summary: str, details: List[str]) -> List[str]:
+    following = date.fromordinal(day.toordinal() + 1)
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{following:%Y%m%d}",
+        f"SUMMARY:{escape_text(summary)}",
+        *details,
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    ]
+
+
+def race_to_ics(race: dict, site_url: str) -> bytes:
+    """Serialized VEVENT blocks of a race (empty when it has no usable race date)"""
+    race_day = _day(race.get('race_date'))
+    if race_day is None:
+        return b""
+    url = f"{site_url.rstrip('/')}/races/{race['id']}"
+    stamp = _stamp(race.get('created_at'))
+    location = ", ".join(part for part in (race.get('location'), race.get('department')) if part)
+
+    facts = []
+    if race.get('distance_km') is not None:
+        facts.append(f"{race['distance_km']:g} km")
+    if race.get('elevation_gain'):
+        facts.append(f"{race['elevation_gain']} m D+")
+    if race.get('is_utmb'):
+        facts.append("UTMB Index")
+    details = [f"LOCATION:{escape_text(location)}"] if location else []
+    if race.get('latitude') is not None and race.get('longitude') is not None:
+        details.append(f"GEO:{float(race['latitude']):.6f};{float(race['longitude']):.6f}")
+    description = "\n".join(part for part in (" · ".join(facts), url) if part)
+    details += [f"DESCRIPTION:{escape_text(description)}", f"URL:{url}"]
+
+    lines = _all_day(f"{race['id']}@{UID_DOMAIN}", stamp, race_day, race.get('name', ''), details)
+    open_day = _day(race.get('registration_open_date'))
+    if open_day is not None and open_day <= race_day:
+        lines += _all_day(
+            f"{race['id']}-inscriptions@{UID_DOMAIN}", stamp, open_day,
+            f"Ouverture des inscriptions : {race.get('name', '')}", [f"URL:{url}"],
+        )
+    return b"".join(fold(line) for line in lines)
+
+
+def build_calendar(name: str, blocks: Iterable[bytes]) -> bytes:
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+        "X-WR-TIMEZONE:Europe/Paris",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}",
+        f"X-PUBLISHED-TTL:{REFRESH_INTERVAL}",
+    ]
+    return b"".join([*(fold(line) for line in header), *blocks, fold("END:VCALENDAR")])
+
+
+def feed_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
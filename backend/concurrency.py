@@ -0,0 +1,143 @@
+"""
+Per-route-class concurrency limits and load shedding.
+
+Expensive routes (Excel import, bcrypt auth, uncached race listings) each
+get a ConcurrencyLimiter: at most `limit` requests run at once, up to
+`max_queue` more wait (FIFO, at most `queue_timeout` seconds), anything
+beyond is rejected immediately with 503 + Retry-After. Routes without a
+class (race details, cache hits, facets...) are never queued, which keeps
+cheap reads fast while an expensive class is saturated.
+
+ConcurrencyLimitMiddleware is pure ASGI and matches on (method, path); add
+it inside ResponseCacheMiddleware so cached responses bypass the limits.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Dict, Tuple
+
+from metrics import registry
+
+limit_in_flight = registry.gauge(
+    "concurrency_limit_in_flight", "Requests running per route class", ("route_class",))
+limit_queue_depth = registry.gauge(
+    "concurrency_limit_queue_depth", "Requests waiting for a slot per route class", ("route_class",))
+limit_rejections = registry.counter(
+    "concurrency_limit_rejections_total", "Requests shed with 503 per route class", ("route_class", "reason"))
+
+
+class Overloaded(Exception):
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"{route_class} overloaded ({reason})")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    def __init__(self, name: str, limit: int, max_queue: int = 0, queue_timeout: float = 5.0, retry_after: int = 5):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self.totals = {"admitted": 0, "queued": 0, "queue_full": 0, "timeout": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.in_flight < self.limit and not self._waiters:
+            self._admit()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.totals["queued"] += 1
+        limit_queue_depth.set(self.name, value=len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just as we gave up
+            else:
+                future.cancel()
+                self._remove_waiter(future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("timeout")
+        # release() transferred its slot to us: in_flight is unchanged
+        self.totals["admitted"] += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            limit_queue_depth.set(self.name, value=len(self._waiters))
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        limit_in_flight.set(self.name, value=self.in_flight)
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "queue_depth": self.queue_depth,
+                "max_queue": self.max_queue, **self.totals}
+
+    def _admit(self):
+        self.in_flight += 1
+        self.totals["admitted"] += 1
+        limit_in_flight.set(self.name, value=self.in_flight)
+
+    def _remove_waiter(self, future: asyncio.Future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+        limit_queue_depth.set(self.name, value=len(self._waiters))
+
+    def _reject(self, reason: str):
+        self.totals[reason] += 1
+        limit_rejections.inc(self.name, reason)
+        raise Overloaded(self.name, reason, self.retry_after)
+
+
+class ConcurrencyLimitMiddleware:
+    """`routes` maps (method, path) to the name of a limiter in `limiters`"""
+
+    def __init__(self, app, limiters: Dict[str, ConcurrencyLimiter], routes: Dict[Tuple[str, str], str]):
+        self.app = app
+        self.limiters = limiters
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        route_class = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        limiter = self.limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            await self._send_overloaded(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _send_overloaded(send, error: Overloaded):
+        body = json.dumps({"detail": "Serveur surchargé, réessayez dans quelques instants"}).encode()
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(error.retry_after).encode()),
+            (b"x-shed-reason", f"{error.route_class}:{error.reason}".encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,177 @@
+"""
+Fuzzy duplicate-race detection.
+
+Names are normalized (accents, case, punctuation, years, "12e édition",
+French stop-words) so "Trail des Calanques 2025" and "trail  des
+calanques" compare equal. Candidates are blocked by geohash cell (the
+race's cell and its 8 neighbours, ~15 km around at precision 5) and by a
+race date window, then scored with the Dice coefficient of character
+trigrams. Races whose distances differ by more than `distance_tolerance`,
+or whose names carry different numbers once years are stripped ("Trail
+des Calanques 25" / "... 50"), are different formats of the same event,
+not duplicates.
+
+DuplicateIndex serves both uses: inline (find() for one race against the
+candidates loaded from Mongo through the races.geohash index) and batch
+(find_duplicate_pairs() over a whole import or the whole collection, each
+race compared only with its block, never O(n²)).
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+GEOHASH_PRECISION = 5  # cells of about 4.9 x 4.9 km
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+STOP_WORDS = {
+    "le", "la", "les", "l", "de", "du", "des", "d", "et", "en", "au", "aux", "a", "sur", "the", "of",
+    "edition", "ed",
+}
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+EDITION_RE = re.compile(r"\b\d+\s*(?:e|eme|er|ere|th|st|nd|rd)?\s+edition\b")
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name: str) -> str:
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().lower()
+    text = NON_ALNUM_RE.sub(" ", text)
+    text = EDITION_RE.sub(" ", text)
+    text = YEAR_RE.sub(" ", text)
+    return " ".join(token for token in text.split() if token not in STOP_WORDS)
+
+
+def numbers(normalized: str) -> frozenset:
+    return frozenset(token for token in normalized.split() if token.isdigit())
+
+
+def trigrams(normalized: str) -> frozenset:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def name_similarity(a: frozenset, b: frozenset) -> float:
+    """Dice coefficient of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def neighbour_cells(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> Set[str]:
+    """The cell of a point and its 8 neighbours"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    dlat, dlon = 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+    return {
+        geohash(max(-90.0, min(90.0, latitude + i * dlat)), (longitude + j * dlon + 180) % 360 - 180, precision)
+        for i in (-1, 0, 1) for j in (-1, 0, 1)
+    }
+
+
+def _day(value) -> Optional[int]:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10]).toordinal()
+        except ValueError:
+            return None
+    return None
+
+
+def _coordinates(race: dict) -> Optional[Tuple[float, float]]:
+    try:
+        return float(race['latitude']), float(race['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class DuplicateIndex:
+    def __init__(self, threshold: float = 0.75, date_window_days: int = 45, distance_tolerance: float = 0.15,
+                 precision: int = GEOHASH_PRECISION):
+        self.threshold = threshold
+        self.date_window_days = date_window_days
+        self.distance_tolerance = distance_tolerance
+        self.precision = precision
+        self.blocks: Dict[str, List[tuple]] = defaultdict(list)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _block_keys(self, race: dict, normalized: str) -> Tuple[str, Set[str]]:
+        """(own block, blocks to search); races without coordinates fall back to their first name token"""
+        coordinates = _coordinates(race)
+        if coordinates is None:
+            key = "name:" + (normalized.split() or [""])[0]
+            return key, {key}
+        return geohash(*coordinates, self.precision), neighbour_cells(*coordinates, self.precision)
+
+    def add(self, race: dict):
+        normalized = normalize_name(race.get('name', ''))
+        own, _ = self._block_keys(race, normalized)
+        self.blocks[own].append((
+            race.get('id'), race.get('name'), trigrams(normalized), numbers(normalized),
+            _day(race.get('race_date')), race.get('distance_km'),
+        ))
+        self.size += 1
+
+    def find(self, race: dict, limit: int = 5) -> List[dict]:
+        """Indexed races likely to be the same as `race`, best first"""
+        normalized = normalize_name(race.get('name', ''))
+        grams = trigrams(normalized)
+        digits = numbers(normalized)
+        day = _day(race.get('race_date'))
+        distance = race.get('distance_km')
+        _, keys = self._block_keys(race, normalized)
+
+        matches = []
+        for key in keys:
+            for race_id, name, other_grams, other_digits, other_day, other_distance in self.blocks.get(key, ()):
+                if race_id is not None and race_id == race.get('id'):
+                    continue
+                if digits and other_digits and digits != other_digits:
+                    continue
+                if day is not None and other_day is not None and abs(day - other_day) > self.date_window_days:
+                    continue
+                if distance and other_distance and \
+                        abs(distance - other_distance) > self.distance_tolerance * max(distance, other_distance):
+                    continue
+                score = name_similarity(grams, other_grams)
+                if score >= self.threshold:
+                    matches.append({"id": race_id, "name": name, "score": round(score, 3)})
+        matches.sort(key=lambda match: match['score'], reverse=True)
+        return matches[:limit]
+
+
+def find_duplicate_pairs(races: Iterable[dict], **options) -> List[dict]:
+    """Likely duplicate pairs within `races`, each race compared with its block only"""
+    index = DuplicateIndex(**options)
+    pairs = []
+    for race in races:
+        for match in index.find(race):
+            pairs.append({"id": race.get('id'), "name": race.get('name'), "duplicate_of": match})
+        index.add(race)
+    return pairs
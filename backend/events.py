@@ -0,0 +1,139 @@
+"""
+In-process pub/sub of race status changes for the SSE stream.
+
+Write paths publish compact events to RaceEventHub; each connected client
+holds a Subscription (a set of race ids or a region/department filter).
+Subscriptions are indexed by race id so publishing only touches interested
+connections, and an idle connection costs one small object and no task
+besides its response generator.
+
+Backpressure: pending events are coalesced per race (a slow client only
+gets the latest status of each race) and bounded; when a client falls
+further behind than that, its buffer is dropped and it receives a single
+"resync" event telling it to reload.
+"""
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+# Fields sent to clients; region/department are used for filter matching
+EVENT_FIELDS = ("type", "race_id", "status", "registration_status", "region", "department")
+
+
+class Subscription:
+    def __init__(self, race_ids: Iterable[str] = (), filters: Optional[Dict[str, str]] = None, max_pending: int = 100):
+        self.race_ids: Set[str] = set(race_ids)
+        self.filters = {key: value.lower() for key, value in (filters or {}).items() if value}
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[str, dict]" = OrderedDict()
+        self.overflowed = False
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+
+    def matches(self, event: dict) -> bool:
+        if self.race_ids:
+            return event["race_id"] in self.race_ids
+        return all((event.get(key) or "").lower() == value for key, value in self.filters.items())
+
+    def push(self, event: dict):
+        self.pending.pop(event["race_id"], None)  # coalesce: keep only the latest per race
+        self.pending[event["race_id"]] = event
+        if len(self.pending) > self.max_pending:
+            self.dropped += len(self.pending)
+            self.pending.clear()
+            self.overflowed = True
+        self._wakeup.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for events; False on timeout (time for a heartbeat)"""
+        if self.pending or self.overflowed:
+            return True
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._wakeup.clear()
+
+    def drain(self) -> List[dict]:
+        if self.overflowed:
+            self.overflowed = False
+            self.pending.clear()
+            return [{"type": "resync"}]
+        events = list(self.pending.values())
+        self.pending.clear()
+        return events
+
+
+class RaceEventHub:
+    def __init__(self, max_connections: int = 5000, max_tracked_races: int = 10000):
+        self.max_connections = max_connections
+        self.max_tracked_races = max_tracked_races
+        self._by_race: Dict[str, Set[Subscription]] = {}
+        self._filtered: Set[Subscription] = set()
+        self._last_state: "OrderedDict[str, tuple]" = OrderedDict()
+        self.connections = 0
+        self.sequence = 0
+        self.totals = {"published": 0, "duplicates": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, subscription: Subscription) -> Subscription:
+        self.connections += 1
+        if subscription.race_ids:
+            for race_id in subscription.race_ids:
+                self._by_race.setdefault(race_id, set()).add(subscription)
+        else:
+            self._filtered.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.connections -= 1
+        self.totals["dropped"] += subscription.dropped
+        self._filtered.discard(subscription)
+        for race_id in subscription.race_ids:
+            subscribers = self._by_race.get(race_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_race[race_id]
+
+    def is_watched(self, race_id: str) -> bool:
+        return bool(self._filtered) or race_id in self._by_race
+
+    def publish(self, event: dict) -> int:
+        """Deliver an event to matching subscriptions; unchanged states are skipped"""
+        state = tuple(event.get(key) for key in EVENT_FIELDS)
+        race_id = event["race_id"]
+        if self._last_state.get(race_id) == state:
+            self.totals["duplicates"] += 1
+            return 0
+        self._last_state[race_id] = state
+        self._last_state.move_to_end(race_id)
+        while len(self._last_state) > self.max_tracked_races:
+            self._last_state.popitem(last=False)
+
+        self.sequence += 1
+        event = {key: event.get(key) for key in EVENT_FIELDS if event.get(key) is not None}
+        event["seq"] = self.sequence
+        self.totals["published"] += 1
+        delivered = 0
+        for subscription in self._by_race.get(race_id, ()):
+            subscription.push(event)
+            delivered += 1
+        for subscription in self._filtered:
+            if subscription.matches(event):
+                subscription.push(event)
+                delivered += 1
+        self.totals["delivered"] += delivered
+        return delivered
+
+    def stats(self) -> dict:
+        return {"connections": self.connections, "watched_races": len(self._by_race), "sequence": self.sequence, **self.totals}
+
+
+def format_sse(event: dict) -> str:
+    lines = f"event: {event['type']}\n"
+    if "seq" in event:
+        lines += f"id: {event['seq']}\n"
+    return lines + f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
@@ -0,0 +1,320 @@
+"""
+Offline gazetteer of French communes.
+
+data/communes.csv (name, postcode, department, region, latitude, longitude)
+is loaded once into NumPy coordinate arrays plus two lookup structures over
+accent-insensitive keys: a dict for exact names (homonyms keep every row,
+the department tells them apart) and a sorted key list for prefix matches,
+so "Chamonix" finds "Chamonix-Mont-Blanc". No network access is involved.
+
+The bundled file is derived from the GeoNames cities1000 export (CC BY 4.0):
+the ~8.6k French communes above 1000 inhabitants, without postcodes. A fuller
+file with the same header (e.g. INSEE COG joined with the La Poste postcode
+base) can be dropped in its place or pointed to with GAZETTEER_PATH.
+
+check_many() geocodes or validates a whole import at once: names are
+normalized once per distinct value and distances are computed vectorized.
+
+locate_many() gives the canonical department (and region) of coordinates.
+No boundary polygons are bundled: a point belongs to the department of its
+nearest commune, i.e. to the Voronoi cells of the communes, which follow the
+real borders within a few km. Communes are bucketed in a 0.2° grid so only
+the cells around a point are searched, and points sharing a cell are
+resolved together. Near a border the department the user declared wins when
+one of its communes is close enough.
+"""
+import bisect
+import csv
+import math
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DATA_DIR = Path(__file__).parent / "data"
+EARTH_RADIUS_KM = 6371.0
+ARTICLES = ("le", "la", "les", "l")
+ABBREVIATIONS = {"st": "saint", "ste": "sainte", "sts": "saints", "stes": "saintes"}
+DEPARTMENT_CODE_RE = re.compile(r"^(\d{2,3}|2[ab])$")
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+DEPARTMENT_SUFFIX_RE = re.compile(r"\((\d{2,3}|2[abAB])\)")
+GRID_DEGREES = 0.2  # commune buckets of locate_many()
+KM_PER_DEGREE = 111.32
+# INSEE codes of the regions in departements.csv
+REGION_CODES = {
+    "Île-de-France": "11", "Centre-Val de Loire": "24", "Bourgogne-Franche-Comté": "27", "Normandie": "28",
+    "Hauts-de-France": "32", "Grand Est": "44", "Pays de la Loire": "52", "Bretagne": "53",
+    "Nouvelle-Aquitaine": "75", "Occitanie": "76", "Auvergne-Rhône-Alpes": "84",
+    "Provence-Alpes-Côte d'Azur": "93", "Corse": "94",
+}
+
+
+def normalize(text: str) -> str:
+    """Accent-, case- and punctuation-insensitive key ("St-Étienne" -> "saint etienne")"""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return " ".join(ABBREVIATIONS.get(token, token) for token in NON_ALNUM_RE.sub(" ", text).split())
+
+
+def clean_location(location: str) -> str:
+    """Keep the commune part of free text such as "Chamonix (74)" or "Millau, Aveyron" """
+    return re.split(r"[,(/]", location or "", 1)[0]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Works on floats and on NumPy arrays"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _group_rows(cells: np.ndarray):
+    """(cell, row indexes) for each distinct row of an (n, 2) integer array"""
+    if not len(cells):
+        return
+    unique, inverse = np.unique(cells, axis=0, return_inverse=True)
+    order = np.argsort(inverse.ravel(), kind='stable')
+    bounds = np.r_[0, np.cumsum(np.bincount(inverse.ravel(), minlength=len(unique)))]
+    for i, cell in enumerate(unique.tolist()):
+        yield tuple(cell), order[bounds[i]:bounds[i + 1]]
+
+
+class Gazetteer:
+    def __init__(self, communes: Sequence[dict], departments: Sequence[dict]):
+        self.department_codes: List[str] = [row['code'] for row in departments]
+        self.department_names: List[str] = [row['name'] for row in departments]
+        self.department_regions: List[str] = [row['region'] for row in departments]
+        self.department_centres = np.array(
+            [[float(row['latitude']), float(row['longitude'])] for row in departments], dtype=np.float64
+        ).reshape(-1, 2)
+        self._department_index: Dict[str, int] = {}
+        for index, row in enumerate(departments):
+            self._department_index[row['code'].lower()] = index
+            self._department_index[normalize(row['name'])] = index
+
+        self.names: List[str] = []
+        self.postcodes: List[str] = []
+        departments_of_rows: List[int] = []
+        coordinates: List[Tuple[float, float]] = []
+        for row in communes:
+            department = self._department_index.get(row['department'].lower())
+            if department is None:
+                continue
+            self.names.append(row['name'])
+            self.postcodes.append(row.get('postcode') or "")
+            departments_of_rows.append(department)
+            coordinates.append((float(row['latitude']), float(row['longitude'])))
+        self.latitude = np.array([lat for lat, _ in coordinates], dtype=np.float64)
+        self.longitude = np.array([lon for _, lon in coordinates], dtype=np.float64)
+        self.department = np.array(departments_of_rows, dtype=np.int16)
+
+        self._exact: Dict[str, List[int]] = {}
+        for row, name in enumerate(self.names):
+            key = normalize(name)
+            self._exact.setdefault(key, []).append(row)
+            first, _, rest = key.partition(" ")
+            if first in ARTICLES and rest:  # "Le Puy-en-Velay" is also found as "Puy-en-Velay"
+                self._exact.setdefault(rest, []).append(row)
+        self._sorted_keys = sorted(self._exact)
+
+        self.region_names: Dict[str, str] = {code: name for name, code in REGION_CODES.items()}
+        self._region_index: Dict[str, str] = {}
+        for name, code in REGION_CODES.items():
+            self._region_index[code] = code
+            self._region_index[normalize(name)] = code
+        self._grid: Dict[Tuple[int, int], np.ndarray] = {}
+        cells = np.column_stack([np.floor(self.latitude / GRID_DEGREES), np.floor(self.longitude / GRID_DEGREES)])
+        for cell, rows in _group_rows(cells.astype(np.int64)):
+            self._grid[cell] = rows
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None, departments_path: Optional[Path] = None) -> "Gazetteer":
+        with open(departments_path or DATA_DIR / "departements.csv", encoding="utf-8") as handle:
+            departments = list(csv.DictReader(handle))
+        with open(path or DATA_DIR / "communes.csv", encoding="utf-8") as handle:
+            communes = list(csv.DictReader(handle))
+        return cls(communes, departments)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def department_of(self, value: Optional[str]) -> Optional[int]:
+        """Department index from a code ("74", "2A") or a name ("Haute-Savoie")"""
+        if not value:
+            return None
+        value = str(value).strip()
+        if DEPARTMENT_CODE_RE.match(value.lower()):
+            return self._department_index.get(value.lower().zfill(2))
+        return self._department_index.get(normalize(clean_location(value)))
+
+    def region_of(self, value: Optional[str]) -> Optional[str]:
+        """INSEE region code from a code ("84") or a name ("Auvergne-Rhone-Alpes")"""
+        if not value:
+            return None
+        value = str(value).strip()
+        return self._region_index.get(value) or self._region_index.get(normalize(value))
+
+    def department_info(self, department: int) -> dict:
+        """Canonical names and codes stored on races"""
+        region = self.department_regions[department]
+        return {
+            "department": self.department_names[department],
+            "department_code": self.department_codes[department],
+            "region": region,
+            "region_code": REGION_CODES.get(region),
+        }
+
+    def _row(self, key: str, department: Optional[int]) -> int:
+        """Commune row for a normalized name, -1 when unknown or ambiguous"""
+        rows = self._exact.get(key)
+        if rows is None:
+            # Prefix: "chamonix" -> "chamonix mont blanc", accepted when unique
+            prefix = key + " "
+            start = bisect.bisect_left(self._sorted_keys, prefix)
+            rows = []
+            for candidate in self._sorted_keys[start:start + 20]:
+                if not candidate.startswith(prefix):
+                    break
+                rows.extend(self._exact[candidate])
+        if department is not None:
+            rows = [row for row in rows if self.department[row] == department]
+        return rows[0] if len(rows) == 1 else -1
+
+    def _resolve(self, location: str, department: Optional[str]) -> Tuple[int, int]:
+        """(commune row, department index) for free text, -1 when unknown"""
+        if not department:
+            suffix = DEPARTMENT_SUFFIX_RE.search(location or "")  # "Saint-Pierre (74)"
+            department = suffix.group(1) if suffix else None
+        department_index = self.department_of(department)
+        if department and department_index is None:
+            # Declared but not ours (overseas, abroad): a homonym elsewhere would be a wrong match
+            return -1, -1
+        row = self._row(normalize(clean_location(location)), department_index)
+        return row, -1 if department_index is None else department_index
+
+    def lookup(self, location: str, department: Optional[str] = None) -> Optional[dict]:
+        row, _ = self._resolve(location, department)
+        return None if row < 0 else self.commune(row)
+
+    def commune(self, row: int) -> dict:
+        department = int(self.department[row])
+        return {
+            "name": self.names[row],
+            "postcode": self.postcodes[row] or None,
+            "department": self.department_names[department],
+            "department_code": self.department_codes[department],
+            "region": self.department_regions[department],
+            "latitude": float(self.latitude[row]),
+            "longitude": float(self.longitude[row]),
+        }
+
+    def lookup_rows(self, locations: Sequence[str], departments: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """(commune rows, department indexes) for many (location, department) pairs, -1 when unknown"""
+        rows = np.full(len(locations), -1, dtype=np.int64)
+        department_rows = np.full(len(locations), -1, dtype=np.int64)
+        memo: Dict[Tuple[str, Optional[str]], Tuple[int, int]] = {}
+        for i, pair in enumerate(zip(locations, departments)):
+            found = memo.get(pair)
+            if found is None:
+                found = memo[pair] = self._resolve(*pair)
+            rows[i], department_rows[i] = found
+        return rows, department_rows
+
+    def check_many(self, locations: Sequence[str], departments: Sequence[Optional[str]],
+                   latitudes: Sequence[Optional[float]], longitudes: Sequence[Optional[float]],
+                   max_km: float = 30.0, department_max_km: float = 200.0) -> List[dict]:
+        """Fill missing coordinates and flag given ones too far from the commune (or its department).
+
+        Each result has a status: "filled", "ok", "mismatch" or "unknown"
+        (nothing to fill from / nothing to compare with), the coordinates to
+        store and the distance in km that was checked, if any.
+        """
+        rows, department_rows = self.lookup_rows(locations, departments)
+        lat = np.array([math.nan if v is None else float(v) for v in latitudes], dtype=np.float64)
+        lon = np.array([math.nan if v is None else float(v) for v in longitudes], dtype=np.float64)
+        found = rows >= 0
+        has_department = department_rows >= 0
+        reference_lat = np.where(found, self.latitude[np.where(found, rows, 0)],
+                                 self.department_centres[np.where(has_department, department_rows, 0), 0])
+        reference_lon = np.where(found, self.longitude[np.where(found, rows, 0)],
+                                 self.department_centres[np.where(has_department, department_rows, 0), 1])
+        distance = haversine_km(lat, lon, reference_lat, reference_lon)
+        limit = np.where(found, max_km, department_max_km)
+
+        results = []
+        for i in range(len(rows)):
+            given = not (math.isnan(lat[i]) or math.isnan(lon[i]))
+            if not given:
+                if found[i]:
+                    results.append({"status": "filled", "latitude": float(reference_lat[i]), "longitude": float(reference_lon[i]),
+                                    "distance_km": None, "commune": self.names[rows[i]]})
+                else:
+                    results.append({"status": "unknown", "latitude": None, "longitude": None, "distance_km": None, "commune": None})
+                continue
+            result = {"latitude": float(lat[i]), "longitude": float(lon[i]), "commune": self.names[rows[i]] if found[i] else None,
+                      "distance_km": None}
+            if found[i] or has_department[i]:
+                result["distance_km"] = round(float(distance[i]), 1)
+                result["status"] = "ok" if distance[i] <= limit[i] else "mismatch"
+            else:
+                result["status"] = "unknown"
+            results.append(result)
+        return results
+
+    def check(self, location: str, department: Optional[str], latitude: Optional[float] = None,
+              longitude: Optional[float] = None, **limits) -> dict:
+        return self.check_many([location], [department], [latitude], [longitude], **limits)[0]
+
+    def _block(self, cell: Tuple[int, int], radius: int) -> np.ndarray:
+        """Communes of the (2 * radius + 1)² grid cells around `cell`"""
+        rows = [self._grid.get((cell[0] + i, cell[1] + j)) for i in range(-radius, radius + 1)
+                for j in range(-radius, radius + 1)]
+        rows = [block for block in rows if block is not None]
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def locate_many(self, latitudes: Sequence[Optional[float]], longitudes: Sequence[Optional[float]],
+                    declared: Optional[Sequence[Optional[str]]] = None, max_km: float = 40.0,
+                    border_km: float = 10.0) -> np.ndarray:
+        """Department index of each point, -1 when it is missing or more than max_km from any commune.
+
+        The department of the nearest commune, unless the `declared`
+        department has a commune within border_km of the point.
+        """
+        lat = np.array([math.nan if v is None else float(v) for v in latitudes], dtype=np.float64)
+        lon = np.array([math.nan if v is None else float(v) for v in longitudes], dtype=np.float64)
+        wanted = np.full(len(lat), -1, dtype=np.int64)
+        if declared is not None:
+            wanted[:] = [-1 if index is None else index for index in map(self.department_of, declared)]
+        result = np.full(len(lat), -1, dtype=np.int64)
+        valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        cells = np.column_stack([np.floor(lat[valid] / GRID_DEGREES), np.floor(lon[valid] / GRID_DEGREES)])
+
+        for cell, members in _group_rows(cells.astype(np.int64)):
+            pending = valid[members]
+            radius = 1
+            while len(pending):
+                # The block reaches at least `reach` km around every point of the centre cell
+                reach = radius * GRID_DEGREES * KM_PER_DEGREE * np.cos(
+                    np.radians(np.minimum(np.abs(lat[pending]) + radius * GRID_DEGREES, 89.0)))
+                candidates = self._block(cell, radius)
+                if len(candidates):
+                    distance = haversine_km(lat[pending, None], lon[pending, None],
+                                            self.latitude[candidates][None, :], self.longitude[candidates][None, :])
+                    nearest = distance.argmin(axis=1)
+                    best = distance[np.arange(len(pending)), nearest]
+                    done = (best <= reach) | (reach >= max_km)
+                    found = done & (best <= max_km)
+                    result[pending[found]] = self.department[candidates[nearest[found]]]
+                    own = self.department[candidates][None, :] == wanted[pending, None]
+                    border = done & (wanted[pending] >= 0) & (np.where(own, distance, np.inf).min(axis=1) <= border_km)
+                    result[pending[border]] = wanted[pending[border]]
+                else:
+                    done = reach >= max_km
+                pending = pending[~done]
+                radius += 1
+        return result
+
+    def locate(self, latitude: float, longitude: float, declared: Optional[str] = None, **limits) -> Optional[dict]:
+        department = int(self.locate_many([latitude], [longitude], [declared], **limits)[0])
+        return None if department < 0 else self.department_info(department)
@@ -0,0 +1,149 @@
+"""
+Declarative MongoDB index specification and reconciler.
+
+INDEX_SPECS is the single source of truth for the indexes each collection
+needs. reconcile_indexes() compares it with what exists, creates missing
+indexes (all collections concurrently) and reports - but does not drop -
+indexes that are no longer declared, unless drop_obsolete is set.
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Options compared between the spec and the live index (name is derived from keys)
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "races": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("race_date", ASCENDING)]),
+        # Canonical codes derived from the coordinates (gazetteer.locate_many): filters and facets
+        IndexModel([("status", ASCENDING), ("region_code", ASCENDING), ("department_code", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("department_code", ASCENDING), ("race_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("name", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("favorite_count", DESCENDING), ("race_date", ASCENDING)]),
+        # GET /races?sort=...: one index per sort key (server.RACE_SORTS), walked in either direction
+        IndexModel([("status", ASCENDING), ("distance_km", ASCENDING), ("race_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("elevation_gain", ASCENDING), ("race_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("km_effort", ASCENDING), ("race_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("location_point", GEOSPHERE)]),
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("name", TEXT), ("location", TEXT)]),
+        # Blocking index of duplicate detection (duplicates.py)
+        IndexModel([("geohash", ASCENDING), ("race_date", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        # Private calendar feed URLs (only users who asked for one have a token)
+        IndexModel([("calendar_token", ASCENDING)], unique=True,
+                   partialFilterExpression={"calendar_token": {"$type": "string"}}),
+    ],
+    "password_resets": [
+        IndexModel([("token", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+        # expires_at is a BSON date: Mongo removes the document once it is reached
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "favorites": [
+        IndexModel([("user_id", ASCENDING), ("race_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("race_id", ASCENDING)]),
+    ],
+    "reports": [
+        IndexModel([("race_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        # Old reports are purged once their retention date (expire_at) is reached
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "slow_queries": [
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("collection", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # Co-favorite model, one document per race (recommendations.build_co_favorites)
+    "race_recommendations": [
+        IndexModel([("race_id", ASCENDING)], unique=True),
+    ],
+    # Uploaded GPX/TCX tracks; uploads never attached to a race expire
+    "race_tracks": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("race_id", ASCENDING)]),
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # Cross-worker invalidation log (polling mode only), read by server-assigned seq
+    "change_log": [
+        IndexModel([("seq", ASCENDING)]),
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+def _options(index: dict) -> dict:
+    return {key: index[key] for key in COMPARED_OPTIONS if key in index}
+
+
+def _spec_options(model: IndexModel) -> dict:
+    document = model.document
+    return {key: document[key] for key in COMPARED_OPTIONS if key in document}
+
+
+async def reconcile_collection(db, collection_name: str, models: List[IndexModel], drop_obsolete: bool = False) -> dict:
+    collection = db[collection_name]
+    existing = {}
+    async for index in collection.list_indexes():
+        existing[index['name']] = index
+
+    wanted = {model.document['name']: model for model in models}
+    missing = [model for name, model in wanted.items() if name not in existing]
+    conflicting = [
+        name for name, model in wanted.items()
+        if name in existing and _options(existing[name]) != _spec_options(model)
+    ]
+    obsolete = [name for name in existing if name != '_id_' and name not in wanted]
+
+    report = {"created": [], "conflicting": conflicting, "obsolete": obsolete, "dropped": [], "errors": []}
+
+    for model in missing:
+        name = model.document['name']
+        try:
+            await collection.create_indexes([model])
+            report["created"].append(name)
+        except Exception as e:
+            report["errors"].append(f"{name}: {e}")
+
+    if drop_obsolete:
+        for name in obsolete:
+            try:
+                await collection.drop_index(name)
+                report["dropped"].append(name)
+            except Exception as e:
+                report["errors"].append(f"drop {name}: {e}")
+
+    return report
+
+
+async def reconcile_indexes(db, drop_obsolete: bool = False) -> Dict[str, dict]:
+    """Bring every collection in line with INDEX_SPECS and log what was done"""
+    names = list(INDEX_SPECS)
+    reports = await asyncio.gather(
+        *[reconcile_collection(db, name, INDEX_SPECS[name], drop_obsolete) for name in names]
+    )
+    result = dict(zip(names, reports))
+
+    for name, report in result.items():
+        if report["created"]:
+            logger.info(f"[indexes] {name}: created {', '.join(report['created'])}")
+        if report["obsolete"] and not drop_obsolete:
+            logger.warning(f"[indexes] {name}: obsolete (not in spec) {', '.join(report['obsolete'])}")
+        if report["dropped"]:
+            logger.info(f"[indexes] {name}: dropped {', '.join(report['dropped'])}")
+        if report["conflicting"]:
+            logger.warning(f"[indexes] {name}: options differ from spec {', '.join(report['conflicting'])}")
+        for error in report["errors"]:
+            logger.error(f"[indexes] {name}: {error}")
+    return result
@@ -0,0 +1,267 @@
+"""
+Cross-worker cache invalidation bus.
+
+Every worker keeps in-process caches (race details, listings, calendar feeds...).
+InvalidationBus tails MongoDB writes and calls the handlers subscribed for
+each collection, so a write served by one worker invalidates the caches of
+all of them:
+
+- "stream" mode: a change stream on the watched collections (replica set /
+  Atlas). The last resume token is persisted so a restarted worker resumes
+  where the deployment left off.
+- "poll" mode (standalone mongod, no change streams): write paths publish
+  small entries to a `change_log` collection (TTL-purged) that every worker
+  polls by `seq`, a number handed out by the server ($inc on a counter
+  document). Numbers are allocated before the entry is inserted, so entries
+  can appear out of order: SequenceWindow re-reads everything above the
+  first missing number until it shows up (or `gap_timeout` gives it up).
+  Each worker keeps its position in memory; a new worker has empty caches
+  and only replays the last `startup_overlap` entries (writes in flight
+  while it booted).
+
+Collections listed in `published` always go through the change log, even in
+stream mode (where the change stream delivers the change_log inserts): their
+handlers need a key that the raw change event does not carry, e.g. the
+user_id of a deleted favorite (deletes only have the _id).
+
+Writes published before the mode is known are queued, then sent once the
+detection is done, or dropped when the change stream sees them anyway.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# handler(operation, key, updated_fields) - key is the document's business id (or None if unknown)
+Handler = Callable[[str, Optional[str], Optional[set]], None]
+
+
+class SequenceWindow:
+    """Which change_log sequence numbers a poller has handled"""
+
+    def __init__(self, watermark: int = 0, gap_timeout: float = 10.0):
+        self.watermark = watermark  # every number <= watermark was handled (or given up)
+        self.seen: set = set()  # handled numbers above the watermark
+        self.gap_timeout = gap_timeout
+        self._gap_since: Optional[float] = None
+
+    def accept(self, seq: int) -> bool:
+        """True the first time a number shows up (its entry must be dispatched)"""
+        if seq <= self.watermark or seq in self.seen:
+            return False
+        self.seen.add(seq)
+        return True
+
+    def advance(self, now: float) -> int:
+        """Move the watermark over contiguous numbers; returns how many missing ones were given up"""
+        skipped = 0
+        while True:
+            while self.watermark + 1 in self.seen:
+                self.watermark += 1
+                self.seen.discard(self.watermark)
+                self._gap_since = None
+            if not self.seen:
+                self._gap_since = None
+                return skipped
+            if self._gap_since is None:
+                self._gap_since = now
+                return skipped
+            if now - self._gap_since < self.gap_timeout:
+                return skipped
+            # Allocated but never written (publisher crashed or insert failed)
+            lowest = min(self.seen)
+            skipped += lowest - 1 - self.watermark
+            self.watermark = lowest - 1
+
+
+class InvalidationBus:
+    def __init__(self, db, name: str = "cache-invalidation", key_fields: Optional[Dict[str, str]] = None,
+                 poll_interval: float = 1.0, change_log_retention: timedelta = timedelta(days=1),
+                 token_save_interval: float = 5.0, mode: Optional[str] = None, gap_timeout: float = 10.0,
+                 startup_overlap: int = 100, max_queued: int = 10000, published: Optional[set] = None):
+        self.db = db
+        self.name = name
+        self.key_fields = key_fields or {}
+        self.poll_interval = poll_interval
+        self.change_log_retention = change_log_retention
+        self.token_save_interval = token_save_interval
+        self.mode = mode  # "stream" / "poll", detected from the server when not forced
+        self.gap_timeout = gap_timeout
+        self.startup_overlap = startup_overlap
+        self.published = set(published or ())  # announced by the writers in every mode
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._pending_publishes: set = set()
+        self._queued: deque = deque(maxlen=max_queued)  # published before the mode was detected
+        self.stats = {"events": 0, "published": 0, "errors": 0, "restarts": 0, "gaps_skipped": 0}
+
+    def subscribe(self, collection: str, handler: Handler):
+        self._handlers.setdefault(collection, []).append(handler)
+
+    @property
+    def collections(self) -> List[str]:
+        return sorted(self._handlers)
+
+    async def detect_mode(self) -> str:
+        hello = await self.db.client.admin.command("hello")
+        # Change streams need a replica set or a sharded cluster
+        return "stream" if hello.get("setName") or hello.get("msg") == "isdbgrid" else "poll"
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        for task in list(self._pending_publishes):
+            task.cancel()
+
+    def announces(self, collection: str) -> bool:
+        """Whether writes to `collection` must be published (the change stream does not cover them)"""
+        return self.mode == "poll" or collection in self.published
+
+    def publish(self, collection: str, operation: str, key: Optional[str] = None):
+        """Announce a write to the other workers (poll mode and `published` collections)"""
+        if self.mode is None and self._task is not None:
+            if len(self._queued) == self._queued.maxlen:
+                self.stats["errors"] += 1  # the oldest queued write is lost
+            self._queued.append((collection, operation, key))
+            return
+        if not self.announces(collection):
+            return
+        task = asyncio.ensure_future(self._publish(collection, operation, key))
+        self._pending_publishes.add(task)
+        task.add_done_callback(self._pending_publishes.discard)
+
+    def _flush_queued(self):
+        queued, self._queued = list(self._queued), deque(maxlen=self._queued.maxlen)
+        for entry in queued:
+            self.publish(*entry)
+
+    async def _publish(self, collection: str, operation: str, key: Optional[str]):
+        now = datetime.now(timezone.utc)
+        try:
+            counter = await self.db.invalidation_state.find_one_and_update(
+                {"_id": f"{self.name}:seq"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+            )
+            await self.db.change_log.insert_one({
+                "seq": counter["seq"], "coll": collection, "op": operation, "key": key,
+                "created_at": now, "expire_at": now + self.change_log_retention,
+            })
+            self.stats["published"] += 1
+        except PyMongoError as e:
+            self.stats["errors"] += 1
+            logger.error(f"[invalidation] publish failed: {e}")
+
+    def _dispatch(self, collection: str, operation: str, key: Optional[str], updated_fields: Optional[set]):
+        self.stats["events"] += 1
+        for handler in self._handlers.get(collection, ()):
+            try:
+                handler(operation, key, updated_fields)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"[invalidation] handler error on {collection}: {e}")
+
+    def _dispatch_reset(self):
+        """Events may have been missed: treat everything as changed"""
+        for collection in self.collections:
+            self._dispatch(collection, "invalidate", None, None)
+
+    async def _run(self):
+        while True:
+            try:
+                self.mode = self.mode or await self.detect_mode()
+                self._flush_queued()
+                logger.info(f"[invalidation] {self.mode} mode on {', '.join(self.collections)}")
+                if self.mode == "stream":
+                    await self._watch()
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["restarts"] += 1
+                logger.error(f"[invalidation] {self.mode} loop error, restarting: {e}")
+                self._dispatch_reset()
+                await asyncio.sleep(self.poll_interval * 5)
+
+    # ---------- change stream mode ----------
+    async def _load_state(self) -> dict:
+        return await self.db.invalidation_state.find_one({"_id": self.name}) or {}
+
+    async def _save_state(self, **fields):
+        await self.db.invalidation_state.update_one({"_id": self.name}, {"$set": fields}, upsert=True)
+
+    def _key_field(self, collection: str) -> str:
+        return self.key_fields.get(collection, "id")
+
+    async def _watch(self):
+        watched = [c for c in self.collections if c not in self.published]
+        announced = [c for c in self.collections if c in self.published]
+        key_projection = {f"fullDocument.{self._key_field(c)}": 1 for c in watched}
+        pipeline = [
+            {"$match": {"$or": [
+                {"ns.coll": {"$in": watched}},
+                {"ns.coll": "change_log", "operationType": "insert", "fullDocument.coll": {"$in": announced}},
+            ]}},
+            {"$project": {"operationType": 1, "ns": 1, "documentKey": 1, "updateDescription.updatedFields": 1,
+                          "fullDocument.coll": 1, "fullDocument.op": 1, "fullDocument.key": 1, **key_projection}},
+        ]
+        state = await self._load_state()
+        resume_after = state.get("resume_token")
+        try:
+            await self._consume(pipeline, resume_after)
+        except OperationFailure as e:
+            if resume_after is None:
+                raise
+            # Token too old (oplog rolled over): start from now and drop everything cached
+            logger.warning(f"[invalidation] cannot resume change stream ({e}), starting fresh")
+            await self._save_state(resume_token=None)
+            self._dispatch_reset()
+            await self._consume(pipeline, None)
+
+    async def _consume(self, pipeline: list, resume_after):
+        stream = self.db.watch(pipeline, full_document="updateLookup", resume_after=resume_after)
+        last_saved = asyncio.get_running_loop().time()
+        async with stream:
+            async for change in stream:
+                collection = change["ns"]["coll"]
+                document = change.get("fullDocument") or {}
+                if collection == "change_log":  # announced by the writer (published collections)
+                    self._dispatch(document["coll"], document["op"], document.get("key"), None)
+                else:
+                    updated = (change.get("updateDescription") or {}).get("updatedFields")
+                    self._dispatch(collection, change["operationType"], document.get(self._key_field(collection)),
+                                   set(updated) if updated else None)
+
+                now = asyncio.get_running_loop().time()
+                if now - last_saved >= self.token_save_interval:
+                    await self._save_state(resume_token=stream.resume_token, updated_at=datetime.now(timezone.utc))
+                    last_saved = now
+
+    # ---------- polling mode ----------
+    async def _poll(self):
+        latest = await self.db.change_log.find_one({"seq": {"$exists": True}}, {"seq": 1}, sort=[("seq", -1)])
+        window = SequenceWindow(max(0, (latest or {}).get("seq", 0) - self.startup_overlap), self.gap_timeout)
+        loop = asyncio.get_running_loop()
+
+        while True:
+            entries = await self.db.change_log.find(
+                {"seq": {"$gt": window.watermark}}).sort("seq", 1).to_list(1000)
+            accepted = 0
+            for entry in entries:
+                if window.accept(entry["seq"]):
+                    accepted += 1
+                    if entry["coll"] in self._handlers:
+                        self._dispatch(entry["coll"], entry["op"], entry.get("key"), None)
+            self.stats["gaps_skipped"] += window.advance(loop.time())
+            # A full batch of already seen entries means we are waiting on a gap: do not spin
+            if accepted < 1000:
+                await asyncio.sleep(self.poll_interval)
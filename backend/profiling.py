@@ -0,0 +1,203 @@
+"""
+On-demand request profiling and slow-query capture.
+
+- ProfilingMiddleware: runs cProfile around a request when an admin sends
+  `X-Profile: 1`, or for a random sample of requests (PROFILE_SAMPLE_RATE).
+  Profiles are kept in a bounded in-memory ring (ProfileStore) and the
+  response carries an `X-Profile-Id` header to look them up.
+- SlowQueryListener: pymongo listener handing every command slower than a
+  threshold to a callback, with its query shape (values redacted).
+"""
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from pymongo import monitoring
+
+# Commands that can be explained to find out which plan made them slow
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Parts of a command that describe its shape (the rest is driver plumbing)
+SHAPE_KEYS = ("filter", "query", "sort", "projection", "pipeline", "key", "updates", "deletes")
+
+
+def query_shape(value):
+    """Replace literal values by '?' while keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # Collapse $in lists & co. so the shape does not depend on their length
+        return shapes[:1] if shapes and all(shape == "?" for shape in shapes) else shapes
+    return "?"
+
+
+def command_shape(command_name: str, command: dict) -> dict:
+    shape = {key: query_shape(command[key]) for key in SHAPE_KEYS if key in command}
+    if command_name in ("update", "delete"):
+        shape = {key: value[:1] for key, value in shape.items()}
+    return shape
+
+
+class ProfileStore:
+    def __init__(self, max_profiles: int = 50):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+    def add(self, entry: dict):
+        self._profiles[entry["id"]] = entry
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def list(self) -> list:
+        return [
+            {key: value for key, value in entry.items() if key != "stats"}
+            for entry in reversed(self._profiles.values())
+        ]
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    @staticmethod
+    def render(entry: dict, sort: str = "cumulative", limit: int = 40) -> str:
+        """Call tree summary (pstats) of a stored profile"""
+        output = io.StringIO()
+        stats = pstats.Stats(entry["stats"], stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        stats.print_callees(limit // 2)
+        return output.getvalue()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; at most one request is profiled at a time (cProfile is per-process)"""
+
+    def __init__(self, app, store: ProfileStore, is_admin_request: Callable[[dict], bool],
+                 sample_rate: float = 0.0, header: str = "x-profile"):
+        self.app = app
+        self.store = store
+        self.is_admin_request = is_admin_request
+        self.sample_rate = sample_rate
+        self.header = header.encode()
+        self._active = threading.Lock()
+
+    def _wants_profile(self, scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        if headers.get(self.header) in (b"1", b"true"):
+            return self.is_admin_request(headers)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope) or not self._active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+        finally:
+            self._active.release()
+            query = scope.get("query_string", b"").decode("latin-1")
+            self.store.add({
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"] + (f"?{query}" if query else ""),
+                "status": status["code"],
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "stats": profiler,
+            })
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Calls on_slow(entry) for commands slower than threshold_ms (from a driver thread)"""
+
+    IGNORED_COLLECTIONS = {"slow_queries"}
+
+    def __init__(self, threshold_ms: float, on_slow: Callable[[dict], None]):
+        self.threshold_ms = threshold_ms
+        self.on_slow = on_slow
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str) or collection in self.IGNORED_COLLECTIONS:
+            return
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (collection, event.command, event.database_name)
+
+    def _pop(self, event):
+        with self._lock:
+            return self._pending.pop((event.request_id, event.connection_id), None)
+
+    def succeeded(self, event):
+        self._check(event, failed=False)
+
+    def failed(self, event):
+        self._check(event, failed=True)
+
+    def _check(self, event, failed: bool):
+        pending = self._pop(event)
+        duration_ms = event.duration_micros / 1000
+        if pending is None or duration_ms < self.threshold_ms:
+            return
+        collection, command, database = pending
+        self.on_slow({
+            "collection": collection,
+            "command": event.command_name,
+            "database": database,
+            "shape": command_shape(event.command_name, command),
+            "duration_ms": round(duration_ms, 2),
+            "failed": failed,
+            "explainable": event.command_name in EXPLAINABLE_COMMANDS,
+            "raw_command": command,
+        })
+
+
+def summarize_explain(explain: dict) -> dict:
+    """Compact summary of a queryPlanner explain: stage chain and indexes used"""
+    planner = explain.get("queryPlanner") or {}
+    if not planner and "stages" in explain:
+        first = explain["stages"][0] if explain["stages"] else {}
+        planner = (first.get("$cursor") or {}).get("queryPlanner") or {}
+    plan = planner.get("winningPlan") or {}
+    plan = plan.get("queryPlan", plan)  # slot-based engine nests the classic plan
+
+    stages, indexes = [], []
+    node = plan
+    while isinstance(node, dict) and node:
+        stages.append(node.get("stage", "?"))
+        if node.get("indexName"):
+            indexes.append(node["indexName"])
+        children = node.get("inputStages") or ([node["inputStage"]] if "inputStage" in node else [])
+        for child in children[1:]:
+            if isinstance(child, dict) and child.get("indexName"):
+                indexes.append(child["indexName"])
+        node = children[0] if children else None
+
+    return {
+        "stages": " <- ".join(stages),
+        "indexes": indexes,
+        "collection_scan": "COLLSCAN" in stages,
+    }
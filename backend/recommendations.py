@@ -0,0 +1,181 @@
+"""
+"Runners also followed" model built from the favorites collection.
+
+build_co_favorites() counts, for every pair of races, how many users
+follow both, and stores the top-N related races of each race in
+`race_recommendations` ({race_id, related: [{race_id, score, count}]}).
+Scores are cosine-normalized (count / sqrt(followers_a * followers_b)) so
+the most popular races do not end up related to everything.
+
+Memory stays bounded whatever the size of the collection:
+- favorites are streamed sorted by user_id (covered by the unique
+  (user_id, race_id) index), one user at a time;
+- pair counts live in sorted NumPy key/count arrays (16 bytes per distinct
+  pair), reduced chunk by chunk in a worker thread;
+- when the estimated number of pairs exceeds `max_pairs_in_memory`, races
+  are split into partitions and the favorites are streamed once per
+  partition, each pass only counting pairs anchored on its races;
+- users following more than `max_user_favorites` races only contribute
+  their first ones (a handful of collectors would otherwise dominate).
+"""
+import asyncio
+import logging
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+
+class PairCounter:
+    """Accumulates int64 pair keys into sorted unique keys + counts"""
+
+    def __init__(self, chunk_size: int = 1_000_000):
+        self.chunk_size = chunk_size
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def full(self) -> bool:
+        # Merging re-sorts the accumulated pairs: let the buffer grow with them
+        return self._buffered >= max(self.chunk_size, len(self.keys))
+
+    def add(self, keys: np.ndarray):
+        self._buffer.append(keys)
+        self._buffered += len(keys)
+
+    def reduce(self):
+        if not self._buffer:
+            return
+        keys = np.concatenate([self.keys, *self._buffer])
+        counts = np.concatenate([self.counts, np.ones(self._buffered, dtype=np.int64)])
+        self._buffer, self._buffered = [], 0
+        order = np.argsort(keys, kind='stable')
+        keys, counts = keys[order], counts[order]
+        del order
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self.keys = keys[starts]
+        self.counts = np.add.reduceat(counts, starts) if len(keys) else counts
+
+
+def rank_pairs(keys: np.ndarray, counts: np.ndarray, followers: np.ndarray, race_count: int,
+               top_n: int, min_support: int):
+    """(anchors, related, scores, counts) sorted by anchor then score, top_n rows per anchor"""
+    keep = counts >= min_support
+    keys, counts = keys[keep], counts[keep]
+    anchors, related = keys // race_count, keys % race_count
+    scores = counts / np.sqrt(followers[anchors] * followers[related])
+    order = np.lexsort((-scores, anchors))
+    anchors, related, scores, counts = anchors[order], related[order], scores[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, anchors[1:] != anchors[:-1]]) if len(anchors) else np.empty(0, dtype=np.int64)
+    rank = np.arange(len(anchors)) - np.repeat(starts, np.diff(np.r_[starts, len(anchors)]))
+    keep = rank < top_n
+    return anchors[keep], related[keep], scores[keep], counts[keep]
+
+
+async def _stream_users(db, batch_size: int):
+    """Yield (user_id, [race_id, ...]) from favorites sorted by user"""
+    cursor = db.favorites.find({}, {"_id": 0, "user_id": 1, "race_id": 1}).sort(
+        [("user_id", 1), ("race_id", 1)]).batch_size(batch_size)
+    current_user, races = None, []
+    async for favorite in cursor:
+        if favorite['user_id'] != current_user:
+            if races:
+                yield current_user, races
+            current_user, races = favorite['user_id'], []
+        races.append(favorite['race_id'])
+    if races:
+        yield current_user, races
+
+
+async def favorites_signature(db) -> dict:
+    """Cheap change detector: count + most recent favorite"""
+    latest = await db.favorites.find_one({}, {"_id": 0, "id": 1}, sort=[("_id", -1)])
+    return {"count": await db.favorites.estimated_document_count(), "latest": latest and latest.get('id')}
+
+
+async def build_co_favorites(db, top_n: int = 20, min_support: int = 2, max_user_favorites: int = 200,
+                             max_pairs_in_memory: int = 5_000_000, batch_size: int = 5000) -> dict:
+    started = time.perf_counter()
+    build_id = uuid.uuid4().hex
+
+    # Pass 0: followers per race and an upper bound of the number of pairs
+    race_ids: List[str] = []
+    followers_list: List[int] = []
+    async for row in db.favorites.aggregate([{"$group": {"_id": "$race_id", "n": {"$sum": 1}}}], allowDiskUse=True):
+        race_ids.append(row['_id'])
+        followers_list.append(row['n'])
+    race_index: Dict[str, int] = {race_id: i for i, race_id in enumerate(race_ids)}
+    followers = np.array(followers_list, dtype=np.float64)
+    race_count = max(len(race_ids), 1)
+
+    estimated_pairs = 0
+    async for row in db.favorites.aggregate([{"$group": {"_id": "$user_id", "n": {"$sum": 1}}}], allowDiskUse=True):
+        n = min(row['n'], max_user_favorites)
+        estimated_pairs += n * (n - 1)
+    partitions = max(1, math.ceil(estimated_pairs / max_pairs_in_memory))
+
+    written = 0
+    users = 0
+    for partition in range(partitions):
+        counter = PairCounter()
+        async for _, user_races in _stream_users(db, batch_size):
+            if partition == 0:
+                users += 1
+            if len(user_races) < 2:
+                continue
+            ids = np.fromiter((race_index[r] for r in user_races[:max_user_favorites] if r in race_index), dtype=np.int64)
+            anchors = ids[ids % partitions == partition]
+            if not len(anchors):
+                continue
+            pairs = anchors[:, None] * race_count + ids
+            counter.add(pairs[anchors[:, None] != ids])
+            if counter.full:
+                await asyncio.to_thread(counter.reduce)
+        await asyncio.to_thread(counter.reduce)
+        anchors, related, scores, counts = await asyncio.to_thread(
+            rank_pairs, counter.keys, counter.counts, followers, race_count, top_n, min_support)
+        pair_count = len(counter.keys)
+        del counter
+
+        requests = []
+        now = datetime.now(timezone.utc)
+        bounds = np.flatnonzero(np.r_[True, anchors[1:] != anchors[:-1], True]) if len(anchors) else []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            requests.append(ReplaceOne({"race_id": race_ids[anchors[start]]}, {
+                "race_id": race_ids[anchors[start]],
+                "related": [
+                    {"race_id": race_ids[related[i]], "score": round(float(scores[i]), 4), "count": int(counts[i])}
+                    for i in range(start, end)
+                ],
+                "build_id": build_id,
+                "updated_at": now,
+            }, upsert=True))
+            if len(requests) >= 1000:
+                await db.race_recommendations.bulk_write(requests, ordered=False)
+                written += len(requests)
+                requests = []
+        if requests:
+            await db.race_recommendations.bulk_write(requests, ordered=False)
+            written += len(requests)
+        logger.info(f"[co-favorites] partition {partition + 1}/{partitions}: {pair_count} pairs")
+
+    # Races that lost all their related races since the previous build
+    removed = await db.race_recommendations.delete_many({"build_id": {"$ne": build_id}})
+    return {
+        "build_id": build_id,
+        "races": len(race_ids),
+        "users": users,
+        "estimated_pairs": estimated_pairs,
+        "partitions": partitions,
+        "written": written,
+        "removed": removed.deleted_count,
+        "duration_ms": round((time.perf_counter() - started) * 1000),
+    }
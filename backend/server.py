@@ -1,31 +1,106 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks, Query, UploadFile, File
+import time
+BOOT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks, Query, UploadFile, File, Response, Header
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ConnectionFailure, ExecutionTimeout, WaitQueueTimeoutError
+from pymongo.read_preferences import SecondaryPreferred
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional
 import uuid
+import secrets
 from datetime import datetime, timezone, timedelta
 import jwt
-import bcrypt
+import importlib
+import sys
 from enum import Enum
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-import pandas as pd
+from cache import SingleFlightCache, ResponseCache, ResponseCacheMiddleware
+from calendar_feeds import build_calendar, feed_etag, race_to_ics
+from events import RaceEventHub, Subscription, format_sse
+from concurrency import ConcurrencyLimiter, ConcurrencyLimitMiddleware
+from duplicates import DuplicateIndex, find_duplicate_pairs, geohash, neighbour_cells
+from indexes import reconcile_indexes
+from invalidation import InvalidationBus
+from metrics import registry as metrics_registry, MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics
+from profiling import ProfileStore, ProfilingMiddleware, SlowQueryListener, summarize_explain
 import io
+import socket
+from collections import defaultdict
+
+# Heavy modules (pandas, sendgrid, bcrypt) are imported on first use through
+# lazy_import() so a cold start on the free plan only pays for what it serves
+startup_profile = {"module_import_ms": None, "startup_ms": None, "lazy_imports": {}}
+
+def lazy_import(name: str):
+    module = sys.modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        startup_profile["lazy_imports"][name] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Lazy import of {name} took {startup_profile['lazy_imports'][name]} ms")
+    return module
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection (supports both local and Atlas URLs)
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # Bearer token for Prometheus scrapes
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))  # 0 disables the slow-query log
+mongo_listeners = [MongoCommandMetrics(), MongoPoolMetrics()] if METRICS_ENABLED else []
+if SLOW_QUERY_MS > 0:
+    mongo_listeners.append(SlowQueryListener(SLOW_QUERY_MS, lambda entry: record_slow_query(entry)))
+# Bounded pool and timeouts: a slow or unreachable node fails requests fast instead of stalling them
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=mongo_listeners,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '50')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+    maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000')),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+    connectTimeoutMS=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+    socketTimeoutMS=int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '20000')),
+)
 db = client[os.environ.get('DB_NAME', 'trouve_ton_dossard')]
 
+# Public listings and facets tolerate a few seconds of lag: read them from secondaries
+# when the cluster has some (falls back to the primary on a single node)
+MONGO_SECONDARY_READS = os.environ.get('MONGO_SECONDARY_READS', 'true').lower() in ('1', 'true', 'yes')
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '120'))  # driver minimum is 90
+read_db = client.get_database(
+    db.name, read_preference=SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS)
+) if MONGO_SECONDARY_READS else db
+# Cached listings rendered right after a race write would otherwise be filled from a secondary
+# that has not replicated it yet, and then served as fresh for the whole TTL
+race_write_state = {"last_write": float('-inf')}
+
+def listing_db():
+    """read_db, or the primary while secondaries may still miss the last race write"""
+    if time.monotonic() - race_write_state["last_write"] < MONGO_MAX_STALENESS_SECONDS:
+        return db
+    return read_db
+
+# maxTimeMS budget per route class: a query over budget is aborted server-side (503)
+QUERY_BUDGET_MS = {
+    "detail": int(os.environ.get('QUERY_BUDGET_DETAIL_MS', '1000')),
+    "browse": int(os.environ.get('QUERY_BUDGET_BROWSE_MS', '3000')),
+    "facets": int(os.environ.get('QUERY_BUDGET_FACETS_MS', '3000')),
+    "account": int(os.environ.get('QUERY_BUDGET_ACCOUNT_MS', '2000')),
+}
+# Errors meaning "the database is slow or unreachable" (server selection and network
+# timeouts are ConnectionFailures), as opposed to a bad query
+DB_UNAVAILABLE_ERRORS = (ConnectionFailure, ExecutionTimeout, WaitQueueTimeoutError)
+
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'trail-france-secret-key-2025')
 JWT_ALGORITHM = 'HS256'
@@ -35,6 +110,66 @@ JWT_EXPIRATION_HOURS = 24
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY', '')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'noreply@trailfrancapp.com')
 
+# Race detail cache (single-flight + stale-while-revalidate)
+RACE_CACHE_TTL_SECONDS = float(os.environ.get('RACE_CACHE_TTL_SECONDS', '30'))
+RACE_CACHE_STALE_SECONDS = float(os.environ.get('RACE_CACHE_STALE_SECONDS', '300'))
+RACE_CACHE_MAX_ENTRIES = int(os.environ.get('RACE_CACHE_MAX_ENTRIES', '5000'))
+race_cache = SingleFlightCache(
+    ttl=RACE_CACHE_TTL_SECONDS, stale_ttl=RACE_CACHE_STALE_SECONDS, max_entries=RACE_CACHE_MAX_ENTRIES
+)
+
+# Anonymous GET response cache (listings and filter facets are identical for everyone)
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '30'))
+RESPONSE_CACHE_STALE_SECONDS = float(os.environ.get('RESPONSE_CACHE_STALE_SECONDS', '300'))
+response_cache = ResponseCache(max_bytes=RESPONSE_CACHE_MAX_BYTES)
+RESPONSE_CACHE_ROUTES = {
+    "/api/races": {"ttl": RESPONSE_CACHE_TTL_SECONDS, "stale": RESPONSE_CACHE_STALE_SECONDS, "tags": ["races"]},
+    "/api/races/popular": {"ttl": RESPONSE_CACHE_TTL_SECONDS * 2, "stale": RESPONSE_CACHE_STALE_SECONDS, "tags": ["races"]},
+    "/api/filters/regions": {"ttl": RESPONSE_CACHE_TTL_SECONDS * 10, "stale": RESPONSE_CACHE_STALE_SECONDS * 4, "tags": ["races"]},
+    "/api/filters/departments": {"ttl": RESPONSE_CACHE_TTL_SECONDS * 10, "stale": RESPONSE_CACHE_STALE_SECONDS * 4, "tags": ["races"]},
+}
+
+# iCalendar feeds: serialized VEVENT blocks per race (kept until the race changes) and whole
+# feeds as bytes, tagged with the races / user they were built from
+CALENDAR_EVENTS_MAX_ENTRIES = int(os.environ.get('CALENDAR_EVENTS_MAX_ENTRIES', '20000'))
+CALENDAR_FEEDS_MAX_BYTES = int(os.environ.get('CALENDAR_FEEDS_MAX_BYTES', str(32 * 1024 * 1024)))
+calendar_events = SingleFlightCache(ttl=float('inf'), stale_ttl=0, max_entries=CALENDAR_EVENTS_MAX_ENTRIES)
+calendar_feeds = ResponseCache(max_bytes=CALENDAR_FEEDS_MAX_BYTES)
+
+# Cross-worker invalidation: every worker drops its entries when another one writes
+INVALIDATION_BUS_ENABLED = os.environ.get('INVALIDATION_BUS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+invalidation_bus = InvalidationBus(
+    db,
+    name=os.environ.get('INVALIDATION_BUS_NAME', 'cache-invalidation'),
+    # Favorite writes announce their user_id themselves (change stream deletes only carry the _id)
+    published={"favorites"},
+    poll_interval=float(os.environ.get('INVALIDATION_POLL_SECONDS', '1')),
+    mode=os.environ.get('INVALIDATION_BUS_MODE') or None,  # force "poll" where change streams are not allowed
+)
+
+def invalidate_race_caches(*race_ids: str):
+    """Called by every race write path: drop the race details and all cached listings"""
+    race_cache.invalidate(*race_ids)
+    race_write_state["last_write"] = time.monotonic()
+    response_cache.invalidate_tags("races")
+    invalidate_calendar_races(*race_ids)
+    note_similarity_changes(*race_ids)
+    for race_id in race_ids:
+        invalidation_bus.publish("races", "update", race_id)
+    if not race_ids:
+        invalidation_bus.publish("races", "insert")
+
+def invalidate_calendar_races(*race_ids: str):
+    """Drop the event blocks of these races, the feeds that contain them and the filtered feeds"""
+    calendar_events.invalidate(*race_ids)
+    calendar_feeds.invalidate_tags("races", *(f"race:{race_id}" for race_id in race_ids))
+
+def invalidate_user_calendar(user_id: str):
+    """The user's favorites changed: only their own feed is rebuilt"""
+    calendar_feeds.invalidate_tags(f"user:{user_id}")
+    invalidation_bus.publish("favorites", "update", user_id)
+
 # Create the main app
 app = FastAPI(title="Trouve Ton Dossard API")
 api_router = APIRouter(prefix="/api")
@@ -44,6 +179,17 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+async def database_unavailable_handler(request, exc):
+    """Slow or unreachable database: 503 + Retry-After instead of a 500"""
+    logger.error(f"Database unavailable on {request.url.path}: {type(exc).__name__}: {exc}")
+    return JSONResponse(
+        status_code=503, headers={"Retry-After": "5"},
+        content={"detail": "Service temporairement indisponible, réessayez dans quelques instants"},
+    )
+
+for error_class in DB_UNAVAILABLE_ERRORS:
+    app.add_exception_handler(error_class, database_unavailable_handler)
+
 # ==================== ENUMS ====================
 class RaceStatus(str, Enum):
     PENDING = "pending"
@@ -89,16 +235,18 @@ class RaceCreate(BaseModel):
     location: str
     region: str
     department: str
-    latitude: float
-    longitude: float
-    distance_km: float
-    elevation_gain: int
+    latitude: Optional[float] = None  # geocoded from location + department when missing
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None  # derived from the track when track_id is given
+    elevation_gain: Optional[int] = None
     race_date: str
     registration_open_date: str
     is_utmb: bool = False
     website_url: Optional[str] = None
     image_url: Optional[str] = None
     manual_status: Optional[str] = None  # full, closed, or None for auto
+    track_id: Optional[str] = None  # returned by POST /tracks
+    ignore_duplicates: bool = False  # submit even if similar races exist (409 otherwise)
 
 class RaceUpdate(BaseModel):
     name: Optional[str] = None
@@ -116,6 +264,7 @@ class RaceUpdate(BaseModel):
     website_url: Optional[str] = None
     image_url: Optional[str] = None
     manual_status: Optional[str] = None  # full, closed, or None to reset to auto
+    track_id: Optional[str] = None  # replaces the course track
 
 class RaceResponse(BaseModel):
     id: str
@@ -124,8 +273,8 @@ class RaceResponse(BaseModel):
     location: str
     region: str
     department: str
-    latitude: float
-    longitude: float
+    latitude: Optional[float] = None  # None when the commune could not be geocoded
+    longitude: Optional[float] = None
     distance_km: float
     elevation_gain: int
     race_date: str
@@ -139,6 +288,12 @@ class RaceResponse(BaseModel):
     submitted_by: Optional[str] = None
     created_at: str
     reported_full: Optional[bool] = None  # Signalé complet par la communauté
+    favorite_count: int = 0  # Nombre d'utilisateurs ayant la course en favori
+    has_track: bool = False  # Trace GPX disponible (/races/{id}/track)
+    km_effort: Optional[float] = None  # distance + D+/100
+    proximity_km: Optional[float] = None  # seulement avec sort=proximity
+    department_code: Optional[str] = None  # Déduits des coordonnées (filtres exacts)
+    region_code: Optional[str] = None
 
 class FavoriteResponse(BaseModel):
     id: str
@@ -147,15 +302,31 @@ class FavoriteResponse(BaseModel):
     notify_on_registration: bool
     created_at: str
 
+class FavoriteBatch(BaseModel):
+    add: List[str] = []
+    remove: List[str] = []
+    notify: bool = True
+
 class ModerateAction(BaseModel):
     action: str  # "approve" or "reject"
     reason: Optional[str] = None
 
+class BulkModerateAction(BaseModel):
+    race_ids: List[str]
+    action: str  # "approve" or "reject"
+    reason: Optional[str] = None
+
+class BulkReportAction(BaseModel):
+    race_ids: List[str]
+    action: str  # "validate" or "reject"
+
 # ==================== HELPER FUNCTIONS ====================
 def hash_password(password: str) -> str:
+    bcrypt = lazy_import('bcrypt')
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
+    bcrypt = lazy_import('bcrypt')
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_token(user_id: str, role: str) -> str:
@@ -176,7 +347,7 @@ def decode_token(token: str) -> dict:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     payload = decode_token(credentials.credentials)
-    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
+    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0}, max_time_ms=QUERY_BUDGET_MS["account"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
@@ -210,24 +381,87 @@ def calculate_registration_status(race: dict) -> str:
     
     now = datetime.now(timezone.utc)
     try:
-        if 'T' not in open_date and '+' not in open_date:
-            open_dt = datetime.strptime(open_date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
-        else:
-            open_dt = datetime.fromisoformat(open_date.replace('Z', '+00:00'))
-        
+        open_dt = parse_race_date(open_date)
         if now < open_dt:
             return RegistrationStatus.COMING_SOON
         return RegistrationStatus.OPEN
     except Exception:
         return RegistrationStatus.COMING_SOON
 
+# ==================== RACE DATES ====================
+# Stored as BSON datetimes (UTC); the API keeps exposing strings
+RACE_DATE_FIELDS = ('race_date', 'registration_open_date', 'registration_close_date')
+RACE_DATETIME_FIELDS = RACE_DATE_FIELDS + ('created_at',)
+
+def parse_race_date(value) -> Optional[datetime]:
+    """Parse '%Y-%m-%d', full ISO strings or datetimes into an aware UTC datetime"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    value = str(value).strip()
+    if not value:
+        return None
+    if 'T' not in value and '+' not in value and len(value) == 10:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def prepare_race_dates(data: dict) -> dict:
+    """Convert the date fields of a race document to datetimes before writing (in place)"""
+    for field in RACE_DATETIME_FIELDS:
+        if field in data and not isinstance(data[field], datetime):
+            try:
+                data[field] = parse_race_date(data[field])
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Date invalide pour {field}: {data[field]}")
+    return data
+
+# ==================== RACE SORTING ====================
+# Every sort is served by a (status, key, race_date) index walk; the keys are stored on the race
+RACE_SORTS = {
+    "date": [("race_date", 1)],
+    "distance": [("distance_km", 1), ("race_date", 1)],
+    "-distance": [("distance_km", -1), ("race_date", -1)],
+    "elevation": [("elevation_gain", 1), ("race_date", 1)],
+    "-elevation": [("elevation_gain", -1), ("race_date", -1)],
+    "effort": [("km_effort", 1), ("race_date", 1)],
+    "-effort": [("km_effort", -1), ("race_date", -1)],
+    "popularity": [("favorite_count", -1), ("race_date", 1)],
+}
+RACE_SORT_INPUTS = {'distance_km', 'elevation_gain', 'latitude', 'longitude'}
+
+def race_sort_fields(race: dict) -> dict:
+    """Stored sort keys: km_effort (distance + D+/100) and the GeoJSON point of proximity sorting"""
+    fields = {}
+    if race.get('distance_km') is not None:
+        fields['km_effort'] = round(float(race['distance_km']) + float(race.get('elevation_gain') or 0) / 100, 2)
+    if race.get('latitude') is not None and race.get('longitude') is not None:
+        fields['location_point'] = {"type": "Point", "coordinates": [float(race['longitude']), float(race['latitude'])]}
+    return fields
+
+def serialize_race(race: dict) -> dict:
+    """Render stored datetimes as API strings and add registration_status (in place)"""
+    for field in RACE_DATE_FIELDS:
+        if isinstance(race.get(field), datetime):
+            race[field] = race[field].strftime('%Y-%m-%d')
+    created_at = race.get('created_at')
+    if isinstance(created_at, datetime):
+        race['created_at'] = parse_race_date(created_at).isoformat()
+    race['registration_status'] = calculate_registration_status(race)
+    return race
+
+def race_response(race: dict) -> RaceResponse:
+    return RaceResponse(**serialize_race(race))
+
 def send_email(to_email: str, subject: str, html_content: str):
     if not SENDGRID_API_KEY:
         logger.warning("SendGrid API key not configured, skipping email")
         return False
     try:
+        Mail = lazy_import('sendgrid.helpers.mail').Mail
         message = Mail(from_email=SENDER_EMAIL, to_emails=to_email, subject=subject, html_content=html_content)
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
+        sg = lazy_import('sendgrid').SendGridAPIClient(SENDGRID_API_KEY)
         sg.send(message)
         return True
     except Exception as e:
@@ -245,13 +479,14 @@ async def register(user_data: UserCreate):
     user = {
         "id": user_id,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await asyncio.to_thread(hash_password, user_data.password),
         "name": user_data.name,
         "role": UserRole.USER,
         "email_notifications": True,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.users.insert_one(user)
+    await bump_admin_stats({"users": 1})
     token = create_token(user_id, UserRole.USER)
     
     user_response = UserResponse(
@@ -262,8 +497,9 @@ async def register(user_data: UserCreate):
 
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user['password']):
+    user = await db.users.find_one({"email": credentials.email}, {"_id": 0}, max_time_ms=QUERY_BUDGET_MS["account"])
+    # bcrypt is CPU-bound: run it off the event loop
+    if not user or not await asyncio.to_thread(verify_password, credentials.password, user['password']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_token(user['id'], user['role'])
@@ -308,7 +544,7 @@ async def forgot_password(request: ForgotPasswordRequest, background_tasks: Back
     await db.password_resets.insert_one({
         "user_id": user['id'],
         "token": reset_token,
-        "expires_at": expires_at.isoformat(),
+        "expires_at": expires_at,  # BSON date, purged by the TTL index
         "created_at": datetime.now(timezone.utc).isoformat()
     })
     
@@ -341,14 +577,18 @@ async def reset_password(request: ResetPasswordRequest):
     if not reset_doc:
         raise HTTPException(status_code=400, detail="Lien invalide ou expiré")
     
-    # Check expiration
-    expires_at = datetime.fromisoformat(reset_doc['expires_at'].replace('Z', '+00:00'))
+    # Check expiration (the TTL monitor only runs every minute)
+    expires_at = reset_doc['expires_at']
+    if isinstance(expires_at, str):  # tokens created before expires_at became a date
+        expires_at = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+    elif expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
     if datetime.now(timezone.utc) > expires_at:
         await db.password_resets.delete_one({"token": request.token})
         raise HTTPException(status_code=400, detail="Lien expiré")
     
     # Update password
-    new_hash = hash_password(request.new_password)
+    new_hash = await asyncio.to_thread(hash_password, request.new_password)
     await db.users.update_one(
         {"id": reset_doc['user_id']},
         {"$set": {"password": new_hash}}
@@ -360,6 +600,28 @@ async def reset_password(request: ResetPasswordRequest):
     return {"message": "Mot de passe modifié avec succès"}
 
 # ==================== RACES ROUTES ====================
+def race_location_query(region: Optional[str], department: Optional[str]) -> dict:
+    """Filter on the canonical codes stored from the coordinates ("Isere" finds "Isère").
+
+    Races the gazetteer could not place (overseas, unknown department) have no codes:
+    they are matched on the name they were declared with.
+    """
+    gazetteer = get_gazetteer()
+    clauses = []
+    if region:
+        region_code = gazetteer.region_of(region)
+        clauses.append({"$or": [{"region_code": region_code}, {"region_code": None, "region": region}]}
+                       if region_code else {"region": region})
+    if department:
+        department_index = gazetteer.department_of(department)
+        clauses.append({"$or": [{"department_code": gazetteer.department_codes[department_index]},
+                                {"department_code": None, "department": department}]}
+                       if department_index is not None else {"department": department})
+    if len(clauses) == 1 and "$or" not in clauses[0]:
+        return clauses[0]
+    # $and keeps these $or apart from the search one
+    return {"$and": clauses} if clauses else {}
+
 @api_router.get("/races", response_model=List[RaceResponse])
 async def get_races(
     region: Optional[str] = None,
@@ -368,14 +630,22 @@ async def get_races(
     max_distance: Optional[float] = None,
     is_utmb: Optional[bool] = None,
     registration_status: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    upcoming_only: bool = False,
+    sort: str = "date",
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
 ):
+    """Approved races; `sort` is one of RACE_SORTS or `proximity` (needs lat / lon)"""
+    if sort != "proximity" and sort not in RACE_SORTS:
+        raise HTTPException(status_code=400, detail=f"Tri inconnu: {sort} ({', '.join([*RACE_SORTS, 'proximity'])})")
+    if sort == "proximity" and (lat is None or lon is None):
+        raise HTTPException(status_code=400, detail="lat et lon sont requis pour le tri par proximité")
     query = {"status": RaceStatus.APPROVED}
     
-    if region:
-        query["region"] = {"$regex": region, "$options": "i"}
-    if department:
-        query["department"] = {"$regex": department, "$options": "i"}
+    query.update(race_location_query(region, department))
     if is_utmb is not None:
         query["is_utmb"] = is_utmb
     if min_distance is not None:
@@ -388,25 +658,630 @@ async def get_races(
             {"location": {"$regex": search, "$options": "i"}}
         ]
     
-    races = await db.races.find(query, {"_id": 0}).sort("race_date", 1).to_list(500)
+    # Date range on the native race_date, served by the (status, race_date) index
+    date_range = {}
+    try:
+        if date_from:
+            date_range["$gte"] = parse_race_date(date_from)
+        if date_to:
+            date_range["$lte"] = parse_race_date(date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format de date invalide (AAAA-MM-JJ)")
+    if upcoming_only:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        date_range["$gte"] = max(date_range.get("$gte", today), today)
+    if date_range:
+        query["race_date"] = date_range
+    
+    if sort == "proximity":
+        # $geoNear walks the (status, location_point) 2dsphere index nearest first
+        races = await listing_db().races.aggregate([
+            {"$geoNear": {
+                "near": {"type": "Point", "coordinates": [lon, lat]}, "key": "location_point", "query": query,
+                "distanceField": "proximity_km", "distanceMultiplier": 0.001, "spherical": True,
+            }},
+            {"$limit": 500},
+            {"$project": {"_id": 0, "location_point": 0}},
+        ], maxTimeMS=QUERY_BUDGET_MS["browse"]).to_list(500)
+    else:
+        races = await listing_db().races.find(query, {"_id": 0, "location_point": 0}).sort(
+            RACE_SORTS[sort]).max_time_ms(QUERY_BUDGET_MS["browse"]).to_list(500)
     
     result = []
     for race in races:
-        reg_status = calculate_registration_status(race)
-        if registration_status and reg_status != registration_status:
+        if 'proximity_km' in race:
+            race['proximity_km'] = round(race['proximity_km'], 1)
+        serialize_race(race)
+        if registration_status and race['registration_status'] != registration_status:
             continue
-        race['registration_status'] = reg_status
         result.append(RaceResponse(**race))
     
     return result
 
-@api_router.get("/races/{race_id}", response_model=RaceResponse)
-async def get_race(race_id: str):
-    race = await db.races.find_one({"id": race_id}, {"_id": 0})
+@api_router.get("/races/popular", response_model=List[RaceResponse])
+async def get_popular_races(limit: int = Query(10, ge=1, le=50)):
+    """Most followed approved races (served by the (status, favorite_count) index)"""
+    races = await listing_db().races.find(
+        {"status": RaceStatus.APPROVED}, {"_id": 0}
+    ).sort([("favorite_count", -1), ("race_date", 1)]).limit(limit).max_time_ms(QUERY_BUDGET_MS["browse"]).to_list(limit)
+    
+    result = []
+    for race in races:
+        result.append(race_response(race))
+    return result
+
+RACES_BATCH_MAX = 300
+
+@api_router.get("/races/batch")
+async def get_races_batch(ids: List[str] = Query(...)):
+    """Resolve several races in one $in query.
+
+    Accepts `ids=a,b,c` and/or repeated `ids=` parameters. Results follow the
+    input order; unknown ids come back as {"id": ..., "found": false}.
+    """
+    race_ids = list(dict.fromkeys(rid.strip() for value in ids for rid in value.split(',') if rid.strip()))
+    if not race_ids:
+        raise HTTPException(status_code=400, detail="No race id provided")
+    if len(race_ids) > RACES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Maximum {RACES_BATCH_MAX} courses par requête")
+    
+    # Serve what the detail cache already holds, fetch the rest in one query
+    resolved = {}
+    missing = []
+    for race_id in race_ids:
+        cached = race_cache.peek(race_id)
+        if cached is not None:
+            resolved[race_id] = cached
+        else:
+            missing.append(race_id)
+    
+    if missing:
+        races = await db.races.find(
+            {"id": {"$in": missing}}, {"_id": 0}
+        ).max_time_ms(QUERY_BUDGET_MS["detail"]).to_list(len(missing))
+        for race in races:
+            resolved[race['id']] = race_response(race)
+    
+    result = []
+    for race_id in race_ids:
+        race = resolved.get(race_id)
+        if race is None:
+            result.append({"id": race_id, "found": False, "race": None})
+        else:
+            result.append({"id": race_id, "found": True, "race": race})
+    return result
+
+# ==================== RACE EVENTS (SSE) ====================
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_MAX_PENDING = int(os.environ.get('SSE_MAX_PENDING', '100'))  # per connection, after coalescing
+race_events = RaceEventHub(max_connections=int(os.environ.get('SSE_MAX_CONNECTIONS', '5000')))
+# Race fields whose changes are worth pushing to stream subscribers
+RACE_EVENT_FIELDS = {"status", "manual_status", "reported_full", "registration_open_date"}
+
+def publish_race_event(race: dict, event_type: str = "status"):
+    """Called by the write paths that change what a race card shows"""
+    race_events.publish({
+        "type": event_type, "race_id": race['id'], "status": race.get('status'),
+        "registration_status": calculate_registration_status(race) if event_type == "status" else None,
+        "region": race.get('region'), "department": race.get('department'),
+    })
+
+async def refresh_race_event(race_id: str):
+    """Publish the current state of a race changed by another worker (duplicates are dropped by the hub)"""
+    try:
+        race = await db.races.find_one({"id": race_id}, {"_id": 0})
+    except Exception as e:
+        logger.error(f"Race event refresh failed for {race_id}: {e}")
+        return
+    if race:
+        publish_race_event(race)
+    else:
+        publish_race_event({"id": race_id}, "deleted")
+
+@api_router.get("/races/stream")
+async def stream_race_events(
+    ids: Optional[str] = None,
+    region: Optional[str] = None,
+    department: Optional[str] = None,
+):
+    """Server-Sent Events: registration / moderation status changes.
+
+    Subscribe to `ids=a,b,c` (at most RACES_BATCH_MAX) or to every race of a
+    `region` / `department`. Events are `status`, `deleted`, and `resync`
+    when the client fell too far behind and should reload.
+    """
+    race_ids = [rid.strip() for rid in (ids or '').split(',') if rid.strip()]
+    if len(race_ids) > RACES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Maximum {RACES_BATCH_MAX} courses par requête")
+    if race_events.connections >= race_events.max_connections:
+        raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "30"})
+    
+    # Events carry the canonical names: match "Isere" to "Isère"
+    gazetteer = get_gazetteer()
+    if region:
+        region = gazetteer.region_names.get(gazetteer.region_of(region), region)
+    if department and gazetteer.department_of(department) is not None:
+        department = gazetteer.department_names[gazetteer.department_of(department)]
+    
+    async def event_stream():
+        # Subscribed only once the body is iterated: a client gone before that leaves nothing behind
+        subscription = None
+        try:
+            subscription = race_events.subscribe(Subscription(
+                race_ids, {"region": region, "department": department}, max_pending=SSE_MAX_PENDING
+            ))
+            yield f"retry: 5000\nevent: ready\ndata: {{\"seq\":{race_events.sequence}}}\n\n"
+            while True:
+                if not await subscription.wait(SSE_HEARTBEAT_SECONDS):
+                    yield ": ping\n\n"  # keeps proxies from closing idle connections
+                    continue
+                yield "".join(format_sse(event) for event in subscription.drain())
+        finally:
+            if subscription is not None:
+                race_events.unsubscribe(subscription)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+    })
+
+async def load_race_response(race_id: str) -> Optional[RaceResponse]:
+    race = await db.races.find_one({"id": race_id}, {"_id": 0}, max_time_ms=QUERY_BUDGET_MS["detail"])
     if not race:
+        return None
+    return race_response(race)
+
+@api_router.get("/races/{race_id}", response_model=RaceResponse)
+async def get_race(race_id: str, response: Response):
+    # Concurrent requests for the same race share a single find_one
+    try:
+        race = await race_cache.get(race_id, lambda: load_race_response(race_id))
+    except DB_UNAVAILABLE_ERRORS:
+        # Database slow or down: the last known version beats an error page
+        race = race_cache.peek(race_id)
+        if race is None:
+            raise
+        response.headers["X-Data-Stale"] = str(int(race_cache.age(race_id)))
+    if race is None:
         raise HTTPException(status_code=404, detail="Race not found")
-    race['registration_status'] = calculate_registration_status(race)
-    return RaceResponse(**race)
+    return race
+
+# ==================== SIMILAR RACES ====================
+# Fields used by similarity.RaceFeatureIndex (features + "registration open" filter)
+SIMILARITY_PROJECTION = {
+    "_id": 0, "id": 1, "status": 1, "distance_km": 1, "elevation_gain": 1, "latitude": 1, "longitude": 1,
+    "race_date": 1, "registration_open_date": 1, "manual_status": 1, "reported_full": 1, "is_utmb": 1,
+}
+SIMILARITY_FLUSH_DELAY_SECONDS = 1.0  # batch write bursts (imports) into one reload
+similarity_state = {"index": None, "building": None, "flush": None, "pending": set(), "rebuild": False}
+
+async def build_similarity_index():
+    similarity = lazy_import('similarity')
+    started = time.perf_counter()
+    races = await db.races.find({"status": RaceStatus.APPROVED}, SIMILARITY_PROJECTION).to_list(None)
+    index = similarity.RaceFeatureIndex()
+    await asyncio.to_thread(index.build, races)
+    similarity_state["index"] = index
+    logger.info(f"Similarity index built: {len(index)} races in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return index
+
+async def get_similarity_index():
+    """Built on first use; concurrent callers share the same build"""
+    if similarity_state["index"] is not None:
+        return similarity_state["index"]
+    if similarity_state["building"] is None:
+        similarity_state["building"] = asyncio.ensure_future(build_similarity_index())
+        similarity_state["building"].add_done_callback(lambda _: similarity_state.update(building=None))
+    return await asyncio.shield(similarity_state["building"])
+
+def note_similarity_changes(*race_ids: str):
+    """Queue races for an incremental index update (no ids: bulk write, rebuild)"""
+    if similarity_state["index"] is None:
+        return
+    if race_ids:
+        similarity_state["pending"].update(race_ids)
+    else:
+        similarity_state["rebuild"] = True
+    if similarity_state["flush"] is None:
+        similarity_state["flush"] = track_background_job(flush_similarity_changes())
+
+async def flush_similarity_changes():
+    try:
+        await asyncio.sleep(SIMILARITY_FLUSH_DELAY_SECONDS)
+        while similarity_state["pending"] or similarity_state["rebuild"]:
+            index = similarity_state["index"]
+            if similarity_state["rebuild"] or index.needs_refit:
+                similarity_state["rebuild"] = False
+                similarity_state["pending"].clear()
+                await build_similarity_index()
+                continue
+            race_ids = list(similarity_state["pending"])
+            similarity_state["pending"].clear()
+            races = await db.races.find({"id": {"$in": race_ids}}, SIMILARITY_PROJECTION).to_list(len(race_ids))
+            for race in races:
+                index.upsert(race)
+            for race_id in set(race_ids) - {race['id'] for race in races}:
+                index.remove(race_id)
+    except Exception as e:
+        logger.error(f"Similarity index update failed: {e}")
+    finally:
+        similarity_state["flush"] = None
+
+@api_router.get("/races/{race_id}/similar", response_model=List[RaceResponse])
+async def get_similar_races(
+    race_id: str,
+    limit: int = Query(6, ge=1, le=24),
+    registration_open: bool = False,
+):
+    """Upcoming approved races closest in distance, D+, location, season and UTMB status"""
+    index = await get_similarity_index()
+    if race_id not in index.rows:
+        # Unknown, not approved, or created a moment ago and not indexed yet
+        if await race_cache.get(race_id, lambda: load_race_response(race_id)) is None:
+            raise HTTPException(status_code=404, detail="Race not found")
+        return []
+    
+    neighbour_ids = [rid for rid, _ in index.query(race_id, k=limit, registration_open=registration_open)]
+    races = await read_db.races.find(
+        {"id": {"$in": neighbour_ids}}, {"_id": 0}
+    ).max_time_ms(QUERY_BUDGET_MS["detail"]).to_list(len(neighbour_ids))
+    by_id = {race['id']: race for race in races}
+    return [race_response(by_id[rid]) for rid in neighbour_ids if rid in by_id]
+
+# ==================== RECOMMENDATIONS ====================
+# "Runners also followed": recommendations.build_co_favorites() stores the
+# top related races of each race in race_recommendations; requests only read it
+CO_FAVORITES_REBUILD_SECONDS = int(os.environ.get('CO_FAVORITES_REBUILD_SECONDS', '21600'))
+CO_FAVORITES_TOP_N = int(os.environ.get('CO_FAVORITES_TOP_N', '20'))
+CO_FAVORITES_MIN_SUPPORT = int(os.environ.get('CO_FAVORITES_MIN_SUPPORT', '2'))
+CO_FAVORITES_MAX_PAIRS = int(os.environ.get('CO_FAVORITES_MAX_PAIRS', '5000000'))
+CO_FAVORITES_LEASE_SECONDS = 3600
+FOR_YOU_MAX_SEEDS = 100  # most recent favorites used to rank "for you"
+JOB_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+async def acquire_job_lease(name: str, seconds: int) -> bool:
+    """Only one worker runs a given batch job at a time"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.job_leases.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"holder": JOB_HOLDER}]},
+            {"$set": {"holder": JOB_HOLDER, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def run_co_favorites_build(force: bool = False) -> Optional[dict]:
+    """Rebuild the co-favorite model; skipped when favorites did not change since the last build"""
+    recommendations = lazy_import('recommendations')
+    signature = await recommendations.favorites_signature(db)
+    state = await db.job_leases.find_one({"_id": "co-favorites"}, {"signature": 1})
+    if not force and state and state.get('signature') == signature:
+        return None
+    if not await acquire_job_lease("co-favorites", CO_FAVORITES_LEASE_SECONDS):
+        return None
+    try:
+        stats = await recommendations.build_co_favorites(
+            db, top_n=CO_FAVORITES_TOP_N, min_support=CO_FAVORITES_MIN_SUPPORT,
+            max_pairs_in_memory=CO_FAVORITES_MAX_PAIRS,
+        )
+    finally:
+        await db.job_leases.update_one({"_id": "co-favorites"}, {"$set": {"expires_at": datetime.now(timezone.utc)}})
+    await db.job_leases.update_one({"_id": "co-favorites"}, {"$set": {"signature": signature, "last_build": stats}})
+    logger.info(f"Co-favorite model built: {stats}")
+    return stats
+
+async def co_favorites_loop():
+    await asyncio.sleep(BACKGROUND_STARTUP_DELAY_SECONDS)
+    while True:
+        try:
+            await run_co_favorites_build()
+        except Exception as e:
+            logger.error(f"Co-favorite model build error: {e}")
+        await asyncio.sleep(CO_FAVORITES_REBUILD_SECONDS)
+
+async def load_recommended_races(race_ids: List[str], limit: int, exclude: set) -> List[RaceResponse]:
+    """Upcoming approved races among race_ids, in the given order"""
+    race_ids = [rid for rid in race_ids if rid not in exclude]
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    races = await read_db.races.find(
+        {"id": {"$in": race_ids}, "status": RaceStatus.APPROVED, "race_date": {"$gte": today}}, {"_id": 0}
+    ).max_time_ms(QUERY_BUDGET_MS["detail"]).to_list(len(race_ids))
+    by_id = {race['id']: race for race in races}
+    return [race_response(by_id[rid]) for rid in race_ids if rid in by_id][:limit]
+
+@api_router.get("/races/{race_id}/also-followed", response_model=List[RaceResponse])
+async def get_also_followed_races(race_id: str, limit: int = Query(6, ge=1, le=20)):
+    """Upcoming races most often followed by the runners who follow this one"""
+    doc = await read_db.race_recommendations.find_one({"race_id": race_id}, {"_id": 0, "related": 1})
+    if not doc:
+        if await race_cache.get(race_id, lambda: load_race_response(race_id)) is None:
+            raise HTTPException(status_code=404, detail="Race not found")
+        return []
+    return await load_recommended_races([item['race_id'] for item in doc['related']], limit, {race_id})
+
+@api_router.get("/recommendations/for-you", response_model=List[RaceResponse])
+async def get_recommendations_for_you(limit: int = Query(12, ge=1, le=50), user: dict = Depends(get_current_user)):
+    """Races related to the user's favorites (summed co-favorite scores), popular races as a fallback"""
+    favorites = await db.favorites.find(
+        {"user_id": user['id']}, {"_id": 0, "race_id": 1}
+    ).sort([("created_at", -1), ("id", -1)]).limit(FOR_YOU_MAX_SEEDS).to_list(FOR_YOU_MAX_SEEDS)
+    seeds = [favorite['race_id'] for favorite in favorites]
+    followed = set(seeds)
+    if len(seeds) == FOR_YOU_MAX_SEEDS:
+        # Older favorites do not seed the ranking but must not be recommended back
+        followed.update(await db.favorites.distinct("race_id", {"user_id": user['id']}))
+    
+    scores = defaultdict(float)
+    if seeds:
+        async for doc in read_db.race_recommendations.find({"race_id": {"$in": seeds}}, {"_id": 0, "related": 1}):
+            for item in doc['related']:
+                scores[item['race_id']] += item['score']
+    ranked = sorted((rid for rid in scores if rid not in followed), key=scores.get, reverse=True)
+    
+    # Over-fetch: some candidates may be past or unpublished since the last build
+    result = await load_recommended_races(ranked[:limit * 3], limit, followed)
+    if len(result) < limit:
+        seen = followed | {race.id for race in result}
+        popular = await read_db.races.find(
+            {"status": RaceStatus.APPROVED, "id": {"$nin": list(seen)}}, {"_id": 0}
+        ).sort([("favorite_count", -1), ("race_date", 1)]).limit(limit * 2).max_time_ms(QUERY_BUDGET_MS["browse"]).to_list(limit * 2)
+        result.extend(await load_recommended_races([race['id'] for race in popular], limit - len(result), seen))
+    return result
+
+@api_router.post("/admin/recommendations/rebuild")
+async def trigger_co_favorites_build(user: dict = Depends(get_admin_user)):
+    """Rebuild the co-favorite model now (runs in the background)"""
+    track_background_job(run_co_favorites_build(force=True))
+    return {"message": "Reconstruction des recommandations lancée"}
+
+# ==================== COURSE TRACKS (GPX/TCX) ====================
+# Upload first (POST /tracks), then pass the returned track_id to POST/PUT
+# /races: distance and D+ are taken from the track. Unattached uploads
+# expire after TRACK_UPLOAD_TTL_HOURS.
+MAX_TRACK_UPLOAD_BYTES = int(os.environ.get('MAX_TRACK_UPLOAD_MB', '20')) * 1024 * 1024
+MAX_TRACK_POINTS = int(os.environ.get('MAX_TRACK_POINTS', '200000'))
+TRACK_UPLOAD_TTL_HOURS = 24
+
+def read_track_file(source) -> dict:
+    tracks = lazy_import('tracks')
+    return tracks.process_track(*tracks.parse_track(source, max_points=MAX_TRACK_POINTS, max_bytes=MAX_TRACK_UPLOAD_BYTES))
+
+@api_router.post("/tracks")
+async def upload_track(file: UploadFile = File(...), user: dict = Depends(get_current_user)):
+    """Parse a GPX/TCX file; returns its id, distance, D+ and simplified polylines"""
+    if not file.filename.lower().endswith(('.gpx', '.tcx')):
+        raise HTTPException(status_code=400, detail="Le fichier doit être au format GPX ou TCX")
+    too_large = f"Fichier trop volumineux (max {MAX_TRACK_UPLOAD_BYTES // 1024 // 1024} Mo)"
+    if file.size is not None and file.size > MAX_TRACK_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=too_large)
+    
+    tracks = lazy_import('tracks')
+    try:
+        # Streaming parse straight from the spooled upload, off the event loop; the size is
+        # capped while reading too, since chunked uploads come without a declared size
+        summary = await asyncio.to_thread(read_track_file, file.file)
+    except tracks.TrackTooLarge:
+        raise HTTPException(status_code=413, detail=too_large)
+    except tracks.TrackError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    track = {
+        "id": str(uuid.uuid4()),
+        "race_id": None,
+        "uploaded_by": user['id'],
+        "filename": file.filename,
+        **summary,
+        "created_at": datetime.now(timezone.utc),
+        "expire_at": datetime.now(timezone.utc) + timedelta(hours=TRACK_UPLOAD_TTL_HOURS),
+    }
+    await db.race_tracks.insert_one(track)
+    return {key: track[key] for key in ("id", "filename", "distance_km", "elevation_gain", "has_elevation", "points", "bounds", "start", "polylines", "polyline_points")}
+
+async def get_uploaded_track(track_id: str, user: dict, race_id: Optional[str] = None) -> dict:
+    """Uploaded track the user may attach to race_id (a new race when None)"""
+    track = await db.race_tracks.find_one(
+        {"id": track_id}, {"_id": 0, "uploaded_by": 1, "race_id": 1, "distance_km": 1, "elevation_gain": 1, "has_elevation": 1, "start": 1}
+    )
+    if not track:
+        raise HTTPException(status_code=400, detail="Trace introuvable ou expirée, importez-la à nouveau")
+    if track['uploaded_by'] != user['id'] and user['role'] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if track.get('race_id') not in (None, race_id):
+        raise HTTPException(status_code=400, detail="Cette trace est déjà associée à une autre course")
+    return track
+
+def track_elevation(track: dict) -> dict:
+    """D+ taken from a track, empty when the file has no elevation (the submitted value stands)"""
+    # Tracks uploaded before has_elevation was stored only know their D+
+    if track.get('has_elevation', bool(track.get('elevation_gain'))):
+        return {"elevation_gain": track['elevation_gain']}
+    return {}
+
+async def attach_track(track_id: str, race_id: str):
+    await db.race_tracks.update_one({"id": track_id}, {"$set": {"race_id": race_id}, "$unset": {"expire_at": ""}})
+    await db.race_tracks.delete_many({"race_id": race_id, "id": {"$ne": track_id}})
+
+@api_router.get("/races/{race_id}/track")
+async def get_race_track(race_id: str, zoom: Optional[int] = Query(None, ge=0, le=22)):
+    """Encoded polylines of the course (all zoom levels, or the one suited to `zoom`)"""
+    track = await read_db.race_tracks.find_one(
+        {"race_id": race_id},
+        {"_id": 0, "distance_km": 1, "elevation_gain": 1, "bounds": 1, "start": 1, "polylines": 1},
+    )
+    if not track:
+        raise HTTPException(status_code=404, detail="Aucune trace pour cette course")
+    if zoom is not None:
+        levels = sorted(int(level) for level in track['polylines'])
+        level = max([lvl for lvl in levels if lvl <= zoom], default=levels[0])
+        track['zoom'] = level
+        track['polyline'] = track.pop('polylines')[str(level)]
+    return {"race_id": race_id, **track}
+
+@api_router.get("/races/{race_id}/elevation-profile")
+async def get_race_elevation_profile(race_id: str, points: int = Query(200, ge=10, le=500)):
+    """Downsampled elevation profile (distance_km / elevation_m series)"""
+    track = await read_db.race_tracks.find_one(
+        {"race_id": race_id}, {"_id": 0, "distance_km": 1, "elevation_gain": 1, "profile": 1}
+    )
+    if not track:
+        raise HTTPException(status_code=404, detail="Aucune trace pour cette course")
+    profile = lazy_import('tracks').downsample_profile(track['profile'], points)
+    return {"race_id": race_id, "distance_km_total": track['distance_km'], "elevation_gain": track['elevation_gain'], **profile}
+
+# ==================== GEOCODING ====================
+# Offline commune gazetteer (gazetteer.py, data/communes.csv unless GAZETTEER_PATH is set)
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH')
+GEOCODE_MAX_DISTANCE_KM = float(os.environ.get('GEOCODE_MAX_DISTANCE_KM', '30'))
+GEOCODE_DEPARTMENT_MAX_DISTANCE_KM = float(os.environ.get('GEOCODE_DEPARTMENT_MAX_DISTANCE_KM', '200'))
+# Canonical department: nearest commune within REGION_MAX_DISTANCE_KM, the declared one near borders
+REGION_MAX_DISTANCE_KM = float(os.environ.get('REGION_MAX_DISTANCE_KM', '30'))
+REGION_BORDER_KM = float(os.environ.get('REGION_BORDER_KM', '10'))
+gazetteer_state = {"index": None}
+
+def get_gazetteer():
+    if gazetteer_state["index"] is None:
+        gazetteer = lazy_import('gazetteer')
+        gazetteer_state["index"] = gazetteer.Gazetteer.load(Path(GAZETTEER_PATH) if GAZETTEER_PATH else None)
+    return gazetteer_state["index"]
+
+def geocode_race(race: dict) -> dict:
+    """Fill missing coordinates from location + department; reject coordinates far from them (in place).
+
+    Communes the gazetteer does not know (small villages, overseas) are accepted unverified,
+    without coordinates when none were given.
+    """
+    result = get_gazetteer().check(
+        race['location'], race['department'], race.get('latitude'), race.get('longitude'),
+        max_km=GEOCODE_MAX_DISTANCE_KM, department_max_km=GEOCODE_DEPARTMENT_MAX_DISTANCE_KM,
+    )
+    if result['status'] == 'mismatch':
+        raise HTTPException(status_code=400, detail=(
+            f"Coordonnées à {result['distance_km']} km de {result['commune'] or race['department']}, "
+            "vérifiez latitude et longitude"
+        ))
+    race['latitude'], race['longitude'] = result['latitude'], result['longitude']
+    return race
+
+def locate_races(races: List[dict]) -> List[dict]:
+    """Canonical department / region names and codes of each race, from its coordinates"""
+    gazetteer = get_gazetteer()
+    departments = gazetteer.locate_many(
+        [race.get('latitude') for race in races], [race.get('longitude') for race in races],
+        [race.get('department') for race in races], max_km=REGION_MAX_DISTANCE_KM, border_km=REGION_BORDER_KM,
+    )
+    located = []
+    for race, department in zip(races, departments.tolist()):
+        if department < 0:  # abroad or no coordinates: trust the declared department if it is a known one
+            department = gazetteer.department_of(race.get('department'))
+        located.append({"department_code": None, "region_code": None} if department is None or department < 0
+                       else gazetteer.department_info(department))
+    return located
+
+async def backfill_race_regions(batch_size: int = 500) -> int:
+    """Set department_code / region_code on races stored before they existed (walks _id)"""
+    pending = {"department_code": {"$exists": False}}
+    updated = 0
+    last_id = None
+    while True:
+        query = pending if last_id is None else {**pending, "_id": {"$gt": last_id}}
+        batch = await db.races.find(
+            query, {"_id": 1, "latitude": 1, "longitude": 1, "department": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        result = await db.races.bulk_write([
+            UpdateOne({"_id": race['_id']}, {"$set": fields}) for race, fields in zip(batch, locate_races(batch))
+        ], ordered=False)
+        updated += result.modified_count
+        last_id = batch[-1]['_id']
+        await asyncio.sleep(0)
+    if updated:
+        logger.info(f"Region backfill: {updated} race(s) updated")
+        invalidate_race_caches()
+    return updated
+
+@api_router.get("/geocode")
+async def geocode_location(location: str, department: Optional[str] = None):
+    """Coordinates of a French commune (accent-insensitive, department to tell homonyms apart)"""
+    commune = get_gazetteer().lookup(location, department)
+    if commune is None:
+        raise HTTPException(status_code=404, detail="Commune introuvable")
+    return commune
+
+# ==================== DUPLICATE DETECTION ====================
+# Candidates come from the races.geohash blocking index; scoring is duplicates.DuplicateIndex
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', '0.75'))
+DUPLICATE_DATE_WINDOW_DAYS = int(os.environ.get('DUPLICATE_DATE_WINDOW_DAYS', '45'))
+DUPLICATE_PROJECTION = {"_id": 0, "id": 1, "name": 1, "latitude": 1, "longitude": 1, "race_date": 1, "distance_km": 1}
+
+def prepare_race_geohash(race: dict) -> dict:
+    """Store the blocking cell used by duplicate detection (in place)"""
+    if race.get('latitude') is not None and race.get('longitude') is not None:
+        race['geohash'] = geohash(race['latitude'], race['longitude'])
+    return race
+
+def new_duplicate_index() -> DuplicateIndex:
+    return DuplicateIndex(threshold=DUPLICATE_THRESHOLD, date_window_days=DUPLICATE_DATE_WINDOW_DAYS)
+
+async def load_duplicate_index(races: List[dict], date_range: Optional[dict] = None) -> DuplicateIndex:
+    """Index of the stored races (not rejected) in the cells around `races`"""
+    index = new_duplicate_index()
+    cells = set()
+    for race in races:
+        cells |= neighbour_cells(race['latitude'], race['longitude'])
+    if not cells:
+        return index
+    query = {"geohash": {"$in": sorted(cells)}, "status": {"$ne": RaceStatus.REJECTED}}
+    if date_range:
+        query["race_date"] = date_range
+    async for candidate in db.races.find(query, DUPLICATE_PROJECTION).max_time_ms(QUERY_BUDGET_MS["browse"]):
+        index.add(candidate)
+    return index
+
+async def find_duplicate_races(race: dict) -> List[dict]:
+    """Stored races likely to be the same event as `race` (inline check for one race)"""
+    if race.get('latitude') is None or race.get('longitude') is None:
+        return []
+    date_range = None
+    if isinstance(race.get('race_date'), datetime):
+        window = timedelta(days=DUPLICATE_DATE_WINDOW_DAYS)
+        date_range = {"$gte": race['race_date'] - window, "$lte": race['race_date'] + window}
+    index = await load_duplicate_index([race], date_range)
+    return index.find(race)
+
+@api_router.get("/admin/duplicates")
+async def get_duplicate_races(limit: int = Query(100, ge=1, le=1000), user: dict = Depends(get_admin_user)):
+    """Likely duplicate pairs across the whole collection (block by block, not pairwise)"""
+    races = await db.races.find(
+        {"status": {"$ne": RaceStatus.REJECTED}}, DUPLICATE_PROJECTION
+    ).sort("geohash", 1).to_list(None)
+    pairs = await asyncio.to_thread(
+        find_duplicate_pairs, races, threshold=DUPLICATE_THRESHOLD, date_window_days=DUPLICATE_DATE_WINDOW_DAYS
+    )
+    pairs.sort(key=lambda pair: pair['duplicate_of']['score'], reverse=True)
+    return {"races": len(races), "pairs": len(pairs), "duplicates": pairs[:limit]}
+
+async def backfill_race_geohashes(batch_size: int = 500) -> int:
+    """Set races.geohash on races stored before duplicate detection existed (walks _id)"""
+    pending = {"geohash": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}}
+    updated = 0
+    last_id = None
+    while True:
+        query = pending if last_id is None else {**pending, "_id": {"$gt": last_id}}
+        batch = await db.races.find(query, {"_id": 1, "latitude": 1, "longitude": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        result = await db.races.bulk_write([
+            UpdateOne({"_id": race['_id']}, {"$set": {"geohash": geohash(race['latitude'], race['longitude'])}})
+            for race in batch
+        ], ordered=False)
+        updated += result.modified_count
+        last_id = batch[-1]['_id']
+        await asyncio.sleep(0)
+    if updated:
+        logger.info(f"Geohash backfill: {updated} race(s) updated")
+    return updated
 
 @api_router.post("/races", response_model=RaceResponse)
 async def create_race(race_data: RaceCreate, user: dict = Depends(get_current_user)):
@@ -415,14 +1290,40 @@ async def create_race(race_data: RaceCreate, user: dict = Depends(get_current_us
     
     race = {
         "id": race_id,
-        **race_data.model_dump(),
+        **race_data.model_dump(exclude={"track_id", "ignore_duplicates"}),
         "status": status,
         "submitted_by": user['id'],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "favorite_count": 0,
+        "created_at": datetime.now(timezone.utc)
     }
+    if race_data.track_id:
+        track = await get_uploaded_track(race_data.track_id, user)
+        race.update(distance_km=track['distance_km'], has_track=True, **track_elevation(track))
+        if race['elevation_gain'] is None:
+            raise HTTPException(status_code=400, detail="elevation_gain est requis : la trace GPX ne contient pas d'altitude")
+        if race['latitude'] is None or race['longitude'] is None:
+            race['latitude'], race['longitude'] = track['start']
+    elif race['distance_km'] is None or race['elevation_gain'] is None:
+        raise HTTPException(status_code=400, detail="distance_km et elevation_gain sont requis sans trace GPX")
+    geocode_race(race)
+    race.update(locate_races([race])[0])
+    race.update(race_sort_fields(race))
+    prepare_race_dates(race)
+    prepare_race_geohash(race)
+    if not race_data.ignore_duplicates:
+        duplicates = await find_duplicate_races(race)
+        if duplicates:
+            raise HTTPException(status_code=409, detail={
+                "message": "Une course similaire existe déjà", "duplicates": duplicates,
+            })
     await db.races.insert_one(race)
-    race['registration_status'] = calculate_registration_status(race)
-    return RaceResponse(**race)
+    await bump_admin_stats({race_stats_key(status): 1, f"submissions.{stats_week(race['created_at'])}": 1})
+    if race_data.track_id:
+        await attach_track(race_data.track_id, race_id)
+    if status == RaceStatus.APPROVED:
+        invalidate_race_caches()
+        publish_race_event(race)
+    return race_response(race)
 
 @api_router.put("/races/{race_id}", response_model=RaceResponse)
 async def update_race(race_id: str, race_data: RaceUpdate, user: dict = Depends(get_current_user)):
@@ -437,19 +1338,56 @@ async def update_race(race_id: str, race_data: RaceUpdate, user: dict = Depends(
     # Allow resetting manual_status to None (auto mode)
     if 'manual_status' in race_data.model_dump() and race_data.manual_status is None:
         update_data['manual_status'] = None
+    prepare_race_dates(update_data)
+    track_id = update_data.pop('track_id', None)
+    if update_data.keys() & {'location', 'department', 'latitude', 'longitude'}:
+        merged = {**race, **update_data}
+        if update_data.keys() & {'latitude', 'longitude'}:
+            geocode_race(merged)
+        else:
+            # Moved to another commune: follow it when the gazetteer knows it
+            commune = get_gazetteer().lookup(merged['location'], merged['department'])
+            if commune:
+                merged['latitude'], merged['longitude'] = commune['latitude'], commune['longitude']
+        if (merged['latitude'], merged['longitude']) != (race.get('latitude'), race.get('longitude')):
+            update_data['latitude'], update_data['longitude'] = merged['latitude'], merged['longitude']
+    if 'latitude' in update_data or 'longitude' in update_data:
+        latitude, longitude = update_data.get('latitude', race.get('latitude')), update_data.get('longitude', race.get('longitude'))
+        if latitude is not None and longitude is not None:
+            update_data['geohash'] = geohash(latitude, longitude)
+    if update_data.keys() & {'department', 'region', 'latitude', 'longitude'}:
+        update_data.update(locate_races([{**race, **update_data}])[0])
+    if track_id:
+        track = await get_uploaded_track(track_id, user, race_id)
+        update_data.update(distance_km=track['distance_km'], has_track=True, **track_elevation(track))
+        if update_data.get('elevation_gain', race.get('elevation_gain')) is None:
+            raise HTTPException(status_code=400, detail="elevation_gain est requis : la trace GPX ne contient pas d'altitude")
+    if update_data.keys() & RACE_SORT_INPUTS:
+        update_data.update(race_sort_fields({**race, **update_data}))
     
     if update_data:
         await db.races.update_one({"id": race_id}, {"$set": update_data})
+        invalidate_race_caches(race_id)
+    if track_id:
+        await attach_track(track_id, race_id)
     
     updated = await db.races.find_one({"id": race_id}, {"_id": 0})
-    updated['registration_status'] = calculate_registration_status(updated)
-    return RaceResponse(**updated)
+    if update_data.keys() & RACE_EVENT_FIELDS:
+        publish_race_event(updated)
+    return race_response(updated)
 
 @api_router.delete("/races/{race_id}")
 async def delete_race(race_id: str, user: dict = Depends(get_admin_user)):
-    result = await db.races.delete_one({"id": race_id})
-    if result.deleted_count == 0:
+    deleted = await db.races.find_one_and_delete({"id": race_id}, {"_id": 0, "status": 1, "created_at": 1})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Race not found")
+    increments = {race_stats_key(deleted.get('status')): -1}
+    if isinstance(deleted.get('created_at'), datetime):
+        increments[f"submissions.{stats_week(deleted['created_at'])}"] = -1
+    await bump_admin_stats(increments)
+    invalidate_race_caches(race_id)
+    publish_race_event({"id": race_id}, "deleted")
+    await db.race_tracks.delete_many({"race_id": race_id})
     return {"message": "Race deleted"}
 
 # ==================== ADMIN ROUTES ====================
@@ -458,8 +1396,7 @@ async def get_pending_races(user: dict = Depends(get_admin_user)):
     races = await db.races.find({"status": RaceStatus.PENDING}, {"_id": 0}).to_list(100)
     result = []
     for race in races:
-        race['registration_status'] = calculate_registration_status(race)
-        result.append(RaceResponse(**race))
+        result.append(race_response(race))
     return result
 
 @api_router.get("/admin/races", response_model=List[RaceResponse])
@@ -468,10 +1405,59 @@ async def get_all_races_admin(user: dict = Depends(get_admin_user)):
     races = await db.races.find({"status": RaceStatus.APPROVED}, {"_id": 0}).sort("name", 1).to_list(500)
     result = []
     for race in races:
-        race['registration_status'] = calculate_registration_status(race)
-        result.append(RaceResponse(**race))
+        result.append(race_response(race))
     return result
 
+MODERATION_BATCH_MAX = int(os.environ.get('MODERATION_BATCH_MAX', '500'))
+
+def bulk_ids(race_ids: List[str]) -> List[str]:
+    """Deduplicated ids of a bulk admin request, within MODERATION_BATCH_MAX"""
+    race_ids = list(dict.fromkeys(race_ids))
+    if not race_ids:
+        raise HTTPException(status_code=400, detail="Aucune course sélectionnée")
+    if len(race_ids) > MODERATION_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Maximum {MODERATION_BATCH_MAX} courses par requête")
+    return race_ids
+
+@api_router.post("/admin/moderate/bulk")
+async def moderate_races_bulk(batch: BulkModerateAction, background_tasks: BackgroundTasks, user: dict = Depends(get_admin_user)):
+    """Approve or reject many races in one update_many, with a status per race id"""
+    if batch.action not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="Action invalide (approve ou reject)")
+    race_ids = bulk_ids(batch.race_ids)
+    new_status = RaceStatus.APPROVED if batch.action == "approve" else RaceStatus.REJECTED
+    
+    races = {race['id']: race async for race in db.races.find({"id": {"$in": race_ids}}, {"_id": 0})}
+    by_status = defaultdict(list)
+    for rid in race_ids:
+        if rid in races and races[rid].get('status') != new_status:
+            by_status[races[rid].get('status')].append(rid)
+    # One update per previous status, conditional on it: modified_count is exactly what moved
+    # from that status, so a race moderated concurrently is neither counted twice nor re-announced
+    changed, increments = [], defaultdict(int)
+    for old_status, ids in by_status.items():
+        result = await db.races.update_many({"id": {"$in": ids}, "status": old_status}, {"$set": {"status": new_status}})
+        if result.modified_count < len(ids):
+            ids = [race['id'] async for race in db.races.find(
+                {"id": {"$in": ids}, "status": new_status}, {"_id": 0, "id": 1})][:result.modified_count]
+        changed += ids
+        increments[race_stats_key(old_status)] -= result.modified_count
+        increments[race_stats_key(new_status)] += result.modified_count
+    if changed:
+        await bump_admin_stats(increments)
+        invalidate_race_caches(*changed)
+        for rid in changed:
+            publish_race_event({**races[rid], "status": new_status})
+        if new_status == RaceStatus.APPROVED:
+            background_tasks.add_task(notify_races_approved, [races[rid] for rid in changed])
+    
+    changed_set = set(changed)
+    results = {
+        rid: f"{batch.action}d" if rid in changed_set else ("unchanged" if rid in races else "not_found")
+        for rid in race_ids
+    }
+    return {"results": results, "modified": len(changed)}
+
 @api_router.post("/admin/moderate/{race_id}")
 async def moderate_race(race_id: str, action: ModerateAction, background_tasks: BackgroundTasks, user: dict = Depends(get_admin_user)):
     race = await db.races.find_one({"id": race_id}, {"_id": 0})
@@ -479,17 +1465,39 @@ async def moderate_race(race_id: str, action: ModerateAction, background_tasks:
         raise HTTPException(status_code=404, detail="Race not found")
     
     new_status = RaceStatus.APPROVED if action.action == "approve" else RaceStatus.REJECTED
-    await db.races.update_one({"id": race_id}, {"$set": {"status": new_status}})
+    if race.get('status') == new_status:
+        return {"message": f"Race already {new_status.value}"}
+    # Conditional on the status read above: a concurrent moderation wins, nothing is done twice
+    result = await db.races.update_one({"id": race_id, "status": race.get('status')}, {"$set": {"status": new_status}})
+    if not result.modified_count:
+        return {"message": "Race already moderated"}
+    await bump_admin_stats({race_stats_key(race.get('status')): -1, race_stats_key(new_status): 1})
+    invalidate_race_caches(race_id)
+    publish_race_event({**race, "status": new_status})
     
     # Notify subscribers if approved
     if new_status == RaceStatus.APPROVED:
-        background_tasks.add_task(notify_race_approved, race)
+        background_tasks.add_task(notify_races_approved, [race])
     
     return {"message": f"Race {action.action}d successfully"}
 
-async def notify_race_approved(race: dict):
-    # Notify all users who have notifications enabled
-    logger.info(f"Race approved: {race['name']}")
+async def notify_races_approved(races: List[dict]):
+    # One task per moderation request, however many races it approved
+    logger.info(f"{len(races)} race(s) approved: {', '.join(race['name'] for race in races[:10])}")
+
+@api_router.get("/admin/cache/races")
+async def get_race_cache_stats(limit: int = Query(20, ge=1, le=100), user: dict = Depends(get_admin_user)):
+    """Race detail cache counters and the hottest race ids"""
+    hot = race_cache.hot_keys(limit)
+    for item in hot:
+        cached = race_cache.peek(item['key'])
+        item['race_name'] = cached.name if cached is not None else None
+    return {
+        "stats": race_cache.stats(), "hot_races": hot, "responses": response_cache.stats(),
+        "invalidation": {"mode": invalidation_bus.mode, **invalidation_bus.stats},
+        "events": race_events.stats(),
+        "similarity": {"races": len(similarity_state["index"] or ()), "pending": len(similarity_state["pending"])},
+    }
 
 # ==================== IMPORT ROUTES ====================
 @api_router.post("/admin/import")
@@ -499,8 +1507,10 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
         raise HTTPException(status_code=400, detail="Le fichier doit être au format Excel (.xlsx ou .xls)")
     
     try:
+        pd = lazy_import('pandas')
         contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents), sheet_name='Courses')
+        # Parsing a large workbook takes seconds of CPU: keep it off the event loop
+        df = await asyncio.to_thread(pd.read_excel, io.BytesIO(contents), sheet_name='Courses')
         
         # Remove empty rows
         df = df.dropna(subset=['name'])
@@ -515,9 +1525,27 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
         imported_count = 0
         skipped_count = 0
         errors = []
+        # Coordinates are optional: geocode / validate every row at once from location + department
+        def coordinate_column(column):
+            if column not in df:
+                return [None] * len(df)
+            return [None if pd.isna(value) else value for value in pd.to_numeric(df[column], errors='coerce')]
+        geocoded = dict(zip(df.index, get_gazetteer().check_many(
+            df['location'].fillna('').astype(str).tolist(), df['department'].fillna('').astype(str).tolist(),
+            coordinate_column('latitude'), coordinate_column('longitude'),
+            max_km=GEOCODE_MAX_DISTANCE_KM, department_max_km=GEOCODE_DEPARTMENT_MAX_DISTANCE_KM,
+        )))
+        
+        # One query for the existing races around every row, then in-memory blocking
+        duplicate_index = await load_duplicate_index(
+            [result for result in geocoded.values() if result['latitude'] is not None]
+        )
+        regions = dict(zip(df.index, locate_races([
+            {**geocoded[idx], "department": str(department)} for idx, department in df['department'].items()
+        ])))
         
         required_fields = ['name', 'description', 'location', 'region', 'department', 
-                          'latitude', 'longitude', 'distance_km', 'elevation_gain',
+                          'distance_km', 'elevation_gain',
                           'race_date', 'registration_open_date', 'is_utmb']
         
         for idx, row in df.iterrows():
@@ -533,10 +1561,10 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
                     skipped_count += 1
                     continue
                 
-                # Check if race already exists
-                existing = await db.races.find_one({"name": str(row['name']).strip()})
-                if existing:
-                    errors.append(f"Ligne {idx + 2}: Course '{row['name']}' existe déjà")
+                location_check = geocoded[idx]
+                if location_check['status'] == 'mismatch':
+                    errors.append(f"Ligne {idx + 2}: Coordonnées à {location_check['distance_km']} km de "
+                                  f"{location_check['commune'] or row['department']}")
                     skipped_count += 1
                     continue
                 
@@ -562,8 +1590,8 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
                     "location": str(row['location']).strip(),
                     "region": str(row['region']).strip(),
                     "department": str(row['department']).strip(),
-                    "latitude": float(row['latitude']),
-                    "longitude": float(row['longitude']),
+                    "latitude": location_check['latitude'],
+                    "longitude": location_check['longitude'],
                     "distance_km": float(row['distance_km']),
                     "elevation_gain": int(float(row['elevation_gain'])),
                     "race_date": parse_date(row['race_date']),
@@ -574,8 +1602,21 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
                     "image_url": str(row.get('image_url', '')).strip() if pd.notna(row.get('image_url')) else None,
                     "status": RaceStatus.APPROVED,  # Admin import = auto-approved
                     "submitted_by": user['id'],
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "favorite_count": 0,
+                    "created_at": datetime.now(timezone.utc)
                 }
+                race.update(regions[idx])
+                race.update(race_sort_fields(race))
+                prepare_race_dates(race)
+                prepare_race_geohash(race)
+                
+                # Existing races and earlier rows of the same file
+                duplicates = duplicate_index.find(race, limit=1)
+                if duplicates:
+                    errors.append(f"Ligne {idx + 2}: Course '{row['name']}' existe déjà ('{duplicates[0]['name']}')")
+                    skipped_count += 1
+                    continue
+                duplicate_index.add(race)
                 
                 await db.races.insert_one(race)
                 imported_count += 1
@@ -584,6 +1625,13 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
                 errors.append(f"Ligne {idx + 2}: Erreur - {str(e)}")
                 skipped_count += 1
         
+        if imported_count:
+            await bump_admin_stats({
+                race_stats_key(RaceStatus.APPROVED): imported_count,
+                f"submissions.{stats_week(datetime.now(timezone.utc))}": imported_count,
+            })
+            invalidate_race_caches()
+        
         return {
             "message": f"Import terminé: {imported_count} course(s) importée(s), {skipped_count} ignorée(s)",
             "imported": imported_count,
@@ -599,49 +1647,184 @@ async def import_races_from_excel(file: UploadFile = File(...), user: dict = Dep
 async def delete_all_races(user: dict = Depends(get_admin_user)):
     """Delete all races (use with caution)"""
     result = await db.races.delete_many({})
-    return {"message": f"{result.deleted_count} course(s) supprimée(s)"}
+    stats_pending = not await refresh_admin_stats()
+    race_cache.clear()
+    race_write_state["last_write"] = time.monotonic()
+    response_cache.clear()
+    calendar_events.clear()
+    calendar_feeds.clear()
+    invalidation_bus.publish("races", "invalidate")
+    message = f"{result.deleted_count} course(s) supprimée(s)"
+    if stats_pending:
+        message += f" ({ADMIN_STATS_PENDING_MESSAGE})"
+    return {"message": message, "stats_pending": stats_pending}
 
 # ==================== FAVORITES ROUTES ====================
+# Fields embedded for each race in the favorites list (enough for cards + status)
+FAVORITE_RACE_SUMMARY = {
+    "_id": 0, "id": 1, "name": 1, "location": 1, "region": 1, "department": 1,
+    "distance_km": 1, "elevation_gain": 1, "race_date": 1, "registration_open_date": 1,
+    "registration_close_date": 1, "manual_status": 1, "reported_full": 1, "is_utmb": 1,
+    "image_url": 1, "status": 1, "favorite_count": 1
+}
+FAVORITES_BATCH_MAX = 200
+
+def encode_favorite_cursor(favorite: dict) -> str:
+    return f"{favorite['created_at']}|{favorite['id']}"
+
+def decode_favorite_cursor(cursor: str) -> dict:
+    created_at, sep, fav_id = cursor.rpartition('|')
+    if not sep or not created_at or not fav_id:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": fav_id}}
+    ]}
+
 @api_router.get("/favorites", response_model=List[dict])
-async def get_favorites(user: dict = Depends(get_current_user)):
-    favorites = await db.favorites.find({"user_id": user['id']}, {"_id": 0}).to_list(100)
+async def get_favorites(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Favorites with an embedded race summary, newest first.
+
+    Single aggregation ($lookup) instead of two queries. Without `limit` every
+    favorite is returned; with `limit` the next page cursor is sent in the
+    X-Next-Cursor header.
+    """
+    match = {"user_id": user['id']}
+    if cursor:
+        match.update(decode_favorite_cursor(cursor))
     
-    # Collect all race IDs for bulk query (avoid N+1)
-    race_ids = [fav['race_id'] for fav in favorites]
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "id": -1}},
+    ]
+    if limit:
+        pipeline.append({"$limit": limit + 1})
+    pipeline += [
+        {"$lookup": {
+            "from": "races",
+            "localField": "race_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": FAVORITE_RACE_SUMMARY}],
+            "as": "race"
+        }},
+        # Kept when the race is gone so paging is decided on the favorites themselves
+        {"$unwind": {"path": "$race", "preserveNullAndEmptyArrays": True}},
+        {"$project": {"_id": 0, "race": 1, "favorite": {
+            "id": "$id", "user_id": "$user_id", "race_id": "$race_id",
+            "notify_on_registration": "$notify_on_registration", "created_at": "$created_at"
+        }}}
+    ]
     
-    # Single bulk query for all races
-    races = await db.races.find({"id": {"$in": race_ids}}, {"_id": 0}).to_list(100)
-    races_dict = {race['id']: race for race in races}
+    items = await db.favorites.aggregate(pipeline, maxTimeMS=QUERY_BUDGET_MS["account"]).to_list(None)
+    if limit and len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = encode_favorite_cursor(items[-1]['favorite'])
     
+    # Favorites of deleted races are skipped (a page may then hold fewer than `limit` items)
     result = []
-    for fav in favorites:
-        race = races_dict.get(fav['race_id'])
-        if race:
-            race['registration_status'] = calculate_registration_status(race)
-            result.append({
-                "favorite": fav,
-                "race": race
-            })
+    for item in items:
+        if item.get('race'):
+            serialize_race(item['race'])
+            result.append(item)
     return result
 
-@api_router.post("/favorites/{race_id}")
-async def add_favorite(race_id: str, notify: bool = True, user: dict = Depends(get_current_user)):
-    race = await db.races.find_one({"id": race_id}, {"_id": 0})
-    if not race:
-        raise HTTPException(status_code=404, detail="Race not found")
+@api_router.post("/favorites/batch")
+async def batch_favorites(batch: FavoriteBatch, user: dict = Depends(get_current_user)):
+    """Add and/or remove many favorites at once, with a status per race id"""
+    add_ids = list(dict.fromkeys(batch.add))
+    add_set = set(add_ids)
+    remove_ids = [rid for rid in dict.fromkeys(batch.remove) if rid not in add_set]
+    if len(add_ids) + len(remove_ids) > FAVORITES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Maximum {FAVORITES_BATCH_MAX} courses par requête")
     
-    existing = await db.favorites.find_one({"user_id": user['id'], "race_id": race_id})
-    if existing:
-        raise HTTPException(status_code=400, detail="Already in favorites")
+    results = {}
+    
+    if add_ids:
+        known = set(await db.races.distinct("id", {"id": {"$in": add_ids}}))
+        to_add = [rid for rid in add_ids if rid in known]
+        for rid in add_ids:
+            if rid not in known:
+                results[rid] = "not_found"
+        
+        if to_add:
+            now = datetime.now(timezone.utc).isoformat()
+            operations = [
+                UpdateOne(
+                    {"user_id": user['id'], "race_id": rid},
+                    {"$setOnInsert": {"id": str(uuid.uuid4()), "notify_on_registration": batch.notify, "created_at": now}},
+                    upsert=True
+                )
+                for rid in to_add
+            ]
+            try:
+                write = await db.favorites.bulk_write(operations, ordered=False)
+                upserted = write.upserted_ids
+            except BulkWriteError as e:
+                # A concurrent add of the same favorite hit the unique (user_id, race_id) index
+                if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                    raise
+                upserted = {entry['index']: entry['_id'] for entry in e.details.get('upserted', [])}
+            inserted = {to_add[index] for index in upserted}
+            for rid in to_add:
+                results[rid] = "added" if rid in inserted else "already_favorite"
+            if inserted:
+                await db.races.bulk_write(
+                    [UpdateOne({"id": rid}, {"$inc": {"favorite_count": 1}}) for rid in inserted],
+                    ordered=False
+                )
+                await bump_admin_stats({"favorites": len(inserted)})
+                invalidate_user_calendar(user['id'])
+    
+    if remove_ids:
+        # One delete per race: only what this request really deleted is decremented
+        # (two concurrent removes of the same favorite must not both count)
+        deletes = await asyncio.gather(*[
+            db.favorites.delete_one({"user_id": user['id'], "race_id": rid}) for rid in remove_ids
+        ])
+        existing = {rid for rid, deleted in zip(remove_ids, deletes) if deleted.deleted_count}
+        if existing:
+            await db.races.bulk_write(
+                [UpdateOne({"id": rid}, {"$inc": {"favorite_count": -1}}) for rid in existing],
+                ordered=False
+            )
+            await bump_admin_stats({"favorites": -len(existing)})
+            invalidate_user_calendar(user['id'])
+        for rid in remove_ids:
+            results[rid] = "removed" if rid in existing else "not_favorite"
     
+    return {"results": results}
+
+@api_router.post("/favorites/{race_id}")
+async def add_favorite(race_id: str, notify: bool = True, user: dict = Depends(get_current_user)):
     favorite = {
         "id": str(uuid.uuid4()),
-        "user_id": user['id'],
-        "race_id": race_id,
         "notify_on_registration": notify,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.favorites.insert_one(favorite)
+    # Conditional upsert: the unique (user_id, race_id) index makes it a no-op if already present
+    try:
+        result = await db.favorites.update_one(
+            {"user_id": user['id'], "race_id": race_id},
+            {"$setOnInsert": favorite},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Already in favorites")
+    if result.upserted_id is None:
+        raise HTTPException(status_code=400, detail="Already in favorites")
+    
+    # The counter increment doubles as the race existence check
+    race_result = await db.races.update_one({"id": race_id}, {"$inc": {"favorite_count": 1}})
+    if race_result.matched_count == 0:
+        await db.favorites.delete_one({"_id": result.upserted_id})
+        raise HTTPException(status_code=404, detail="Race not found")
+    await bump_admin_stats({"favorites": 1})
+    invalidate_user_calendar(user['id'])
     return {"message": "Added to favorites"}
 
 @api_router.delete("/favorites/{race_id}")
@@ -649,6 +1832,9 @@ async def remove_favorite(race_id: str, user: dict = Depends(get_current_user)):
     result = await db.favorites.delete_one({"user_id": user['id'], "race_id": race_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Favorite not found")
+    await db.races.update_one({"id": race_id}, {"$inc": {"favorite_count": -1}})
+    await bump_admin_stats({"favorites": -1})
+    invalidate_user_calendar(user['id'])
     return {"message": "Removed from favorites"}
 
 @api_router.put("/favorites/{race_id}/notify")
@@ -670,19 +1856,178 @@ async def update_user_settings(email_notifications: bool, user: dict = Depends(g
     )
     return {"message": "Settings updated"}
 
+# ==================== CALENDAR FEEDS (iCalendar) ====================
+# Calendar apps poll subscriptions often: a poll of an unchanged feed is a dictionary lookup
+# (and a 304 with If-None-Match). Feeds are rebuilt from the cached per-race blocks only when
+# a favorite of the user or a race they contain changes (filtered feeds: any race change).
+CALENDAR_FEED_MAX_RACES = int(os.environ.get('CALENDAR_FEED_MAX_RACES', '500'))
+CALENDAR_FEED_MAX_AGE_SECONDS = int(os.environ.get('CALENDAR_FEED_MAX_AGE_SECONDS', '900'))  # HTTP caching hint
+CALENDAR_RACE_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "location": 1, "department": 1, "latitude": 1, "longitude": 1,
+    "distance_km": 1, "elevation_gain": 1, "is_utmb": 1, "race_date": 1, "registration_open_date": 1,
+    "created_at": 1, "status": 1,
+}
+
+async def calendar_blocks(race_ids: List[str]) -> List[bytes]:
+    """VEVENT blocks of these races, serializing only the ones not cached yet"""
+    blocks = {race_id: calendar_events.peek(race_id) for race_id in race_ids}
+    missing = [race_id for race_id, block in blocks.items() if block is None]
+    if missing:
+        # Read before the find: a race invalidated meanwhile does not get its old block back
+        generations = {race_id: calendar_events.generation(race_id) for race_id in missing}
+        races = await db.races.find(
+            {"id": {"$in": missing}}, CALENDAR_RACE_FIELDS
+        ).max_time_ms(QUERY_BUDGET_MS["browse"]).to_list(len(missing))
+        found = {race['id']: race for race in races}
+        for race_id in missing:
+            race = found.get(race_id)
+            # Pending, rejected or deleted races are cached as empty blocks too
+            approved = race is not None and race.get('status') == RaceStatus.APPROVED
+            block = race_to_ics(race, os.environ.get('FRONTEND_URL', 'http://localhost:3000')) if approved else b""
+            calendar_events.set(race_id, block, generations[race_id])
+            blocks[race_id] = block
+    return [blocks[race_id] for race_id in race_ids]
+
+async def build_calendar_feed(key: str, name: str, tags: List[str], load_race_ids) -> dict:
+    """Assemble a feed from the race ids returned by `load_race_ids` and cache it"""
+    generation = calendar_feeds.generation
+    race_ids = await load_race_ids()
+    body = build_calendar(name, await calendar_blocks(race_ids))
+    entry = {
+        "body": body,
+        "etag": feed_etag(body),
+        "tags": (*tags, *(f"race:{race_id}" for race_id in race_ids)),
+        "stored_at": time.monotonic(),
+    }
+    # Dropped by set() when one of its tags (its user, one of its races...) was invalidated meanwhile
+    calendar_feeds.set(key, entry, generation)
+    return entry
+
+def calendar_response(entry: dict, if_none_match: Optional[str], cache_control: str) -> Response:
+    headers = {"ETag": entry["etag"], "Cache-Control": cache_control}
+    if if_none_match and entry["etag"] in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="text/calendar; charset=utf-8", headers=headers)
+
+def calendar_token_response(token: str) -> dict:
+    return {"token": token, "path": f"/api/calendar/favorites/{token}.ics"}
+
+@api_router.get("/calendar/token")
+async def get_calendar_token(user: dict = Depends(get_current_user)):
+    """Private favorites feed of the user (the token is created on first use)"""
+    token = user.get('calendar_token')
+    if not token:
+        await db.users.update_one(
+            {"id": user['id'], "calendar_token": {"$exists": False}},
+            {"$set": {"calendar_token": secrets.token_urlsafe(24)}}
+        )
+        stored = await db.users.find_one({"id": user['id']}, {"_id": 0, "calendar_token": 1})
+        token = stored['calendar_token']
+    return calendar_token_response(token)
+
+@api_router.post("/calendar/token")
+async def regenerate_calendar_token(user: dict = Depends(get_current_user)):
+    """Revoke the current feed URL (e.g. shared by mistake) and issue a new one"""
+    token = secrets.token_urlsafe(24)
+    await db.users.update_one({"id": user['id']}, {"$set": {"calendar_token": token}})
+    invalidate_user_calendar(user['id'])
+    return calendar_token_response(token)
+
+@api_router.get("/calendar/races.ics")
+async def get_races_calendar(
+    region: Optional[str] = None,
+    department: Optional[str] = None,
+    min_distance: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    is_utmb: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Public feed of the upcoming approved races matching the filters"""
+    filters = race_location_query(region, department)
+    if is_utmb is not None:
+        filters["is_utmb"] = is_utmb
+    if min_distance is not None:
+        filters["distance_km"] = {"$gte": min_distance}
+    if max_distance is not None:
+        filters.setdefault("distance_km", {})["$lte"] = max_distance
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Keyed by the filters and the day, so past races leave the feed without any invalidation
+    key = f"races:{today:%Y-%m-%d}:{sorted(filters.items())}"
+    entry = calendar_feeds.lookup(key)
+    if entry is None:
+        gazetteer = get_gazetteer()
+        department_index = gazetteer.department_of(department) if department else None
+        label = (gazetteer.department_names[department_index] if department_index is not None else department) \
+            or gazetteer.region_names.get(gazetteer.region_of(region), region)
+        query = {"status": RaceStatus.APPROVED, "race_date": {"$gte": today}, **filters}
+
+        async def load_race_ids():
+            races = await listing_db().races.find(query, {"_id": 0, "id": 1}).sort(RACE_SORTS["date"]).limit(
+                CALENDAR_FEED_MAX_RACES).max_time_ms(QUERY_BUDGET_MS["browse"]).to_list(CALENDAR_FEED_MAX_RACES)
+            return [race['id'] for race in races]
+
+        name = f"Trouve Ton Dossard - {label}" if label else "Trouve Ton Dossard"
+        entry = await build_calendar_feed(key, name, ["races"], load_race_ids)
+    return calendar_response(entry, if_none_match, f"public, max-age={CALENDAR_FEED_MAX_AGE_SECONDS}")
+
+@api_router.get("/calendar/favorites/{token}.ics")
+async def get_favorites_calendar(token: str, if_none_match: Optional[str] = Header(None)):
+    """Private feed of a user's favorite races; the token in the URL is the only credential"""
+    key = f"favorites:{token}"
+    entry = calendar_feeds.lookup(key)
+    if entry is None:
+        user = await db.users.find_one(
+            {"calendar_token": token}, {"_id": 0, "id": 1}, max_time_ms=QUERY_BUDGET_MS["account"]
+        )
+        if not user:
+            raise HTTPException(status_code=404, detail="Calendrier introuvable")
+
+        async def load_race_ids():
+            # Covered by the unique (user_id, race_id) index
+            favorites = await db.favorites.find(
+                {"user_id": user['id']}, {"_id": 0, "race_id": 1}
+            ).sort("race_id", 1).limit(CALENDAR_FEED_MAX_RACES).max_time_ms(
+                QUERY_BUDGET_MS["account"]).to_list(CALENDAR_FEED_MAX_RACES)
+            return [favorite['race_id'] for favorite in favorites]
+
+        entry = await build_calendar_feed(
+            key, "Mes courses - Trouve Ton Dossard", ["favorites", f"user:{user['id']}"], load_race_ids
+        )
+    return calendar_response(entry, if_none_match, f"private, max-age={CALENDAR_FEED_MAX_AGE_SECONDS}")
+
 # ==================== FILTERS DATA ====================
 @api_router.get("/filters/regions")
 async def get_regions():
-    regions = await db.races.distinct("region", {"status": RaceStatus.APPROVED})
-    return sorted([r for r in regions if r])
+    """Canonical region names, plus the declared ones of races the gazetteer could not place"""
+    query = {"status": RaceStatus.APPROVED}
+    codes, declared = await asyncio.gather(
+        listing_db().races.distinct("region_code", query, maxTimeMS=QUERY_BUDGET_MS["facets"]),
+        listing_db().races.distinct("region", {**query, "region_code": None}, maxTimeMS=QUERY_BUDGET_MS["facets"]),
+    )
+    gazetteer = get_gazetteer()
+    names = {gazetteer.region_names[code] for code in codes if code in gazetteer.region_names}
+    return sorted(names | {name for name in declared if name})
 
 @api_router.get("/filters/departments")
 async def get_departments(region: Optional[str] = None):
+    """Canonical department names, from the (status, region_code, department_code) index"""
+    gazetteer = get_gazetteer()
     query = {"status": RaceStatus.APPROVED}
+    uncoded = {**query, "department_code": None}
+    codes = []
     if region:
-        query["region"] = region
-    departments = await db.races.distinct("department", query)
-    return sorted([d for d in departments if d])
+        region_code = gazetteer.region_of(region)
+        uncoded["region"] = region
+        if region_code is not None:
+            codes = await listing_db().races.distinct(
+                "department_code", {**query, "region_code": region_code}, maxTimeMS=QUERY_BUDGET_MS["facets"])
+    else:
+        codes = await listing_db().races.distinct("department_code", query, maxTimeMS=QUERY_BUDGET_MS["facets"])
+    declared = await listing_db().races.distinct("department", uncoded, maxTimeMS=QUERY_BUDGET_MS["facets"])
+    departments = [gazetteer.department_of(code) for code in codes if code]
+    names = {gazetteer.department_names[index] for index in departments if index is not None}
+    return sorted(names | {name for name in declared if name})
 
 # ==================== SEED DATA ====================
 @api_router.post("/seed")
@@ -877,8 +2222,19 @@ async def seed_data():
         }
     ]
     
+    for race in races:
+        prepare_race_dates(race)
+        prepare_race_geohash(race)
+    for race, fields in zip(races, locate_races(races)):
+        race.update(fields)
+        race.update(race_sort_fields(race))
     await db.races.insert_many(races)
-    return {"message": f"Seeded {len(races)} races and 1 admin user"}
+    stats_pending = not await refresh_admin_stats()
+    invalidate_race_caches()
+    message = f"Seeded {len(races)} races and 1 admin user"
+    if stats_pending:
+        message += f" ({ADMIN_STATS_PENDING_MESSAGE})"
+    return {"message": message, "stats_pending": stats_pending}
 
 # ==================== ROOT ====================
 @api_router.get("/")
@@ -890,8 +2246,38 @@ class ReportCreate(BaseModel):
     reason: Optional[str] = "Inscriptions closes"
 
 REPORTS_THRESHOLD = 3  # Nombre de signalements pour validation automatique
+REPORTS_RETENTION_DAYS = int(os.environ.get('REPORTS_RETENTION_DAYS', '180'))  # Purge via index TTL
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'trouvetontrail.run@gmail.com')
 
+def report_expiry(created_at) -> datetime:
+    """expire_at of a report (TTL index); unreadable dates count from now"""
+    try:
+        created = parse_race_date(created_at)
+    except ValueError:
+        created = None
+    return (created or datetime.now(timezone.utc)) + timedelta(days=REPORTS_RETENTION_DAYS)
+
+async def backfill_report_expiry(batch_size: int = 500) -> int:
+    """Set expire_at on reports stored before the retention policy, so the TTL index purges them too"""
+    pending = {"expire_at": {"$exists": False}}
+    updated = 0
+    last_id = None
+    while True:
+        query = pending if last_id is None else {**pending, "_id": {"$gt": last_id}}
+        batch = await db.reports.find(query, {"_id": 1, "created_at": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        result = await db.reports.bulk_write([
+            UpdateOne({"_id": report['_id']}, {"$set": {"expire_at": report_expiry(report.get('created_at'))}})
+            for report in batch
+        ], ordered=False)
+        updated += result.modified_count
+        last_id = batch[-1]['_id']
+        await asyncio.sleep(0)
+    if updated:
+        logger.info(f"Report retention backfill: {updated} report(s) updated")
+    return updated
+
 @api_router.post("/races/{race_id}/report-closed")
 async def report_registration_closed(
     race_id: str, 
@@ -915,9 +2301,11 @@ async def report_registration_closed(
         "visitor_id": visitor_id,
         "reason": report.reason,
         "status": "pending",  # pending, validated, rejected
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "expire_at": report_expiry(None)
     }
     await db.reports.insert_one(report_doc)
+    await bump_admin_stats({"reports.pending": 1})
     
     # Compter les signalements uniques pour cette course (dernières 7 jours)
     week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
@@ -937,12 +2325,15 @@ async def report_registration_closed(
                 "reported_full_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        invalidate_race_caches(race_id)
+        publish_race_event({**race, "reported_full": True})
         
         # Marquer tous les signalements comme validés
-        await db.reports.update_many(
+        validated = await db.reports.update_many(
             {"race_id": race_id, "status": "pending"},
             {"$set": {"status": "validated"}}
         )
+        await bump_admin_stats({"reports.pending": -validated.modified_count})
         
         # Envoyer email de notification
         if SENDGRID_API_KEY:
@@ -1010,6 +2401,43 @@ async def get_pending_reports(user: dict = Depends(get_admin_user)):
     
     return list(grouped.values())
 
+@api_router.post("/admin/reports/bulk")
+async def moderate_reports_bulk(batch: BulkReportAction, user: dict = Depends(get_admin_user)):
+    """Validate (race marked full) or reject the pending reports of many races at once"""
+    if batch.action not in ("validate", "reject"):
+        raise HTTPException(status_code=400, detail="Action invalide (validate ou reject)")
+    race_ids = bulk_ids(batch.race_ids)
+    
+    pending = {row['_id']: row['count'] async for row in db.reports.aggregate([
+        {"$match": {"race_id": {"$in": race_ids}, "status": "pending"}},
+        {"$group": {"_id": "$race_id", "count": {"$sum": 1}}},
+    ])}
+    results = {}
+    if batch.action == "validate":
+        races = {race['id']: race async for race in db.races.find({"id": {"$in": race_ids}}, {"_id": 0})}
+        found = [rid for rid in race_ids if rid in races]
+        if found:
+            await db.races.update_many({"id": {"$in": found}}, {"$set": {
+                "reported_full": True,
+                "reported_full_at": datetime.now(timezone.utc).isoformat(),
+                "validated_by": user['id'],
+            }})
+            invalidate_race_caches(*found)
+            for rid in found:
+                publish_race_event({**races[rid], "reported_full": True})
+        update = {"status": "validated", "validated_by": user['id']}
+        for rid in race_ids:
+            results[rid] = "validated" if rid in races else "not_found"
+    else:
+        update = {"status": "rejected", "rejected_by": user['id']}
+        for rid in race_ids:
+            results[rid] = "rejected" if rid in pending else "no_pending_reports"
+    
+    reports = await db.reports.update_many({"race_id": {"$in": race_ids}, "status": "pending"}, {"$set": update})
+    await bump_admin_stats({"reports.pending": -reports.modified_count})
+    return {"results": results, "reports": {rid: pending.get(rid, 0) for rid in race_ids},
+            "reports_modified": reports.modified_count}
+
 @api_router.post("/admin/reports/{race_id}/validate")
 async def validate_report(race_id: str, user: dict = Depends(get_admin_user)):
     """Valider un signalement et marquer la course comme complète"""
@@ -1026,12 +2454,15 @@ async def validate_report(race_id: str, user: dict = Depends(get_admin_user)):
             "validated_by": user['id']
         }}
     )
+    invalidate_race_caches(race_id)
+    publish_race_event({**race, "reported_full": True})
     
     # Marquer les signalements comme validés
-    await db.reports.update_many(
+    validated = await db.reports.update_many(
         {"race_id": race_id, "status": "pending"},
         {"$set": {"status": "validated", "validated_by": user['id']}}
     )
+    await bump_admin_stats({"reports.pending": -validated.modified_count})
     
     return {"message": f"Course marquée comme complète : {race['name']}"}
 
@@ -1043,46 +2474,580 @@ async def reject_report(race_id: str, user: dict = Depends(get_admin_user)):
         {"race_id": race_id, "status": "pending"},
         {"$set": {"status": "rejected", "rejected_by": user['id']}}
     )
+    await bump_admin_stats({"reports.pending": -result.modified_count})
     
     return {"message": f"{result.modified_count} signalement(s) rejeté(s)"}
 
-# ==================== DATABASE INDEXES ====================
-@app.on_event("startup")
-async def create_indexes():
-    """Create MongoDB indexes for optimized queries"""
-    try:
-        # Index for race queries
-        await db.races.create_index([("status", 1), ("region", 1)])
-        await db.races.create_index([("status", 1), ("race_date", 1)])
-        await db.races.create_index([("distance_km", 1)])
-        await db.races.create_index([("name", "text"), ("location", "text")])
-        await db.races.create_index([("is_utmb", 1)])
-        
-        # Index for reports
-        await db.reports.create_index([("race_id", 1), ("status", 1)])
-        await db.reports.create_index([("created_at", -1)])
+# ==================== DATE MIGRATION ====================
+DATE_MIGRATION_BATCH_SIZE = int(os.environ.get('DATE_MIGRATION_BATCH_SIZE', '500'))
+
+async def migrate_race_dates(batch_size: int = DATE_MIGRATION_BATCH_SIZE) -> dict:
+    """Online conversion of string race dates to BSON datetimes.
+
+    Walks the remaining string-typed documents by _id in batches; each update
+    is conditional on the values read so concurrent edits are never overwritten.
+    Unparsable values are left untouched and counted.
+    """
+    pending = {"$or": [{field: {"$type": "string"}} for field in RACE_DATETIME_FIELDS]}
+    projection = {field: 1 for field in RACE_DATETIME_FIELDS}
+    migrated = 0
+    invalid = 0
+    last_id = None
+    
+    while True:
+        query = pending if last_id is None else {"$and": [pending, {"_id": {"$gt": last_id}}]}
+        batch = await db.races.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
         
-        # Index for favorites
-        await db.favorites.create_index([("user_id", 1), ("race_id", 1)], unique=True)
+        operations = []
+        for race in batch:
+            update = {}
+            for field in RACE_DATETIME_FIELDS:
+                if isinstance(race.get(field), str):
+                    try:
+                        update[field] = parse_race_date(race[field])
+                    except ValueError:
+                        invalid += 1
+            if update:
+                condition = {"_id": race['_id'], **{field: race[field] for field in update}}
+                operations.append(UpdateOne(condition, {"$set": update}))
         
-        # Index for users
-        await db.users.create_index([("email", 1)], unique=True)
+        if operations:
+            result = await db.races.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+        last_id = batch[-1]['_id']
+        await asyncio.sleep(0)  # Let requests through between batches
+    
+    if migrated or invalid:
+        logger.info(f"Race dates migration: {migrated} race(s) converted, {invalid} invalid value(s) left as-is")
+    return {"migrated": migrated, "invalid": invalid}
+
+async def backfill_race_sort_keys(batch_size: int = DATE_MIGRATION_BATCH_SIZE) -> int:
+    """Set km_effort / location_point on races stored before the sort options existed (walks _id)"""
+    pending = {"$or": [{"km_effort": {"$exists": False}}, {"location_point": {"$exists": False}}]}
+    projection = {"_id": 1, **{field: 1 for field in RACE_SORT_INPUTS}}
+    updated = 0
+    last_id = None
+    while True:
+        query = pending if last_id is None else {"$and": [pending, {"_id": {"$gt": last_id}}]}
+        batch = await db.races.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        operations = [UpdateOne({"_id": race['_id']}, {"$set": fields})
+                      for race in batch if (fields := race_sort_fields(race))]
+        if operations:
+            result = await db.races.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+        last_id = batch[-1]['_id']
+        await asyncio.sleep(0)
+    if updated:
+        logger.info(f"Sort keys backfill: {updated} race(s) updated")
+        invalidate_race_caches()
+    return updated
+
+@api_router.post("/admin/migrations/race-dates")
+async def trigger_race_dates_migration(user: dict = Depends(get_admin_user)):
+    """Convert any remaining string dates to native datetimes"""
+    return await migrate_race_dates()
+
+# ==================== FAVORITE COUNTERS ====================
+FAVORITE_COUNT_RECONCILE_SECONDS = int(os.environ.get('FAVORITE_COUNT_RECONCILE_SECONDS', '3600'))
+FAVORITE_COUNT_LEASE_SECONDS = 600
+
+async def reconcile_favorite_counts() -> Optional[int]:
+    """Recompute races.favorite_count from the favorites collection.
+
+    The counters are maintained with $inc on every add/remove; this job only
+    repairs drift (crashes between the two writes, manual deletions...).
+    Returns the number of races whose counter was corrected, None when
+    another worker holds the lease.
+    """
+    if not await acquire_job_lease("favorite-counts", FAVORITE_COUNT_LEASE_SECONDS):
+        return None
+    try:
+        # Counters first, favorites second: a favorite written in between has its $inc after the
+        # counter read, so the conditional update below skips that race until the next pass
+        stored = {race['id']: race.get('favorite_count')
+                  async for race in db.races.find({}, {"_id": 0, "id": 1, "favorite_count": 1})}
+        counts = {}
+        async for doc in db.favorites.aggregate([{"$group": {"_id": "$race_id", "count": {"$sum": 1}}}]):
+            counts[doc['_id']] = doc['count']
         
-        logger.info("MongoDB indexes created successfully")
+        operations = [
+            UpdateOne({"id": race_id, "favorite_count": current}, {"$set": {"favorite_count": counts.get(race_id, 0)}})
+            for race_id, current in stored.items() if current != counts.get(race_id, 0)
+        ]
+        if not operations:
+            return 0
+        result = await db.races.bulk_write(operations, ordered=False)
+        return result.modified_count
+    finally:
+        await db.job_leases.update_one({"_id": "favorite-counts"}, {"$set": {"expires_at": datetime.now(timezone.utc)}})
+
+async def favorite_count_reconcile_loop():
+    while True:
+        await asyncio.sleep(FAVORITE_COUNT_RECONCILE_SECONDS)
+        try:
+            fixed = await reconcile_favorite_counts()
+            if fixed:
+                logger.info(f"Favorite counters reconciled: {fixed} race(s) corrected")
+        except Exception as e:
+            logger.error(f"Favorite counter reconciliation error: {e}")
+
+@api_router.post("/admin/favorites/reconcile")
+async def trigger_favorite_count_reconcile(user: dict = Depends(get_admin_user)):
+    """Force an immediate recount of favorite_count on every race"""
+    fixed = await reconcile_favorite_counts()
+    if fixed is None:
+        raise HTTPException(status_code=409, detail="Recalcul des favoris déjà en cours sur un autre worker")
+    return {"message": f"{fixed} compteur(s) corrigé(s)", "corrected": fixed}
+
+# ==================== ADMIN STATS ====================
+# One materialized document ({_id: "global"}) kept current with $inc by the write paths and
+# rebuilt by a periodic reconciliation, which also refreshes the date-dependent registration counts
+ADMIN_STATS_RECONCILE_SECONDS = int(os.environ.get('ADMIN_STATS_RECONCILE_SECONDS', '3600'))
+ADMIN_STATS_WEEKS = int(os.environ.get('ADMIN_STATS_WEEKS', '12'))
+ADMIN_STATS_ID = "global"
+ADMIN_STATS_LEASE_SECONDS = 600
+ADMIN_STATS_APPLY_ATTEMPTS = 3
+ADMIN_STATS_RETRY_SECONDS = 5
+ADMIN_STATS_RETRY_ATTEMPTS = 24
+ADMIN_STATS_PENDING_MESSAGE = "statistiques en cours de recalcul"
+
+def stats_week(moment) -> str:
+    """ISO week key of submissions.<week> ("2026-W42")"""
+    year, week, _ = parse_race_date(moment).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def race_stats_key(status) -> str:
+    """Counter of the races with this status ("races.pending")"""
+    return f"races.{getattr(status, 'value', status)}"
+
+async def bump_admin_stats(increments: dict):
+    """$inc dotted counters ("races.pending") of the stats document; never fails the write path"""
+    increments = {key: value for key, value in increments.items() if value}
+    if not increments:
+        return
+    try:
+        await db.admin_stats.update_one(
+            {"_id": ADMIN_STATS_ID},
+            # revision lets a reconciliation notice increments made while it was counting
+            {"$inc": {**increments, "revision": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+    except Exception as e:
+        logger.error(f"Admin stats update failed ({', '.join(increments)}): {e}")
+
+async def recount_admin_stats() -> dict:
+    """Every counter of the stats document, recounted from the collections"""
+    now = datetime.now(timezone.utc)
+    races = {status.value: 0 for status in RaceStatus}
+    async for row in db.races.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        races[row['_id']] = row['count']
+    
+    registration = {status.value: 0 for status in RegistrationStatus}
+    async for race in db.races.find({"status": RaceStatus.APPROVED}, {
+        "_id": 0, "manual_status": 1, "reported_full": 1, "race_date": 1,
+        "registration_open_date": 1, "registration_close_date": 1,
+    }):
+        registration[calculate_registration_status(race)] += 1
+    
+    submissions = defaultdict(int)
+    since = now - timedelta(weeks=ADMIN_STATS_WEEKS)
+    async for race in db.races.find({"created_at": {"$gte": since}}, {"_id": 0, "created_at": 1}):
+        submissions[stats_week(race['created_at'])] += 1
+    
+    return {
+        "races": races,
+        "registration": registration,
+        "reports": {"pending": await db.reports.count_documents({"status": "pending"})},
+        "users": await db.users.count_documents({}),
+        "favorites": await db.favorites.count_documents({}),
+        "submissions": dict(submissions),
+        "updated_at": now,
+        "reconciled_at": now,
+    }
+
+async def apply_admin_stats(stats: dict, current: Optional[dict]) -> bool:
+    """Write a recount unless an increment landed since `current` was read"""
+    try:
+        if current is None:
+            await db.admin_stats.insert_one({"_id": ADMIN_STATS_ID, **stats, "revision": 0})
+            return True
+        revision = current.get('revision')
+        result = await db.admin_stats.update_one(
+            {"_id": ADMIN_STATS_ID, "revision": revision}, {"$set": {**stats, "revision": revision or 0}}
+        )
+    except DuplicateKeyError:  # the document was created while counting
+        return False
+    return bool(result.matched_count)
+
+async def reconcile_admin_stats() -> Optional[dict]:
+    """Recount the stats document under a lease; None when another worker is already at it"""
+    if not await acquire_job_lease("admin-stats", ADMIN_STATS_LEASE_SECONDS):
+        return None
+    try:
+        for _ in range(ADMIN_STATS_APPLY_ATTEMPTS):
+            current = await db.admin_stats.find_one({"_id": ADMIN_STATS_ID}, {"revision": 1})
+            stats = await recount_admin_stats()
+            if await apply_admin_stats(stats, current):
+                return stats
+        logger.warning(f"Admin stats reconciliation skipped: counters kept changing ({ADMIN_STATS_APPLY_ATTEMPTS} attempts)")
+        return stats
+    finally:
+        await db.job_leases.update_one({"_id": "admin-stats"}, {"$set": {"expires_at": datetime.now(timezone.utc)}})
+
+async def refresh_admin_stats() -> bool:
+    """Recount after a bulk write; False when another worker holds the lease (recount retried in background)"""
+    # A recount already in flight elsewhere counted before this write: moving the revision makes
+    # its conditional apply fail so it recounts again
+    await db.admin_stats.update_one({"_id": ADMIN_STATS_ID}, {"$inc": {"revision": 1}})
+    if await reconcile_admin_stats() is not None:
+        return True
+    track_background_job(retry_admin_stats_reconcile())
+    return False
+
+async def retry_admin_stats_reconcile():
+    """Wait for the admin-stats lease to be released, then recount"""
+    for _ in range(ADMIN_STATS_RETRY_ATTEMPTS):
+        await asyncio.sleep(ADMIN_STATS_RETRY_SECONDS)
+        try:
+            if await reconcile_admin_stats() is not None:
+                return
+        except Exception as e:
+            logger.error(f"Admin stats reconciliation error: {e}")
+    logger.warning("Admin stats recount still pending: lease held by another worker, left to the periodic reconciliation")
+
+async def admin_stats_reconcile_loop():
+    await asyncio.sleep(BACKGROUND_STARTUP_DELAY_SECONDS)
+    while True:
+        try:
+            await reconcile_admin_stats()
+        except Exception as e:
+            logger.error(f"Admin stats reconciliation error: {e}")
+        await asyncio.sleep(ADMIN_STATS_RECONCILE_SECONDS)
+
+@api_router.get("/admin/stats")
+async def get_admin_stats(user: dict = Depends(get_admin_user)):
+    """Dashboard counters, read from the materialized stats document"""
+    stats = await db.admin_stats.find_one({"_id": ADMIN_STATS_ID}, {"_id": 0})
+    if stats is None:
+        stats = await reconcile_admin_stats() or await recount_admin_stats()
+    now = datetime.now(timezone.utc)
+    weeks = [stats_week(now - timedelta(weeks=i)) for i in reversed(range(ADMIN_STATS_WEEKS))]
+    submissions = stats.get('submissions') or {}
+    return {
+        "races": stats.get('races') or {},
+        "registration": stats.get('registration') or {},
+        "reports": stats.get('reports') or {},
+        "users": stats.get('users', 0),
+        "favorites": stats.get('favorites', 0),
+        "submissions_per_week": [{"week": week, "count": submissions.get(week, 0)} for week in weeks],
+        "updated_at": stats.get('updated_at'),
+        "reconciled_at": stats.get('reconciled_at'),
+    }
+
+@api_router.post("/admin/stats/reconcile")
+async def trigger_admin_stats_reconcile(user: dict = Depends(get_admin_user)):
+    """Force a full recount of the dashboard counters"""
+    if await reconcile_admin_stats() is None:
+        raise HTTPException(status_code=409, detail="Recalcul des statistiques déjà en cours sur un autre worker")
+    return await get_admin_stats(user)
+
+background_jobs: List[asyncio.Task] = []
+
+def track_background_job(coroutine) -> asyncio.Task:
+    """Run a one-off coroutine as a background job (cancelled on shutdown)"""
+    task = asyncio.ensure_future(coroutine)
+    background_jobs.append(task)
+    task.add_done_callback(lambda done: done in background_jobs and background_jobs.remove(done))
+    return task
+# The free-tier host sleeps and is woken up by a request: maintenance started at boot waits
+# for the warm-up burst to be served first
+BACKGROUND_STARTUP_DELAY_SECONDS = float(os.environ.get('BACKGROUND_STARTUP_DELAY_SECONDS', '300'))
+
+# ==================== STARTUP MAINTENANCE ====================
+# Run once per deployment by a single worker (job lease): index reconciliation on every
+# deployment, then the one-off backfills, each recorded in job_leases once it completed
+# so later boots skip it (POST /admin/migrations/run forces them)
+MAINTENANCE_LEASE_SECONDS = 3600
+MAINTENANCE_STEPS = [
+    # (name, coroutine function, one-off)
+    ("indexes", lambda: reconcile_indexes(db, drop_obsolete=INDEX_DROP_OBSOLETE), False),
+    ("race-dates", migrate_race_dates, True),
+    ("geohash", backfill_race_geohashes, True),
+    ("regions", backfill_race_regions, True),
+    ("sort-keys", backfill_race_sort_keys, True),
+    ("report-retention", backfill_report_expiry, True),
+]
+
+async def run_startup_maintenance(force: bool = False) -> Optional[dict]:
+    """Index reconciliation and pending backfills; None when another worker holds the lease"""
+    if not await acquire_job_lease("maintenance", MAINTENANCE_LEASE_SECONDS):
+        return None
+    results = {}
+    try:
+        state = await db.job_leases.find_one({"_id": "maintenance"}, {"completed": 1}) or {}
+        completed = state.get('completed') or {}
+        for name, step, one_off in MAINTENANCE_STEPS:
+            if one_off and not force and name in completed:
+                continue
+            started = time.perf_counter()
+            try:
+                results[name] = await step()
+            except Exception as e:
+                logger.error(f"Maintenance step {name} failed: {e}")
+                results[name] = {"error": str(e)}
+                continue
+            logger.info(f"Maintenance step {name} done in {time.perf_counter() - started:.1f}s")
+            if one_off:
+                await db.job_leases.update_one(
+                    {"_id": "maintenance"}, {"$set": {f"completed.{name}": datetime.now(timezone.utc)}}
+                )
+    finally:
+        await db.job_leases.update_one({"_id": "maintenance"}, {"$set": {"expires_at": datetime.now(timezone.utc)}})
+    return results
+
+async def startup_maintenance_job():
+    await asyncio.sleep(BACKGROUND_STARTUP_DELAY_SECONDS)
+    try:
+        await run_startup_maintenance()
+    except Exception as e:
+        logger.error(f"Startup maintenance error: {e}")
+
+@api_router.post("/admin/migrations/run")
+async def trigger_startup_maintenance(force: bool = True, user: dict = Depends(get_admin_user)):
+    """Run the maintenance steps now (one-off backfills included unless force=false)"""
+    results = await run_startup_maintenance(force=force)
+    if results is None:
+        raise HTTPException(status_code=409, detail="Maintenance déjà en cours sur un autre worker")
+    return results
+
+@app.on_event("startup")
+async def start_background_jobs():
+    background_jobs.append(asyncio.create_task(favorite_count_reconcile_loop()))
+    background_jobs.append(asyncio.create_task(startup_maintenance_job()))
+    background_jobs.append(asyncio.create_task(co_favorites_loop()))
+    background_jobs.append(asyncio.create_task(admin_stats_reconcile_loop()))
+
+# ==================== CACHE INVALIDATION BUS ====================
+# Race fields whose changes do not need to reach other workers right away
+# (favorite_count moves on every favorite click and would flush all listings)
+RACE_FIELDS_NOT_BROADCAST = {"favorite_count"}
+
+def on_race_change(operation: str, race_id: Optional[str], updated_fields: Optional[set]):
+    if updated_fields and updated_fields <= RACE_FIELDS_NOT_BROADCAST:
+        return
+    note_similarity_changes(*([race_id] if race_id else []))
+    race_write_state["last_write"] = time.monotonic()
+    if race_id:
+        race_cache.invalidate(race_id)
+        invalidate_calendar_races(race_id)
+        # Writes made by other workers reach this worker's stream subscribers too
+        if race_events.is_watched(race_id) and (updated_fields is None or updated_fields & RACE_EVENT_FIELDS):
+            track_background_job(refresh_race_event(race_id))
+    elif operation != "insert":  # deletes only carry the Mongo _id
+        race_cache.clear()
+        calendar_events.clear()
+        calendar_feeds.clear()
+    else:
+        calendar_feeds.invalidate_tags("races")
+    response_cache.invalidate_tags("races")
+
+def on_favorite_change(operation: str, user_id: Optional[str], updated_fields: Optional[set]):
+    # Announced by the writers with their user_id; None only on a bus reset (events may be lost)
+    calendar_feeds.invalidate_tags(f"user:{user_id}" if user_id else "favorites")
+
+invalidation_bus.subscribe("races", on_race_change)
+invalidation_bus.subscribe("favorites", on_favorite_change)
+
+@app.on_event("startup")
+async def start_invalidation_bus():
+    if INVALIDATION_BUS_ENABLED:
+        background_jobs.append(invalidation_bus.start())
+
+# ==================== DATABASE INDEXES ====================
+# Declared in indexes.INDEX_SPECS; obsolete indexes are only reported unless this is set
+INDEX_DROP_OBSOLETE = os.environ.get('INDEX_DROP_OBSOLETE', '').lower() in ('1', 'true', 'yes')
+
+@api_router.post("/admin/indexes/reconcile")
+async def trigger_index_reconcile(drop_obsolete: bool = False, user: dict = Depends(get_admin_user)):
+    """Run the index reconciler and return what was created / flagged"""
+    return await reconcile_indexes(db, drop_obsolete=drop_obsolete)
+
+# ==================== METRICS ====================
+@api_router.get("/admin/metrics")
+async def get_metrics(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Prometheus text exposition; accepts METRICS_TOKEN (scrapers) or an admin JWT"""
+    if not METRICS_TOKEN or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        await get_admin_user(credentials)
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ==================== PROFILING & SLOW QUERIES ====================
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))  # e.g. 0.001 = 1 request in 1000
+SLOW_QUERY_RETENTION_DAYS = int(os.environ.get('SLOW_QUERY_RETENTION_DAYS', '7'))
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = 60  # Explain each query shape at most once per interval
+profile_store = ProfileStore(max_profiles=int(os.environ.get('PROFILE_MAX_STORED', '50')))
+slow_query_state = {"loop": None, "explained_at": {}}
+# Driver plumbing that must not be sent back inside an explain command
+EXPLAIN_STRIPPED_FIELDS = {'$db', 'lsid', '$clusterTime', '$readPreference', 'txnNumber', 'cursor', '$readConcern'}
+
+def is_admin_request(headers: dict) -> bool:
+    """Profiling header check: a valid admin JWT, without a DB round trip"""
+    authorization = headers.get(b'authorization', b'').decode('latin-1')
+    if not authorization.lower().startswith('bearer '):
+        return False
+    try:
+        return decode_token(authorization[7:]).get('role') == UserRole.ADMIN
+    except HTTPException:
+        return False
+
+def record_slow_query(entry: dict):
+    """Called from driver threads: hand the entry over to the event loop"""
+    loop = slow_query_state["loop"]
+    if loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(lambda: background_jobs.append(asyncio.ensure_future(store_slow_query(entry))))
+
+async def store_slow_query(entry: dict):
+    raw_command = entry.pop('raw_command')
+    explainable = entry.pop('explainable')
+    try:
+        shape_key = f"{entry['collection']}:{entry['command']}:{entry['shape']}"
+        now = time.monotonic()
+        last = slow_query_state["explained_at"].get(shape_key)
+        if explainable and (last is None or now - last > SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS):
+            slow_query_state["explained_at"][shape_key] = now
+            command = {key: value for key, value in raw_command.items() if key not in EXPLAIN_STRIPPED_FIELDS}
+            explain = await client[entry['database']].command(
+                {"explain": command, "verbosity": "queryPlanner"}, maxTimeMS=5000
+            )
+            entry['explain'] = summarize_explain(explain)
+        entry['created_at'] = datetime.now(timezone.utc)
+        entry['expire_at'] = entry['created_at'] + timedelta(days=SLOW_QUERY_RETENTION_DAYS)
+        await db.slow_queries.insert_one(entry)
+        logger.warning(f"Slow query {entry['collection']}.{entry['command']} took {entry['duration_ms']} ms: {entry['shape']}")
     except Exception as e:
-        logger.error(f"Error creating indexes: {e}")
+        logger.error(f"Slow query capture error: {e}")
+    finally:
+        task = asyncio.current_task()
+        if task in background_jobs:
+            background_jobs.remove(task)
+
+@app.on_event("startup")
+async def start_slow_query_capture():
+    slow_query_state["loop"] = asyncio.get_running_loop()
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    collection: Optional[str] = None,
+    user: dict = Depends(get_admin_user)
+):
+    """Most recent Mongo operations slower than SLOW_QUERY_MS, with their explain summary"""
+    query = {"collection": collection} if collection else {}
+    entries = await db.slow_queries.find(query, {"_id": 0, "expire_at": 0}).sort("created_at", -1).to_list(limit)
+    for entry in entries:
+        entry['created_at'] = parse_race_date(entry['created_at']).isoformat()
+    return entries
+
+@api_router.get("/admin/profiles")
+async def get_profiles(user: dict = Depends(get_admin_user)):
+    """Request profiles captured with the X-Profile header or by sampling"""
+    return profile_store.list()
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(40, ge=5, le=200),
+    user: dict = Depends(get_admin_user)
+):
+    entry = profile_store.get(profile_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=profile_store.render(entry, sort=sort, limit=limit), media_type="text/plain; charset=utf-8")
+
+# ==================== LOAD SHEDDING ====================
+# Expensive route classes run with bounded concurrency and queues; everything
+# else (details, facets, cached listings) is never queued behind them
+CONCURRENCY_LIMITS_ENABLED = os.environ.get('CONCURRENCY_LIMITS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+def make_limiter(name: str, limit: int, max_queue: int, queue_timeout: float, retry_after: int) -> ConcurrencyLimiter:
+    prefix = f"CONCURRENCY_{name.upper()}"
+    return ConcurrencyLimiter(
+        name,
+        limit=int(os.environ.get(f'{prefix}_LIMIT', str(limit))),
+        max_queue=int(os.environ.get(f'{prefix}_QUEUE', str(max_queue))),
+        queue_timeout=float(os.environ.get(f'{prefix}_QUEUE_TIMEOUT', str(queue_timeout))),
+        retry_after=retry_after,
+    )
+
+concurrency_limiters = {
+    "import": make_limiter("import", limit=1, max_queue=2, queue_timeout=10, retry_after=30),
+    "auth": make_limiter("auth", limit=4, max_queue=32, queue_timeout=5, retry_after=2),
+    "browse": make_limiter("browse", limit=16, max_queue=64, queue_timeout=3, retry_after=1),
+}
+CONCURRENCY_ROUTES = {
+    ("POST", "/api/admin/import"): "import",
+    ("POST", "/api/seed"): "import",
+    ("POST", "/api/tracks"): "import",  # GPX/TCX parsing is CPU-bound too
+    ("POST", "/api/auth/login"): "auth",
+    ("POST", "/api/auth/register"): "auth",
+    ("POST", "/api/auth/reset-password"): "auth",
+    ("GET", "/api/races"): "browse",  # only cache misses get here
+}
+
+@api_router.get("/admin/concurrency")
+async def get_concurrency_stats(user: dict = Depends(get_admin_user)):
+    """In-flight requests, queue depth and rejections per route class"""
+    return {name: limiter.stats() for name, limiter in concurrency_limiters.items()}
+
+# ==================== STARTUP PROFILE ====================
+@app.on_event("startup")
+async def record_startup_profile():
+    startup_profile["startup_ms"] = round((time.perf_counter() - BOOT_STARTED) * 1000, 1)
+    logger.info(
+        f"Startup profile: server module imported in {startup_profile['module_import_ms']} ms, "
+        f"ready after {startup_profile['startup_ms']} ms"
+    )
+
+@api_router.get("/admin/startup-profile")
+async def get_startup_profile(user: dict = Depends(get_admin_user)):
+    """Boot timings and the cost of each lazily imported module"""
+    return startup_profile
 
 # Include router
 app.include_router(api_router)
 
+if CONCURRENCY_LIMITS_ENABLED:
+    # Innermost: requests answered from the response cache never take a slot
+    app.add_middleware(ConcurrencyLimitMiddleware, limiters=concurrency_limiters, routes=CONCURRENCY_ROUTES)
+
+# Added before CORS so it sits inside it: cached bodies never carry CORS headers
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes=RESPONSE_CACHE_ROUTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Data-Stale", "Retry-After"],
 )
 
+app.add_middleware(
+    ProfilingMiddleware, store=profile_store, is_admin_request=is_admin_request, sample_rate=PROFILE_SAMPLE_RATE
+)
+
+if METRICS_ENABLED:
+    # Long-lived SSE connections would swamp the latency histograms
+    app.add_middleware(MetricsMiddleware, excluded_paths={"/api/admin/metrics", "/api/races/stream"})
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_jobs:
+        task.cancel()
     client.close()
+
+startup_profile["module_import_ms"] = round((time.perf_counter() - BOOT_STARTED) * 1000, 1)
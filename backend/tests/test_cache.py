@@ -0,0 +1,288 @@
+"""
+Unit tests for the in-process SingleFlightCache (no server required)
+"""
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from cache import ResponseCache, ResponseCacheMiddleware, SingleFlightCache
+
+
+class CountingLoader:
+    def __init__(self, value="race", delay=0.01):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"{self.value}-{self.calls}"
+
+
+class TestSingleFlightCache:
+    def test_concurrent_lookups_share_one_load(self):
+        async def scenario():
+            cache = SingleFlightCache(ttl=30)
+            loader = CountingLoader()
+            results = await asyncio.gather(*[cache.get("utmb", loader) for _ in range(50)])
+            return cache, loader, results
+
+        cache, loader, results = asyncio.run(scenario())
+        assert loader.calls == 1
+        assert set(results) == {"race-1"}
+        assert cache.hot_keys(1)[0]["coalesced"] == 49
+
+    def test_fresh_entry_is_served_from_cache(self):
+        async def scenario():
+            cache = SingleFlightCache(ttl=30)
+            loader = CountingLoader()
+            await cache.get("utmb", loader)
+            return await cache.get("utmb", loader), loader
+
+        value, loader = asyncio.run(scenario())
+        assert value == "race-1"
+        assert loader.calls == 1
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        async def scenario():
+            cache = SingleFlightCache(ttl=0, stale_ttl=30)
+            loader = CountingLoader()
+            await cache.get("utmb", loader)
+            stale = await cache.get("utmb", loader)
+            await asyncio.sleep(0.05)
+            return stale, cache.peek("utmb"), loader
+
+        stale, refreshed, loader = asyncio.run(scenario())
+        assert stale == "race-1"
+        assert refreshed == "race-2"
+        assert loader.calls == 2
+
+    def test_invalidate_drops_entry_and_inflight_load(self):
+        async def scenario():
+            cache = SingleFlightCache(ttl=30)
+            loader = CountingLoader(delay=0.02)
+            pending = asyncio.ensure_future(cache.get("utmb", loader))
+            await asyncio.sleep(0)
+            cache.invalidate("utmb")
+            await pending
+            # The load started before invalidation must not be cached
+            assert cache.peek("utmb") is None
+            return await cache.get("utmb", loader), loader
+
+        value, loader = asyncio.run(scenario())
+        assert value == "race-2"
+        assert loader.calls == 2
+
+    def test_loader_errors_propagate_and_are_not_cached(self):
+        async def failing():
+            raise RuntimeError("mongo down")
+
+        async def scenario():
+            cache = SingleFlightCache(ttl=30)
+            with pytest.raises(RuntimeError):
+                await cache.get("utmb", failing)
+            return cache
+
+        cache = asyncio.run(scenario())
+        assert cache.peek("utmb") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction_respects_max_entries(self):
+        cache = SingleFlightCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        assert cache.peek("a") is None
+        assert cache.peek("c") == 3
+
+    def test_set_with_an_outdated_generation_is_dropped(self):
+        cache = SingleFlightCache()
+        before = cache.generation("utmb")
+        cache.invalidate("utmb")
+        cache.set("utmb", "old block", before)
+        assert cache.peek("utmb") is None
+        before = cache.generation("utmb")
+        cache.clear()
+        cache.set("utmb", "old block", before)
+        assert cache.peek("utmb") is None
+        cache.set("utmb", "new block", cache.generation("utmb"))
+        assert cache.peek("utmb") == "new block"
+
+    def test_invalidation_stamps_are_bounded(self):
+        cache = SingleFlightCache(max_entries=2)
+        before = cache.generation("utmb")
+        cache.invalidate("utmb")
+        cache.invalidate("cct", "occ")
+        assert len(cache._generations) == 2
+        # The pruned key still rejects a load started before its invalidation
+        cache.set("utmb", "old block", before)
+        assert cache.peek("utmb") is None
+        cache.set("utmb", "new block", cache.generation("utmb"))
+        assert cache.peek("utmb") == "new block"
+
+
+class CountingApp:
+    """Minimal ASGI app returning the query string as JSON"""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        scope["route"] = "/api/races"  # what the router records for the metrics middleware
+        await asyncio.sleep(0.01)
+        body = json.dumps({"query": scope["query_string"].decode(), "call": self.calls}).encode()
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+async def asgi_get(app, path, query=b"", headers=()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query, "headers": list(headers)}
+    await app(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+ROUTES = {"/api/races": {"ttl": 30, "stale": 300, "tags": ["races"]}}
+
+
+class TestResponseCacheMiddleware:
+    def test_normalized_query_hits_cache(self):
+        async def scenario():
+            inner = CountingApp()
+            app = ResponseCacheMiddleware(inner, ResponseCache(), ROUTES)
+            first = await asgi_get(app, "/api/races", b"region=Occitanie&is_utmb=true")
+            second = await asgi_get(app, "/api/races", b"is_utmb=true&region=Occitanie")
+            return inner, first, second
+
+        inner, first, second = asyncio.run(scenario())
+        assert inner.calls == 1
+        assert first[1][b"x-cache"] == b"MISS"
+        assert second[1][b"x-cache"] == b"HIT"
+        assert b"max-age=30" in second[1][b"cache-control"]
+        assert first[2] == second[2]
+
+    def test_gzip_body_served_to_gzip_clients(self):
+        async def scenario():
+            app = ResponseCacheMiddleware(CountingApp(), ResponseCache(), ROUTES)
+            return await asgi_get(app, "/api/races", headers=[(b"accept-encoding", b"gzip, br")])
+
+        status, headers, body = asyncio.run(scenario())
+        assert headers[b"content-encoding"] == b"gzip"
+        assert json.loads(gzip.decompress(body))["call"] == 1
+
+    def test_authenticated_and_uncached_routes_bypass(self):
+        async def scenario():
+            inner = CountingApp()
+            app = ResponseCacheMiddleware(inner, ResponseCache(), ROUTES)
+            await asgi_get(app, "/api/races", headers=[(b"authorization", b"Bearer x")])
+            await asgi_get(app, "/api/races", headers=[(b"authorization", b"Bearer x")])
+            await asgi_get(app, "/api/favorites")
+            return inner
+
+        assert asyncio.run(scenario()).calls == 3
+
+    def test_tag_invalidation_and_coalesced_misses(self):
+        async def scenario():
+            inner = CountingApp()
+            cache = ResponseCache()
+            app = ResponseCacheMiddleware(inner, cache, ROUTES)
+            await asyncio.gather(*[asgi_get(app, "/api/races") for _ in range(10)])
+            calls_before = inner.calls
+            cache.invalidate_tags("races")
+            await asgi_get(app, "/api/races")
+            return calls_before, inner.calls
+
+        calls_before, calls_after = asyncio.run(scenario())
+        assert calls_before == 1
+        assert calls_after == 2
+
+    def test_errors_are_not_cached(self):
+        async def scenario():
+            inner = CountingApp(status=500)
+            app = ResponseCacheMiddleware(inner, ResponseCache(), ROUTES)
+            status, _, _ = await asgi_get(app, "/api/races")
+            await asgi_get(app, "/api/races")
+            return status, inner.calls
+
+        assert asyncio.run(scenario()) == (500, 2)
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        cache = ResponseCache(max_bytes=100)
+        for key in ("a", "b", "c"):
+            cache.set(key, {"body": b"x" * 40, "tags": ("races",), "headers": [], "status": 200, "stored_at": 0}, 0)
+        assert cache.get("a") is None
+        assert cache.size == 80
+
+    def test_fill_is_only_dropped_by_invalidations_of_its_own_tags(self):
+        cache = ResponseCache()
+        entry = {"body": b"feed", "tags": ("user:a", "race:1"), "headers": [], "status": 200, "stored_at": 0}
+        generation = cache.generation
+        cache.invalidate_tags("user:b", "race:2")
+        cache.set("a", entry, generation)
+        assert cache.get("a") is entry
+        generation = cache.generation
+        cache.invalidate_tags("race:1")
+        cache.set("a", entry, generation)
+        assert cache.get("a") is None
+        generation = cache.generation
+        cache.clear()
+        cache.set("a", entry, generation)
+        assert cache.get("a") is None
+
+    def test_invalidated_tags_are_bounded(self):
+        cache = ResponseCache(max_invalidated_tags=2)
+        entry = {"body": b"feed", "tags": ("user:a",), "headers": [], "status": 200, "stored_at": 0}
+        generation = cache.generation
+        for user in ("a", "b", "c"):
+            cache.invalidate_tags(f"user:{user}")
+        assert len(cache._invalidated_at) == 2
+        # user:a was pruned but a fill read before its invalidation is still dropped
+        cache.set("a", entry, generation)
+        assert cache.get("a") is None
+        cache.set("a", entry, cache.generation)
+        assert cache.get("a") is entry
+
+    def test_last_good_response_served_when_refresh_fails(self):
+        routes = {"/api/races": {"ttl": 0, "stale": 0, "tags": ["races"]}}
+
+        async def scenario():
+            inner = CountingApp()
+            app = ResponseCacheMiddleware(inner, ResponseCache(), routes)
+            await asgi_get(app, "/api/races")
+            inner.status = 503  # database down
+            return await asgi_get(app, "/api/races")
+
+        status, headers, body = asyncio.run(scenario())
+        assert status == 200
+        assert headers[b"x-cache"] == b"STALE-ERROR"
+        assert b"x-data-stale" in headers
+        assert json.loads(body)["call"] == 1
+
+    def test_matched_route_reaches_outer_middlewares(self):
+        async def scenario():
+            app = ResponseCacheMiddleware(CountingApp(), ResponseCache(), ROUTES)
+            routes = []
+
+            async def outer(scope):
+                await app(scope, lambda: None, lambda message: asyncio.sleep(0))
+                routes.append(scope.get("route"))
+
+            for _ in range(2):  # miss, then hit
+                await outer({"type": "http", "method": "GET", "path": "/api/races", "query_string": b"", "headers": []})
+            return routes
+
+        assert asyncio.run(scenario()) == ["/api/races", "/api/races"]
@@ -0,0 +1,77 @@
+"""
+Unit tests for the iCalendar serialization of races (no server required)
+"""
+from datetime import datetime, timezone
+
+from calendar_feeds import build_calendar, escape_text, feed_etag, fold, race_to_ics
+
+RACE = {
+    "id": "utmb-2027",
+    "name": "UTMB, la course",
+    "location": "Chamonix",
+    "department": "Haute-Savoie",
+    "latitude": 45.92375,
+    "longitude": 6.86933,
+    "distance_km": 174.0,
+    "elevation_gain": 10000,
+    "is_utmb": True,
+    "race_date": datetime(2027, 8, 27, tzinfo=timezone.utc),
+    "registration_open_date": "2026-12-15",
+    "created_at": "2026-10-01T08:30:00+00:00",
+}
+
+
+def unfold(body: bytes) -> list:
+    return body.decode("utf-8").replace("\r\n ", "").split("\r\n")
+
+
+class TestContentLines:
+    def test_text_escaping(self):
+        assert escape_text("a,b;c\\d\ne") == "a\\,b\\;c\\\\d\\ne"
+
+    def test_short_lines_are_not_folded(self):
+        assert fold("SUMMARY:Trail") == b"SUMMARY:Trail\r\n"
+
+    def test_long_lines_fold_at_75_octets_without_splitting_characters(self):
+        line = "SUMMARY:" + "é" * 100
+        folded = fold(line)
+        physical = folded.split(b"\r\n")[:-1]
+        assert all(len(part) <= 75 for part in physical)
+        assert all(part.startswith(b" ") for part in physical[1:])
+        assert all(part.decode("utf-8") for part in physical)  # every piece is valid UTF-8
+        assert folded.replace(b"\r\n ", b"").decode("utf-8") == line + "\r\n"
+
+
+class TestRaceEvents:
+    def test_race_day_and_registration_opening(self):
+        lines = unfold(race_to_ics(RACE, "https://trouvetondossard.fr/"))
+        assert lines.count("BEGIN:VEVENT") == 2
+        assert "UID:utmb-2027@trouvetondossard.fr" in lines
+        assert "DTSTART;VALUE=DATE:20270827" in lines
+        assert "DTEND;VALUE=DATE:20270828" in lines
+        assert "SUMMARY:UTMB\\, la course" in lines
+        assert "LOCATION:Chamonix\\, Haute-Savoie" in lines
+        assert "DTSTAMP:20261001T083000Z" in lines
+        assert "URL:https://trouvetondossard.fr/races/utmb-2027" in lines
+        assert "DTSTART;VALUE=DATE:20261215" in lines
+
+    def test_registration_after_the_race_is_ignored(self):
+        race = {**RACE, "registration_open_date": "2028-01-01"}
+        assert unfold(race_to_ics(race, "https://x.fr")).count("BEGIN:VEVENT") == 1
+
+    def test_race_without_date_has_no_event(self):
+        assert race_to_ics({**RACE, "race_date": None}, "https://x.fr") == b""
+
+    def test_blocks_are_stable_between_builds(self):
+        first = build_calendar("Mes courses", [race_to_ics(RACE, "https://x.fr")])
+        second = build_calendar("Mes courses", [race_to_ics(dict(RACE), "https://x.fr")])
+        assert first == second
+        assert feed_etag(first) == feed_etag(second)
+        changed = build_calendar("Mes courses", [race_to_ics({**RACE, "name": "UTMB"}, "https://x.fr")])
+        assert feed_etag(changed) != feed_etag(first)
+
+    def test_calendar_envelope(self):
+        lines = unfold(build_calendar("Trouve Ton Dossard", []))
+        assert lines[0] == "BEGIN:VCALENDAR"
+        assert lines[-2:] == ["END:VCALENDAR", ""]
+        assert "VERSION:2.0" in lines
@@ -0,0 +1,117 @@
+"""
+Unit tests for per-route-class concurrency limits (no server required)
+"""
+import asyncio
+import json
+
+import pytest
+
+from concurrency import ConcurrencyLimiter, ConcurrencyLimitMiddleware, Overloaded
+
+
+class SlowApp:
+    """ASGI app that holds each request until `gate` is set"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, scope, receive, send):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if scope["path"] != "/api/races/x":
+                await self.gate.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+        finally:
+            self.running -= 1
+
+
+async def asgi_call(app, method, path):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": method, "path": path, "query_string": b"", "headers": []}, receive, send)
+    return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+
+class TestConcurrencyLimiter:
+    def test_queue_full_is_rejected_immediately(self):
+        async def scenario():
+            limiter = ConcurrencyLimiter("import", limit=1, max_queue=1, queue_timeout=5)
+            await limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded) as excinfo:
+                await limiter.acquire()
+            limiter.release()  # hands the slot to the waiter
+            await waiter
+            return limiter, excinfo.value
+
+        limiter, error = asyncio.run(scenario())
+        assert error.reason == "queue_full"
+        assert limiter.in_flight == 1 and limiter.queue_depth == 0
+        assert limiter.stats()["queue_full"] == 1
+
+    def test_queued_request_times_out(self):
+        async def scenario():
+            limiter = ConcurrencyLimiter("auth", limit=1, max_queue=5, queue_timeout=0.01)
+            await limiter.acquire()
+            with pytest.raises(Overloaded) as excinfo:
+                await limiter.acquire()
+            return limiter, excinfo.value
+
+        limiter, error = asyncio.run(scenario())
+        assert error.reason == "timeout"
+        assert limiter.queue_depth == 0 and limiter.in_flight == 1
+
+    def test_waiters_are_served_in_order(self):
+        async def scenario():
+            limiter = ConcurrencyLimiter("browse", limit=1, max_queue=10, queue_timeout=5)
+            order = []
+            await limiter.acquire()
+
+            async def request(index):
+                await limiter.acquire()
+                order.append(index)
+                limiter.release()
+
+            tasks = [asyncio.ensure_future(request(i)) for i in range(5)]
+            await asyncio.sleep(0)
+            limiter.release()
+            await asyncio.gather(*tasks)
+            return limiter, order
+
+        limiter, order = asyncio.run(scenario())
+        assert order == [0, 1, 2, 3, 4]
+        assert limiter.in_flight == 0
+
+
+class TestConcurrencyLimitMiddleware:
+    def test_expensive_class_is_shed_while_cheap_reads_pass(self):
+        async def scenario():
+            inner = SlowApp()
+            limiters = {"import": ConcurrencyLimiter("import", limit=1, max_queue=0, retry_after=30)}
+            app = ConcurrencyLimitMiddleware(inner, limiters, {("POST", "/api/admin/import"): "import"})
+            running = asyncio.ensure_future(asgi_call(app, "POST", "/api/admin/import"))
+            await asyncio.sleep(0.01)
+            shed = await asgi_call(app, "POST", "/api/admin/import")
+            cheap = await asgi_call(app, "GET", "/api/races/x")
+            inner.gate.set()
+            first = await running
+            return inner, first, shed, cheap
+
+        inner, first, shed, cheap = asyncio.run(scenario())
+        assert first[0] == 200
+        assert shed[0] == 503
+        assert shed[1][b"retry-after"] == b"30"
+        assert "surchargé" in json.loads(shed[2])["detail"]
+        assert cheap[0] == 200
+        assert inner.max_running == 2  # the import and the cheap read, never two imports
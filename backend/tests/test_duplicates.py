@@ -0,0 +1,62 @@
+"""
+Unit tests for fuzzy duplicate-race detection (no server required)
+"""
+from datetime import datetime, timezone
+
+from duplicates import DuplicateIndex, find_duplicate_pairs, geohash, neighbour_cells, normalize_name
+
+
+def race(race_id, name, latitude=43.2, longitude=5.45, race_date="2025-03-15", distance=25.0):
+    return {"id": race_id, "name": name, "latitude": latitude, "longitude": longitude,
+            "race_date": race_date, "distance_km": distance}
+
+
+class TestNormalization:
+    def test_accents_years_editions_and_stop_words(self):
+        assert normalize_name("Trail des Calanques 2025") == normalize_name("trail  des CALANQUES") == "trail calanques"
+        assert normalize_name("L'Échappée Belle – 12ème édition") == "echappee belle"
+
+    def test_geohash_reference_and_neighbours(self):
+        assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+        cells = neighbour_cells(45.92, 6.87)
+        assert len(cells) == 9 and geohash(45.92, 6.87) in cells
+
+
+class TestDuplicateIndex:
+    def test_same_event_with_year_in_name_is_a_duplicate(self):
+        index = DuplicateIndex()
+        index.add(race("a", "Trail des Calanques"))
+        matches = index.find(race(None, "Trail des Calanques 2025", latitude=43.21, longitude=5.46,
+                                  race_date=datetime(2025, 3, 16, tzinfo=timezone.utc)))
+        assert [match["id"] for match in matches] == ["a"]
+
+    def test_different_race_place_date_or_format_is_not(self):
+        index = DuplicateIndex()
+        index.add(race("a", "Trail des Calanques"))
+        assert index.find(race(None, "Trail des Crêtes")) == []
+        assert index.find(race(None, "Trail des Calanques", latitude=45.9, longitude=6.87)) == []
+        assert index.find(race(None, "Trail des Calanques", race_date="2025-09-15")) == []
+        assert index.find(race(None, "Trail des Calanques", distance=60.0)) == []
+
+    def test_neighbouring_cell_is_searched(self):
+        index = DuplicateIndex()
+        index.add(race("a", "Grand Raid", latitude=43.2, longitude=5.403))
+        # A few hundred meters away, across a cell boundary at precision 5
+        other = race(None, "Grand Raid", latitude=43.2, longitude=5.407)
+        assert geohash(43.2, 5.403) != geohash(43.2, 5.407)
+        assert index.find(other)[0]["id"] == "a"
+
+    def test_batch_pairs_within_one_file(self):
+        pairs = find_duplicate_pairs([
+            race("a", "Ultra Trail du Mont-Blanc", 45.92, 6.87, "2025-08-29", 170),
+            race("b", "Trail des Calanques"),
+            race("c", "ULTRA-TRAIL DU MONT BLANC 2025", 45.92, 6.87, "2025-08-30", 171),
+            race("d", "Trail des Calanques", race_date="2026-03-14"),
+        ])
+        assert [(pair["id"], pair["duplicate_of"]["id"]) for pair in pairs] == [("c", "a")]
+
+    def test_different_numbers_in_names_are_different_races(self):
+        index = DuplicateIndex()
+        index.add(race("a", "Trail des Calanques 25", distance=None))
+        assert index.find(race(None, "Trail des Calanques 50", distance=None)) == []
+        assert index.find(race(None, "Trail des Calanques 25 2025", distance=None))[0]["id"] == "a"
@@ -0,0 +1,87 @@
+"""
+Unit tests for the race event hub behind /api/races/stream (no server required)
+"""
+import asyncio
+import json
+
+from events import RaceEventHub, Subscription, format_sse
+
+
+def status_event(race_id, registration_status="open", region="Occitanie", department="Aveyron"):
+    return {"type": "status", "race_id": race_id, "status": "approved",
+            "registration_status": registration_status, "region": region, "department": department}
+
+
+class TestRaceEventHub:
+    def test_id_subscription_only_receives_its_races(self):
+        hub = RaceEventHub()
+        subscription = hub.subscribe(Subscription(["utmb"]))
+        hub.publish(status_event("utmb", "full"))
+        hub.publish(status_event("saintelyon", "full"))
+        events = subscription.drain()
+        assert [event["race_id"] for event in events] == ["utmb"]
+        assert events[0]["registration_status"] == "full"
+
+    def test_filter_subscription_matches_region_case_insensitively(self):
+        hub = RaceEventHub()
+        subscription = hub.subscribe(Subscription(filters={"region": "occitanie", "department": None}))
+        hub.publish(status_event("a"))
+        hub.publish(status_event("b", region="Bretagne", department="Finistère"))
+        assert [event["race_id"] for event in subscription.drain()] == ["a"]
+
+    def test_unchanged_state_is_not_republished(self):
+        hub = RaceEventHub()
+        subscription = hub.subscribe(Subscription(["utmb"]))
+        assert hub.publish(status_event("utmb", "full")) == 1
+        assert hub.publish(status_event("utmb", "full")) == 0
+        assert hub.totals["duplicates"] == 1
+        assert len(subscription.drain()) == 1
+
+    def test_pending_events_are_coalesced_per_race(self):
+        subscription = Subscription(["utmb"])
+        subscription.push({"race_id": "utmb", "type": "status", "registration_status": "open"})
+        subscription.push({"race_id": "utmb", "type": "status", "registration_status": "full"})
+        events = subscription.drain()
+        assert len(events) == 1 and events[0]["registration_status"] == "full"
+
+    def test_slow_client_gets_a_single_resync(self):
+        hub = RaceEventHub()
+        subscription = hub.subscribe(Subscription(filters={"region": "Occitanie"}, max_pending=5))
+        for index in range(20):
+            hub.publish(status_event(f"race-{index}"))
+        assert subscription.drain() == [{"type": "resync"}]
+        assert subscription.drain() == []
+        assert subscription.dropped > 0
+
+    def test_unsubscribe_releases_the_race_index(self):
+        hub = RaceEventHub()
+        subscription = hub.subscribe(Subscription(["utmb", "saintelyon"]))
+        assert hub.connections == 1 and hub.is_watched("utmb")
+        hub.unsubscribe(subscription)
+        assert hub.connections == 0 and not hub.is_watched("utmb")
+        assert hub.stats()["watched_races"] == 0
+
+    def test_wait_wakes_up_on_publish_and_times_out_when_idle(self):
+        async def scenario():
+            hub = RaceEventHub()
+            subscription = hub.subscribe(Subscription(["utmb"]))
+            idle = await subscription.wait(0.01)
+            asyncio.get_running_loop().call_later(0.01, hub.publish, status_event("utmb", "full"))
+            woken = await subscription.wait(5)
+            return idle, woken
+
+        idle, woken = asyncio.run(scenario())
+        assert idle is False and woken is True
+
+    def test_thousands_of_idle_connections_do_not_slow_publishing(self):
+        hub = RaceEventHub()
+        for index in range(5000):
+            hub.subscribe(Subscription([f"race-{index}"]))
+        assert hub.publish(status_event("race-42", "full")) == 1
+
+    def test_format_sse(self):
+        payload = format_sse({"type": "status", "race_id": "utmb", "seq": 7})
+        lines = payload.strip().split("\n")
+        assert lines[0] == "event: status" and lines[1] == "id: 7"
+        assert json.loads(lines[2][len("data: "):])["race_id"] == "utmb"
+        assert payload.endswith("\n\n")
@@ -0,0 +1,102 @@
+"""
+Unit tests for the offline commune gazetteer (no server required)
+"""
+import pytest
+
+from gazetteer import Gazetteer, normalize
+
+DEPARTMENTS = [
+    {"code": "73", "name": "Savoie", "region": "Auvergne-Rhône-Alpes", "latitude": "45.5646", "longitude": "5.9178"},
+    {"code": "74", "name": "Haute-Savoie", "region": "Auvergne-Rhône-Alpes", "latitude": "45.8992", "longitude": "6.1294"},
+    {"code": "2A", "name": "Corse-du-Sud", "region": "Corse", "latitude": "41.9192", "longitude": "8.7386"},
+]
+COMMUNES = [
+    {"name": "Chamonix-Mont-Blanc", "postcode": "74400", "department": "74", "region": "", "latitude": "45.92375", "longitude": "6.86933"},
+    {"name": "Saint-Gervais-les-Bains", "postcode": "74170", "department": "74", "region": "", "latitude": "45.8921", "longitude": "6.7125"},
+    {"name": "Aime", "postcode": "73210", "department": "73", "region": "", "latitude": "45.555", "longitude": "6.649"},
+    {"name": "Le Bourget-du-Lac", "postcode": "73370", "department": "73", "region": "", "latitude": "45.6533", "longitude": "5.8617"},
+    {"name": "Saint-Pierre", "postcode": "73000", "department": "73", "region": "", "latitude": "45.5", "longitude": "6.0"},
+    {"name": "Saint-Pierre", "postcode": "74000", "department": "74", "region": "", "latitude": "46.0", "longitude": "6.5"},
+    {"name": "Ajaccio", "postcode": "20000", "department": "2A", "region": "", "latitude": "41.9192", "longitude": "8.7386"},
+]
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer(COMMUNES, DEPARTMENTS)
+
+
+class TestLookup:
+    def test_accent_case_and_abbreviation_insensitive(self, gazetteer):
+        assert normalize("St-Gervais-lès-Bains") == "saint gervais les bains"
+        assert gazetteer.lookup("ST GERVAIS LES BAINS")["postcode"] == "74170"
+
+    def test_prefix_and_article_variants(self, gazetteer):
+        assert gazetteer.lookup("Chamonix (74)")["name"] == "Chamonix-Mont-Blanc"
+        assert gazetteer.lookup("Bourget-du-Lac, Savoie")["name"] == "Le Bourget-du-Lac"
+
+    def test_homonyms_need_the_department(self, gazetteer):
+        assert gazetteer.lookup("Saint-Pierre") is None
+        assert gazetteer.lookup("Saint-Pierre", "Haute-Savoie")["postcode"] == "74000"
+        assert gazetteer.lookup("Saint-Pierre", "73")["postcode"] == "73000"
+        assert gazetteer.lookup("Saint-Pierre (74)")["postcode"] == "74000"
+        assert gazetteer.lookup("Ajaccio", "2a")["region"] == "Corse"
+
+    def test_unknown_department_is_not_checked_against_homonyms(self, gazetteer):
+        assert gazetteer.lookup("Aime", "La Réunion") is None
+        result = gazetteer.check("Saint-Pierre", "La Réunion", -21.34, 55.48)
+        assert result["status"] == "unknown" and result["distance_km"] is None
+
+    def test_check_fills_validates_and_falls_back_to_the_department(self, gazetteer):
+        results = gazetteer.check_many(
+            ["Chamonix", "Chamonix", "Chamonix", "Hameau inconnu", "Hameau inconnu", "Hameau inconnu"],
+            ["74", "74", "74", "Savoie", "Savoie", None],
+            [None, 45.93, 4.592, 45.6, 43.3, 45.0],
+            [None, 6.87, 6.869, 6.2, 5.4, 6.0],
+        )
+        assert [result["status"] for result in results] == ["filled", "ok", "mismatch", "ok", "mismatch", "unknown"]
+        assert results[0]["latitude"] == pytest.approx(45.92375)
+        assert results[2]["distance_km"] > 4000
+
+
+class TestBundledData:
+    def test_every_department_has_communes(self):
+        gazetteer = Gazetteer.load()
+        assert len(gazetteer) > 8000
+        assert len(set(gazetteer.department.tolist())) == len(gazetteer.department_codes)
+        assert gazetteer.lookup("Millau", "Aveyron")["department_code"] == "12"
+
+
+class TestLocate:
+    def test_nearest_commune_department(self, gazetteer):
+        assert gazetteer.locate(45.93, 6.88)["department_code"] == "74"
+        assert gazetteer.locate(45.56, 6.64) == {
+            "department": "Savoie", "department_code": "73", "region": "Auvergne-Rhône-Alpes", "region_code": "84",
+        }
+        assert gazetteer.locate(41.95, 8.75)["region_code"] == "94"
+
+    def test_far_from_every_commune(self, gazetteer):
+        assert gazetteer.locate(47.0, -8.0) is None
+        assert gazetteer.locate_many([None], [None]).tolist() == [-1]
+
+    def test_declared_department_wins_near_the_border(self):
+        gazetteer = Gazetteer([
+            {"name": "Ugine", "postcode": "", "department": "73", "latitude": "45.75", "longitude": "6.41"},
+            {"name": "Flumet", "postcode": "", "department": "74", "latitude": "45.8167", "longitude": "6.5167"},
+        ], DEPARTMENTS)
+        # 5 km from Ugine (73), 6 km from Flumet (74)
+        assert gazetteer.locate(45.78, 6.455)["department_code"] == "73"
+        assert gazetteer.locate(45.78, 6.455, "Haute-Savoie")["department_code"] == "74"
+        assert gazetteer.locate(45.78, 6.455, "Haute-Savoie", border_km=5)["department_code"] == "73"
+
+    def test_batch_matches_single_lookups(self, gazetteer):
+        points = [(45.93, 6.88), (45.56, 6.64), (45.51, 6.01), (41.95, 8.75), (45.66, 5.87)]
+        departments = gazetteer.locate_many([lat for lat, _ in points], [lon for _, lon in points])
+        assert [gazetteer.department_codes[i] for i in departments] == [
+            gazetteer.locate(lat, lon)["department_code"] for lat, lon in points
+        ]
+
+    def test_region_codes(self, gazetteer):
+        assert gazetteer.region_of("auvergne rhone alpes") == "84"
+        assert gazetteer.region_of("84") == "84"
+        assert gazetteer.region_of("Atlantide") is None
@@ -0,0 +1,186 @@
+"""
+Index coverage tests: every query shape used by server.py must be served by
+an index from indexes.INDEX_SPECS (no COLLSCAN in the winning plan).
+
+Requires a reachable MongoDB (MONGO_URL, default mongodb://localhost:27017);
+the tests run in a throw-away database and are skipped otherwise.
+Intentional full scans (favorite counter reconciliation, seed count) are not listed.
+"""
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import INDEX_SPECS
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+
+RACE_ID = str(uuid.uuid4())
+USER_ID = str(uuid.uuid4())
+NOW = datetime.now(timezone.utc).isoformat()
+TODAY = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+APPROVED = {"status": "approved"}
+
+# server.RACE_SORTS, each run with the (status) filter of GET /races
+RACE_SORTS = [
+    [("race_date", 1)],
+    [("distance_km", 1), ("race_date", 1)],
+    [("distance_km", -1), ("race_date", -1)],
+    [("elevation_gain", 1), ("race_date", 1)],
+    [("elevation_gain", -1), ("race_date", -1)],
+    [("km_effort", 1), ("race_date", 1)],
+    [("km_effort", -1), ("race_date", -1)],
+    [("favorite_count", -1), ("race_date", 1)],
+]
+
+# (collection, filter, sort) for find / find_one / count_documents / update / delete
+FIND_SHAPES = [
+    *[("races", APPROVED, sort) for sort in RACE_SORTS],
+    ("races", {"status": "approved", "race_date": {"$gte": TODAY}}, [("race_date", 1)]),
+    # server.race_location_query: canonical codes, not regexes on the names
+    ("races", {"status": "approved", "region_code": "76", "distance_km": {"$gte": 20, "$lte": 80},
+               "is_utmb": False}, [("race_date", 1)]),
+    ("races", {"status": "approved", "region_code": "76", "department_code": "12"}, [("race_date", 1)]),
+    ("races", {"status": "approved", "department_code": "12"}, [("race_date", 1)]),
+    # Races the gazetteer could not place are matched on their declared names
+    ("races", {"status": "approved", "$and": [{"$or": [{"region_code": "76"},
+                                                       {"region_code": None, "region": "Occitanie"}]}]}, [("race_date", 1)]),
+    ("races", {"status": "approved", "$or": [{"name": {"$regex": "trail", "$options": "i"}},
+                                             {"location": {"$regex": "trail", "$options": "i"}}]}, [("race_date", 1)]),
+    ("races", {"status": "approved"}, [("name", 1)]),
+    ("races", {"status": "pending"}, None),
+    ("races", {"id": RACE_ID}, None),
+    ("races", {"id": {"$in": [RACE_ID]}}, None),
+    ("races", {"name": "UTMB Mont-Blanc"}, None),
+    # Duplicate detection blocking (server.load_duplicate_index)
+    ("races", {"geohash": {"$in": ["spf2u", "spf2v"]}, "status": {"$ne": "rejected"},
+               "race_date": {"$gte": TODAY, "$lte": TODAY}}, None),
+    ("races", {"geohash": {"$in": ["spf2u", "spf2v"]}, "status": {"$ne": "rejected"}}, None),
+    ("users", {"id": USER_ID}, None),
+    ("users", {"email": "admin@trailfrance.com"}, None),
+    ("users", {"calendar_token": "token-0"}, None),
+    ("password_resets", {"token": str(uuid.uuid4())}, None),
+    ("password_resets", {"user_id": USER_ID}, None),
+    ("favorites", {"user_id": USER_ID, "race_id": RACE_ID}, None),
+    ("favorites", {"user_id": USER_ID}, [("created_at", -1), ("id", -1)]),
+    ("favorites", {"user_id": USER_ID, "race_id": {"$in": [RACE_ID]}}, None),
+    ("reports", {"race_id": RACE_ID, "status": "pending", "created_at": {"$gte": NOW}}, None),
+    ("reports", {"race_id": RACE_ID, "status": "pending"}, None),
+    ("reports", {"status": "pending"}, [("created_at", -1)]),
+    ("slow_queries", {}, [("created_at", -1)]),
+    ("slow_queries", {"collection": "races"}, [("created_at", -1)]),
+    ("race_recommendations", {"race_id": RACE_ID}, None),
+    ("race_recommendations", {"race_id": {"$in": [RACE_ID]}}, None),
+    ("race_tracks", {"id": RACE_ID}, None),
+    ("race_tracks", {"race_id": RACE_ID}, None),
+    ("race_tracks", {"race_id": RACE_ID, "id": {"$ne": RACE_ID}}, None),
+    ("change_log", {"seq": {"$gt": 0}}, [("seq", 1)]),
+]
+
+# (collection, key, filter) for distinct
+DISTINCT_SHAPES = [
+    ("races", "region_code", {"status": "approved"}),
+    ("races", "department_code", {"status": "approved"}),
+    ("races", "department_code", {"status": "approved", "region_code": "76"}),
+    ("races", "region", {"status": "approved", "region_code": None}),
+    ("races", "department", {"status": "approved", "department_code": None}),
+    ("races", "id", {"id": {"$in": [RACE_ID]}}),
+    ("favorites", "race_id", {"user_id": USER_ID}),
+    ("favorites", "race_id", {"user_id": USER_ID, "race_id": {"$in": [RACE_ID]}}),
+]
+
+
+@pytest.fixture(scope="module")
+def test_db():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+
+    name = f"ttd_index_test_{uuid.uuid4().hex[:8]}"
+    database = client[name]
+    for collection, models in INDEX_SPECS.items():
+        database[collection].create_indexes(models)
+    # A few documents so the planner has something to choose from
+    database.races.insert_many([
+        {"id": str(uuid.uuid4()), "name": f"Trail {i}", "location": "Millau", "status": "approved",
+         "region": "Occitanie", "department": "Aveyron", "region_code": "76", "department_code": "12",
+         "distance_km": 10 + i, "elevation_gain": 300 * i, "km_effort": 10 + 4 * i, "is_utmb": False,
+         "race_date": datetime(2025, 1 + i % 9, 15, tzinfo=timezone.utc), "favorite_count": i,
+         "latitude": 44.1, "longitude": 3.08, "geohash": "spf2u",
+         "location_point": {"type": "Point", "coordinates": [3.08 + i / 100, 44.1]}}
+        for i in range(20)
+    ])
+    database.users.insert_many([
+        {"id": str(uuid.uuid4()), "email": f"user{i}@example.fr", "calendar_token": f"token-{i}"}
+        for i in range(5)
+    ])
+    yield database
+    client.drop_database(name)
+    client.close()
+
+
+def collection_scans(plan) -> list:
+    """Return every COLLSCAN stage found anywhere in an explain document"""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            found.append(plan)
+        for value in plan.values():
+            found.extend(collection_scans(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            found.extend(collection_scans(item))
+    return found
+
+
+def winning_plan(explain: dict) -> dict:
+    planner = explain.get('queryPlanner', explain)
+    return planner.get('winningPlan', planner)
+
+
+class TestIndexCoverage:
+    @pytest.mark.parametrize("collection,query,sort", FIND_SHAPES)
+    def test_find_uses_index(self, test_db, collection, query, sort):
+        cursor = test_db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = winning_plan(cursor.explain())
+        assert not collection_scans(plan), f"COLLSCAN on {collection} for {query} sort={sort}: {plan}"
+
+    @pytest.mark.parametrize("collection,key,query", DISTINCT_SHAPES)
+    def test_distinct_uses_index(self, test_db, collection, key, query):
+        explain = test_db.command('explain', {'distinct': collection, 'key': key, 'query': query})
+        plan = winning_plan(explain)
+        assert not collection_scans(plan), f"COLLSCAN on {collection}.distinct({key}) for {query}: {plan}"
+
+    def test_favorites_list_aggregation_uses_index(self, test_db):
+        pipeline = [
+            {"$match": {"user_id": USER_ID}},
+            {"$sort": {"created_at": -1, "id": -1}},
+            {"$limit": 51},
+        ]
+        explain = test_db.command('aggregate', 'favorites', pipeline=pipeline, explain=True)
+        assert not collection_scans(explain), f"COLLSCAN in favorites aggregation: {explain}"
+
+    def test_proximity_aggregation_uses_geo_index(self, test_db):
+        pipeline = [
+            {"$geoNear": {
+                "near": {"type": "Point", "coordinates": [3.08, 44.1]}, "key": "location_point",
+                "query": {"status": "approved", "region_code": "76"},
+                "distanceField": "proximity_km", "distanceMultiplier": 0.001, "spherical": True,
+            }},
+            {"$limit": 500},
+        ]
+        explain = test_db.command('aggregate', 'races', pipeline=pipeline, explain=True)
+        assert not collection_scans(explain), f"COLLSCAN in $geoNear aggregation: {explain}"
+
+    def test_ttl_indexes_are_declared(self, test_db):
+        for collection, field in (("password_resets", "expires_at"), ("reports", "expire_at")):
+            indexes = test_db[collection].index_information()
+            ttl = [spec for spec in indexes.values() if spec['key'] == [(field, 1)]]
+            assert ttl and ttl[0].get('expireAfterSeconds') == 0
@@ -0,0 +1,223 @@
+"""
+Cross-worker cache invalidation: two uvicorn workers share one database,
+a write made outside of a worker must reach the race cache of both well
+before the cache TTL expires.
+
+The "stream" mode needs a replica set (e.g. `mongod --replSet rs0` +
+`rs.initiate()`) reachable at MONGO_URL; "poll" mode runs on any mongod.
+Tests are skipped when MongoDB or uvicorn is not available.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from invalidation import InvalidationBus, SequenceWindow
+
+requests = pytest.importorskip("requests")
+pytest.importorskip("uvicorn")
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PROPAGATION_TIMEOUT = 10  # seconds, far below the 300 s cache TTL used below
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def mongo():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        hello = client.admin.command('hello')
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+    yield client, bool(hello.get('setName'))
+    client.close()
+
+
+def start_workers(db_name: str, mode: str, count: int = 2) -> list:
+    workers = []
+    env = {
+        **os.environ, "MONGO_URL": MONGO_URL, "DB_NAME": db_name, "INVALIDATION_BUS_MODE": mode,
+        "INVALIDATION_POLL_SECONDS": "0.2", "RACE_CACHE_TTL_SECONDS": "300",
+        "RESPONSE_CACHE_TTL_SECONDS": "300", "BACKGROUND_STARTUP_DELAY_SECONDS": "0",
+    }
+    for _ in range(count):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        workers.append((process, f"http://127.0.0.1:{port}/api"))
+
+    deadline = time.monotonic() + 30
+    for process, base_url in workers:
+        while True:
+            try:
+                requests.get(f"{base_url}/", timeout=1)
+                break
+            except requests.ConnectionError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    stop_workers(workers)
+                    pytest.fail("uvicorn worker did not start")
+                time.sleep(0.2)
+    time.sleep(1)  # let the bus open its change stream / read the change log head
+    return workers
+
+
+def stop_workers(workers: list):
+    for process, _ in workers:
+        process.terminate()
+    for process, _ in workers:
+        process.wait(timeout=10)
+
+
+def publish_change(database, race_id: str):
+    """What InvalidationBus.publish writes in poll mode: a server-numbered change_log entry"""
+    counter = database.invalidation_state.find_one_and_update(
+        {"_id": "cache-invalidation:seq"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+    database.change_log.insert_one({"seq": counter["seq"], "coll": "races", "op": "update", "key": race_id,
+                                    "created_at": datetime.now(timezone.utc)})
+
+
+def wait_for(predicate) -> bool:
+    deadline = time.monotonic() + PROPAGATION_TIMEOUT
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+@pytest.fixture(params=["stream", "poll"])
+def cluster(request, mongo):
+    client, is_replica_set = mongo
+    if request.param == "stream" and not is_replica_set:
+        pytest.skip("change streams need a replica set")
+    db_name = f"ttd_invalidation_test_{uuid.uuid4().hex[:8]}"
+    database = client[db_name]
+    race_id = str(uuid.uuid4())
+    database.races.insert_one({
+        "id": race_id, "name": "Trail des Crêtes", "location": "Millau", "region": "Occitanie",
+        "department": "Aveyron", "distance_km": 42, "elevation_gain": 2100, "status": "approved",
+        "race_date": datetime(2030, 6, 1, tzinfo=timezone.utc), "favorite_count": 0,
+        "created_at": datetime.now(timezone.utc),
+    })
+    workers = start_workers(db_name, request.param)
+    yield request.param, database, race_id, workers
+    stop_workers(workers)
+    client.drop_database(db_name)
+
+
+class TestCrossWorkerInvalidation:
+    def test_race_update_reaches_every_worker(self, cluster):
+        mode, database, race_id, workers = cluster
+        for _, base_url in workers:  # warm every worker's caches
+            assert requests.get(f"{base_url}/races/{race_id}").json()["name"] == "Trail des Crêtes"
+            assert requests.get(f"{base_url}/races").json()[0]["name"] == "Trail des Crêtes"
+
+        database.races.update_one({"id": race_id}, {"$set": {"name": "Trail des Cimes"}})
+        if mode == "poll":
+            # Without change streams the writer announces the change itself
+            publish_change(database, race_id)
+
+        for _, base_url in workers:
+            assert wait_for(lambda: requests.get(f"{base_url}/races/{race_id}").json()["name"] == "Trail des Cimes")
+            assert wait_for(lambda: requests.get(f"{base_url}/races").json()[0]["name"] == "Trail des Cimes")
+
+    def test_favorite_counter_updates_do_not_flush_listings(self, cluster):
+        mode, database, race_id, workers = cluster
+        if mode == "poll":
+            pytest.skip("only change streams see raw counter updates")
+        _, base_url = workers[0]
+        requests.get(f"{base_url}/races")
+        assert requests.get(f"{base_url}/races").headers.get("X-Cache") == "HIT"
+
+        database.races.update_one({"id": race_id}, {"$inc": {"favorite_count": 1}})
+        time.sleep(1)
+        assert requests.get(f"{base_url}/races").headers.get("X-Cache") == "HIT"
+
+    def test_resume_token_is_persisted(self, cluster):
+        mode, database, race_id, workers = cluster
+        if mode == "poll":
+            pytest.skip("pollers keep their position in memory (a new worker starts with empty caches)")
+        # Tokens are saved at most every 5 s, keep the stream busy until then
+        for index in range(30):
+            database.races.update_one({"id": race_id}, {"$set": {"name": f"Trail {index}"}})
+            time.sleep(0.2)
+        assert wait_for(lambda: (database.invalidation_state.find_one({"_id": "cache-invalidation"}) or {}).get("resume_token"))
+
+    def test_out_of_order_entries_are_not_skipped(self, cluster):
+        mode, database, race_id, workers = cluster
+        if mode == "stream":
+            pytest.skip("only the change log can become visible out of order")
+        _, base_url = workers[0]
+        assert requests.get(f"{base_url}/races/{race_id}").json()["name"] == "Trail des Crêtes"
+        # A number allocated first but written last (slow publisher on another worker)
+        counter = database.invalidation_state.find_one_and_update(
+            {"_id": "cache-invalidation:seq"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+        publish_change(database, "another-race")
+        time.sleep(1)
+        database.races.update_one({"id": race_id}, {"$set": {"name": "Trail des Cimes"}})
+        database.change_log.insert_one({"seq": counter["seq"], "coll": "races", "op": "update", "key": race_id,
+                                        "created_at": datetime.now(timezone.utc)})
+        assert wait_for(lambda: requests.get(f"{base_url}/races/{race_id}").json()["name"] == "Trail des Cimes")
+
+
+class TestSequenceWindow:
+    def test_contiguous_numbers_move_the_watermark(self):
+        window = SequenceWindow(watermark=10)
+        assert [window.accept(seq) for seq in (11, 12, 12, 9)] == [True, True, False, False]
+        assert window.advance(0) == 0
+        assert window.watermark == 12 and not window.seen
+
+    def test_late_entry_below_a_seen_number_is_still_accepted(self):
+        window = SequenceWindow(watermark=10, gap_timeout=5)
+        window.accept(12)
+        window.advance(0)
+        assert window.watermark == 10  # waits for 11
+        assert window.accept(11)
+        window.advance(1)
+        assert window.watermark == 12
+
+    def test_gap_is_given_up_after_the_timeout(self):
+        window = SequenceWindow(watermark=10, gap_timeout=5)
+        window.accept(13)
+        assert window.advance(0) == 0
+        assert window.advance(4) == 0
+        assert window.advance(6) == 2
+        assert window.watermark == 13
+
+
+class TestPublishQueue:
+    def test_writes_before_mode_detection_are_queued(self):
+        bus = InvalidationBus(db=None)
+        bus._task = object()  # started, mode not detected yet
+        bus.publish("races", "update", "r1")
+        assert list(bus._queued) == [("races", "update", "r1")]
+        bus.mode = "stream"
+        bus._flush_queued()  # change streams see the write themselves
+        assert not bus._queued and not bus._pending_publishes
+
+    def test_published_collections_are_announced_in_stream_mode(self):
+        bus = InvalidationBus(db=None, published={"favorites"}, mode="stream")
+        assert bus.announces("favorites") and not bus.announces("races")
+        bus.mode = "poll"
+        assert bus.announces("races")
+
+    def test_nothing_is_queued_when_the_bus_is_not_running(self):
+        bus = InvalidationBus(db=None)
+        bus.publish("races", "update", "r1")
+        assert not bus._queued
@@ -0,0 +1,99 @@
+"""
+Unit tests for the Prometheus metrics module (no server required)
+"""
+import asyncio
+
+from fastapi import FastAPI
+
+from metrics import (
+    Counter, Histogram, MetricsMiddleware, Registry, _returned_documents, http_request_duration, http_requests_total,
+)
+
+
+async def asgi_get(app, path: str) -> int:
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [], "scheme": "http", "server": ("test", 80), "root_path": ""}
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status["code"]
+
+
+class TestExposition:
+    def test_help_type_and_escaped_labels(self):
+        counter = Counter("requests_total", "Requests served", ("path",))
+        counter.inc('/a"b\\c\n')
+        counter.inc("/b", amount=2)
+        assert counter.render().split("\n") == [
+            "# HELP requests_total Requests served",
+            "# TYPE requests_total counter",
+            'requests_total{path="/a\\"b\\\\c\\n"} 1',
+            'requests_total{path="/b"} 2',
+        ]
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe("/races", value=value)
+        samples = histogram.render().split("\n")[2:]
+        assert samples == [
+            'latency_seconds_bucket{route="/races",le="0.1"} 2',
+            'latency_seconds_bucket{route="/races",le="1.0"} 3',
+            'latency_seconds_bucket{route="/races",le="+Inf"} 4',
+            'latency_seconds_sum{route="/races"} 3.65',
+            'latency_seconds_count{route="/races"} 4',
+        ]
+
+    def test_registry_renders_every_metric_with_a_final_newline(self):
+        registry = Registry()
+        registry.counter("a_total", "A").inc()
+        registry.gauge("b", "B").set(value=3)
+        body = registry.render()
+        assert body.endswith("\n")
+        assert "# TYPE a_total counter\na_total 1" in body
+        assert "# TYPE b gauge\nb 3" in body
+
+
+class TestMiddleware:
+    def test_route_template_labels_without_raw_ids(self):
+        app = FastAPI()
+
+        @app.get("/metrics-test/races/{race_id}")
+        async def race(race_id: str):
+            return {"id": race_id}
+
+        wrapped = MetricsMiddleware(app)
+        before = http_requests_total.value("GET", "/metrics-test/races/{race_id}", "200")
+        assert asyncio.run(asgi_get(wrapped, "/metrics-test/races/utmb-2027-4f1c")) == 200
+        assert asyncio.run(asgi_get(wrapped, "/metrics-test/nowhere-9d2e")) == 404
+
+        assert http_requests_total.value("GET", "/metrics-test/races/{race_id}", "200") == before + 1
+        assert http_requests_total.value("GET", "unmatched", "404") >= 1
+        exposition = http_requests_total.render() + http_request_duration.render()
+        assert "utmb-2027-4f1c" not in exposition and "nowhere-9d2e" not in exposition
+
+    def test_excluded_paths_are_not_recorded(self):
+        app = FastAPI()
+
+        @app.get("/metrics-test/excluded")
+        async def excluded():
+            return {}
+
+        wrapped = MetricsMiddleware(app, excluded_paths=["/metrics-test/excluded"])
+        asyncio.run(asgi_get(wrapped, "/metrics-test/excluded"))
+        assert "/metrics-test/excluded" not in http_requests_total.render()
+
+
+class TestMongoListener:
+    def test_returned_documents(self):
+        assert _returned_documents({"cursor": {"firstBatch": [{}, {}]}}) == 2
+        assert _returned_documents({"cursor": {"nextBatch": [{}]}}) == 1
+        assert _returned_documents({"n": 3}) == 3
+        assert _returned_documents({"ok": 1}) == 0
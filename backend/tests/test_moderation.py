@@ -0,0 +1,169 @@
+"""
+In-process tests of the admin moderation endpoints (in-memory Mongo, no server required)
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+os.environ.setdefault("INVALIDATION_BUS_ENABLED", "false")
+
+import httpx  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+def race(race_id: str, status: str) -> dict:
+    return {
+        "id": race_id, "name": f"Trail {race_id}", "description": "d", "location": "Millau", "region": "Occitanie",
+        "department": "Aveyron", "latitude": 44.1, "longitude": 3.08, "distance_km": 42, "elevation_gain": 2000,
+        "race_date": datetime(2030, 6, 1, tzinfo=timezone.utc), "registration_open_date": "2030-01-01",
+        "is_utmb": False, "status": status, "favorite_count": 0, "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+@pytest.fixture
+def app_db(monkeypatch):
+    database = AsyncMongoMockClient()["ttd_moderation_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "read_db", database)
+    published = []
+    monkeypatch.setattr(server, "publish_race_event", lambda race, *args: published.append(race["id"]))
+    return database, published
+
+
+def run(database, scenario):
+    async def main():
+        await database.users.insert_one({"id": "admin", "email": "a@b.fr", "name": "A", "role": "admin", "created_at": "x"})
+        await database.races.insert_many([race("p1", "pending"), race("p2", "pending"), race("a1", "approved")])
+        await server.reconcile_admin_stats()
+        headers = {"Authorization": f"Bearer {server.create_token('admin', 'admin')}"}
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test/api", headers=headers) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+async def race_counts(client) -> dict:
+    return (await client.get("/admin/stats")).json()["races"]
+
+
+class TestBulkModeration:
+    def test_results_per_id_and_modified_count(self, app_db):
+        database, published = app_db
+
+        async def scenario(client):
+            response = await client.post("/admin/moderate/bulk", json={
+                "race_ids": ["p1", "a1", "missing", "p2", "p1"], "action": "approve",
+            })
+            return response.json(), await race_counts(client)
+
+        body, counts = run(database, scenario)
+        assert body["results"] == {"p1": "approved", "a1": "unchanged", "missing": "not_found", "p2": "approved"}
+        assert body["modified"] == 2
+        assert counts == {"pending": 0, "approved": 3, "rejected": 0}
+        assert sorted(published) == ["p1", "p2"]
+
+    def test_race_moderated_concurrently_is_not_counted(self, app_db, monkeypatch):
+        database, published = app_db
+
+        class RacesRejectingP2First:
+            """races collection where another admin rejects p2 between the read and the update"""
+            def __getattr__(self, name):
+                return getattr(database.races, name)
+
+            async def update_many(self, *args, **kwargs):
+                await database.races.update_one({"id": "p2"}, {"$set": {"status": "rejected"}})
+                return await database.races.update_many(*args, **kwargs)
+
+        class Database:
+            races = RacesRejectingP2First()
+
+            def __getattr__(self, name):
+                return getattr(database, name)
+
+        async def scenario(client):
+            monkeypatch.setattr(server, "db", Database())
+            response = await client.post("/admin/moderate/bulk", json={"race_ids": ["p1", "p2"], "action": "approve"})
+            monkeypatch.setattr(server, "db", database)
+            return response.json(), await race_counts(client)
+
+        body, counts = run(database, scenario)
+        assert body["modified"] == 1
+        assert body["results"] == {"p1": "approved", "p2": "unchanged"}
+        assert published == ["p1"]
+        # p2 left "pending" in the concurrent request, which counted it; only p1 is counted here
+        assert counts == {"pending": 1, "approved": 2, "rejected": 0}
+
+    def test_invalid_action_and_empty_batch(self, app_db):
+        database, _ = app_db
+
+        async def scenario(client):
+            invalid = await client.post("/admin/moderate/bulk", json={"race_ids": ["p1"], "action": "delete"})
+            empty = await client.post("/admin/moderate/bulk", json={"race_ids": [], "action": "approve"})
+            return invalid.status_code, empty.status_code
+
+        assert run(database, scenario) == (400, 400)
+
+
+class TestSingleModeration:
+    def test_unchanged_status_is_a_no_op(self, app_db):
+        database, published = app_db
+
+        async def scenario(client):
+            response = await client.post("/admin/moderate/a1", json={"action": "approve"})
+            return response.json(), await race_counts(client)
+
+        body, counts = run(database, scenario)
+        assert body == {"message": "Race already approved"}
+        assert counts == {"pending": 2, "approved": 1, "rejected": 0}
+        assert published == []
+
+    def test_status_change_updates_counters(self, app_db):
+        database, published = app_db
+
+        async def scenario(client):
+            await client.post("/admin/moderate/p1", json={"action": "reject"})
+            return await race_counts(client)
+
+        assert run(database, scenario) == {"pending": 1, "approved": 1, "rejected": 1}
+        assert published == ["p1"]
+
+
+class TestDeleteAllStats:
+    def test_recount_runs_inline(self, app_db):
+        database, _ = app_db
+
+        async def scenario(client):
+            body = (await client.delete("/admin/races/all")).json()
+            return body, await race_counts(client)
+
+        body, counts = run(database, scenario)
+        assert body == {"message": "3 course(s) supprimée(s)", "stats_pending": False}
+        assert counts == {"pending": 0, "approved": 0, "rejected": 0}
+
+    def test_recount_pending_while_another_worker_holds_the_lease(self, app_db, monkeypatch):
+        database, _ = app_db
+        monkeypatch.setattr(server, "ADMIN_STATS_RETRY_SECONDS", 0.05)
+
+        async def scenario(client):
+            await database.job_leases.update_one(
+                {"_id": "admin-stats"},
+                {"$set": {"holder": "other-worker", "expires_at": datetime(2100, 1, 1, tzinfo=timezone.utc)}},
+            )
+            body = (await client.delete("/admin/races/all")).json()
+            stale = await race_counts(client)
+            await database.job_leases.update_one(
+                {"_id": "admin-stats"}, {"$set": {"expires_at": datetime(2000, 1, 1, tzinfo=timezone.utc)}}
+            )
+            await asyncio.gather(*server.background_jobs)
+            return body, stale, await race_counts(client)
+
+        body, stale, counts = run(database, scenario)
+        assert body["stats_pending"] is True
+        assert server.ADMIN_STATS_PENDING_MESSAGE in body["message"]
+        assert stale == {"pending": 2, "approved": 1, "rejected": 0}
+        assert counts == {"pending": 0, "approved": 0, "rejected": 0}
@@ -0,0 +1,99 @@
+"""
+Unit tests for request profiling and slow-query capture (no server required)
+"""
+import asyncio
+import cProfile
+from types import SimpleNamespace
+
+import profiling
+from profiling import ProfileStore, ProfilingMiddleware, SlowQueryListener, command_shape
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def call(app, headers=(), path="/api/races"):
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"page=2", "headers": list(headers)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+
+def middleware(store, admin=True, sample_rate=0.0):
+    return ProfilingMiddleware(ok_app, store, is_admin_request=lambda headers: admin, sample_rate=sample_rate)
+
+
+class TestSamplingDecision:
+    def test_header_profiles_admin_requests_only(self):
+        store = ProfileStore()
+        headers = call(middleware(store), [(b"x-profile", b"1")])
+        assert b"x-profile-id" in headers
+        assert store.get(headers[b"x-profile-id"].decode())["path"] == "/api/races?page=2"
+
+        other = ProfileStore()
+        assert b"x-profile-id" not in call(middleware(other, admin=False), [(b"x-profile", b"1")])
+        assert other.list() == []
+
+    def test_random_sampling_follows_the_rate(self, monkeypatch):
+        store = ProfileStore()
+        monkeypatch.setattr(profiling.random, "random", lambda: 0.3)
+        call(middleware(store, sample_rate=0.25))
+        assert store.list() == []
+        call(middleware(store, sample_rate=0.5))
+        assert len(store.list()) == 1
+        call(middleware(store, sample_rate=0.0))
+        assert len(store.list()) == 1
+
+    def test_slow_query_threshold(self):
+        slow = []
+        listener = SlowQueryListener(threshold_ms=50, on_slow=slow.append)
+
+        def run(request_id, micros, collection="races"):
+            command = {"find": collection, "filter": {"status": "approved", "distance": {"$gte": 42}}}
+            listener.started(SimpleNamespace(command=command, command_name="find", request_id=request_id,
+                                             connection_id=("db", 27017), database_name="trail"))
+            listener.succeeded(SimpleNamespace(command_name="find", request_id=request_id,
+                                               connection_id=("db", 27017), duration_micros=micros))
+
+        run(1, 49_000)
+        run(2, 50_000)
+        run(3, 900_000, collection="slow_queries")
+        assert len(slow) == 1
+        assert slow[0]["duration_ms"] == 50.0
+        assert slow[0]["shape"] == {"filter": {"status": "?", "distance": {"$gte": "?"}}}
+
+
+class TestProfileStore:
+    def test_bounded_to_max_profiles(self):
+        store = ProfileStore(max_profiles=3)
+        for index in range(5):
+            store.add({"id": f"p{index}", "stats": cProfile.Profile()})
+        assert [entry["id"] for entry in store.list()] == ["p4", "p3", "p2"]
+        assert store.get("p0") is None
+        assert all("stats" not in entry for entry in store.list())
+
+    def test_stored_profile_renders(self):
+        store = ProfileStore()
+        headers = call(middleware(store), [(b"x-profile", b"1")])
+        entry = store.get(headers[b"x-profile-id"].decode())
+        assert entry["status"] == 200 and entry["duration_ms"] >= 0
+        report = ProfileStore.render(entry, limit=10)
+        assert "function calls" in report and "cumulative" in report
+
+
+class TestQueryShape:
+    def test_in_lists_collapse_and_updates_keep_one_statement(self):
+        shape = command_shape("update", {"update": "races", "updates": [
+            {"q": {"id": {"$in": ["a", "b", "c"]}}, "u": {"$inc": {"favorite_count": 1}}},
+            {"q": {"id": "d"}, "u": {"$set": {"x": 1}}},
+        ]})
+        assert shape == {"updates": [{"q": {"id": {"$in": ["?"]}}, "u": {"$inc": {"favorite_count": "?"}}}]}
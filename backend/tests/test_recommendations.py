@@ -0,0 +1,68 @@
+"""
+Tests for the co-favorite model build (in-memory Mongo, no server required)
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from recommendations import build_co_favorites  # noqa: E402
+
+# Trail runners follow trail races together, road runners road races
+FOLLOWS = {
+    "u1": ["utmb", "ccc", "tds"],
+    "u2": ["utmb", "ccc"],
+    "u3": ["utmb", "ccc", "marathon"],
+    "u4": ["utmb", "tds"],
+    "u5": ["marathon", "semi"],
+    "u6": ["marathon", "semi"],
+    "u7": ["ccc"],
+}
+
+
+def build(**options):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await db.favorites.insert_many([
+            {"user_id": user_id, "race_id": race_id} for user_id, races in FOLLOWS.items() for race_id in races
+        ])
+        stats = await build_co_favorites(db, **options)
+        docs = await db.race_recommendations.find({}, {"_id": 0}).to_list(None)
+        return db, stats, {doc["race_id"]: doc["related"] for doc in docs}
+
+    return asyncio.run(scenario())
+
+
+class TestCoFavorites:
+    def test_related_races_are_ranked_by_normalized_co_occurrence(self):
+        _, stats, related = build()
+        assert [item["race_id"] for item in related["utmb"]] == ["ccc", "tds"]
+        assert related["utmb"][0]["count"] == 3
+        assert stats["users"] == 7
+
+    def test_pairs_below_min_support_are_dropped(self):
+        _, _, related = build()
+        # marathon/utmb and marathon/ccc were followed together by a single runner
+        assert [item["race_id"] for item in related["marathon"]] == ["semi"]
+
+    def test_partitioned_build_matches_single_pass(self):
+        _, _, single = build()
+        _, stats, partitioned = build(max_pairs_in_memory=4)
+        assert stats["partitions"] > 1
+        assert partitioned == single
+
+    def test_top_n_and_stale_documents(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["test"]
+            await db.race_recommendations.insert_one({"race_id": "deleted-race", "related": [], "build_id": "old"})
+            await db.favorites.insert_many([
+                {"user_id": user_id, "race_id": race_id} for user_id, races in FOLLOWS.items() for race_id in races
+            ])
+            await build_co_favorites(db, top_n=1)
+            return await db.race_recommendations.find({}, {"_id": 0}).to_list(None)
+
+        docs = asyncio.run(scenario())
+        assert "deleted-race" not in {doc["race_id"] for doc in docs}
+        assert all(len(doc["related"]) == 1 for doc in docs)
@@ -276,6 +276,40 @@ class TestAdminReportActions:
         assert response.status_code == 404
         print("Validate on non-existent race correctly returns 404")
 
+    # --- Test POST /api/admin/reports/bulk ---
+    
+    def test_bulk_reports_requires_admin(self):
+        """Test that bulk report moderation requires admin auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/reports/bulk",
+                                 json={"race_ids": [TEST_RACE_ID], "action": "reject"})
+        
+        assert response.status_code in [401, 403]
+    
+    def test_bulk_reports_per_id_results(self, admin_headers):
+        """Test bulk validate returns a status for each race id"""
+        fake_race_id = str(uuid.uuid4())
+        
+        response = requests.post(
+            f"{BASE_URL}/api/admin/reports/bulk",
+            json={"race_ids": [fake_race_id, fake_race_id], "action": "validate"},
+            headers=admin_headers
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["results"] == {fake_race_id: "not_found"}
+        assert data["reports_modified"] == 0
+    
+    def test_bulk_reports_invalid_action(self, admin_headers):
+        """Test bulk moderation rejects unknown actions"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/reports/bulk",
+            json={"race_ids": [TEST_RACE_ID], "action": "approve"},
+            headers=admin_headers
+        )
+        
+        assert response.status_code == 400
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
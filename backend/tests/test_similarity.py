@@ -0,0 +1,72 @@
+"""
+Unit tests for the similar-races feature index (no server required)
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from similarity import RaceFeatureIndex  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+
+
+def race(race_id, distance, elevation, latitude=45.9, longitude=6.9, days=60, **extra):
+    return {
+        "id": race_id, "status": "approved", "distance_km": distance, "elevation_gain": elevation,
+        "latitude": latitude, "longitude": longitude, "race_date": NOW + timedelta(days=days),
+        "registration_open_date": NOW - timedelta(days=10), "is_utmb": False, **extra,
+    }
+
+
+@pytest.fixture
+def index():
+    built = RaceFeatureIndex()
+    built.build([
+        race("ultra-chamonix", 170, 10000),
+        race("ultra-annecy", 160, 9500, latitude=45.9, longitude=6.1),
+        race("ultra-brittany", 160, 2500, latitude=48.1, longitude=-2.9),
+        race("short-chamonix", 12, 600),
+        race("short-lyon", 10, 150, latitude=45.7, longitude=4.8),
+        race("past-ultra", 170, 10000, days=-30),
+    ])
+    return built
+
+
+class TestRaceFeatureIndex:
+    def test_nearest_race_shares_distance_and_elevation(self, index):
+        ids = [race_id for race_id, _ in index.query("ultra-chamonix", k=3)]
+        assert ids[0] == "ultra-annecy"
+        assert "ultra-chamonix" not in ids
+
+    def test_past_races_are_excluded(self, index):
+        ids = [race_id for race_id, _ in index.query("ultra-chamonix", k=10)]
+        assert "past-ultra" not in ids
+        assert len(ids) == 4
+
+    def test_registration_open_filter(self, index):
+        index.upsert(race("ultra-annecy", 160, 9500, latitude=45.9, longitude=6.1, reported_full=True))
+        index.upsert(race("ultra-brittany", 160, 2500, latitude=48.1, longitude=-2.9,
+                          registration_open_date=NOW + timedelta(days=5)))
+        ids = [race_id for race_id, _ in index.query("ultra-chamonix", k=10, registration_open=True)]
+        assert ids == ["short-chamonix", "short-lyon"] or set(ids) == {"short-chamonix", "short-lyon"}
+
+    def test_incremental_upsert_and_remove(self, index):
+        index.upsert(race("new-ultra", 171, 10100))
+        assert index.query("ultra-chamonix", k=1)[0][0] == "new-ultra"
+        index.upsert({**race("new-ultra", 171, 10100), "status": "rejected"})
+        assert "new-ultra" not in index.rows
+        assert index.query("ultra-chamonix", k=1)[0][0] == "ultra-annecy"
+        index.upsert(race("reused-row", 11, 550))
+        assert len(index) == 7
+
+    def test_grows_past_initial_capacity(self):
+        grown = RaceFeatureIndex(initial_capacity=4)
+        for number in range(20):
+            grown.upsert(race(f"race-{number}", 10 + number, 100 * number))
+        assert len(grown) == 20
+        assert grown.query("race-10", k=2)[0][0] in ("race-9", "race-11")
+
+    def test_unknown_race_has_no_neighbours(self, index):
+        assert index.query("missing") == []
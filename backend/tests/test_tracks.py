@@ -0,0 +1,97 @@
+"""
+Unit tests for GPX/TCX parsing and track processing (no server required)
+"""
+import io
+import math
+
+import numpy as np
+import pytest
+
+from tracks import (TrackError, TrackTooLarge, cumulative_distance, douglas_peucker, downsample_profile,
+                    encode_polyline, parse_track, process_track)
+
+
+def gpx(points, route=False):
+    tag = "rtept" if route else "trkpt"
+    body = "".join(f'<{tag} lat="{lat}" lon="{lon}"><ele>{ele}</ele></{tag}>' for lat, lon, ele in points)
+    wrapper = f"<rte>{body}</rte>" if route else f"<trk><trkseg>{body}</trkseg></trk>"
+    return io.BytesIO(f'<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1">{wrapper}</gpx>'.encode())
+
+
+def tcx(points):
+    body = "".join(
+        f"<Trackpoint><Position><LatitudeDegrees>{lat}</LatitudeDegrees><LongitudeDegrees>{lon}</LongitudeDegrees>"
+        f"</Position><AltitudeMeters>{ele}</AltitudeMeters></Trackpoint>" for lat, lon, ele in points
+    )
+    return io.BytesIO(
+        ('<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">'
+         f"<Courses><Course><Track>{body}</Track></Course></Courses></TrainingCenterDatabase>").encode()
+    )
+
+
+# 10 km due north from Chamonix, climbing 500 m then descending 200 m
+CLIMB = [(45.9237 + i * 0.0009, 6.8694, 1035 + min(i, 50) * 10 - max(i - 50, 0) * 4) for i in range(101)]
+
+
+class TestParsing:
+    def test_gpx_and_tcx_give_the_same_points(self):
+        lat, lon, ele = parse_track(gpx(CLIMB))
+        tcx_lat, tcx_lon, tcx_ele = parse_track(tcx(CLIMB))
+        assert len(lat) == 101
+        assert np.allclose(lat, tcx_lat) and np.allclose(lon, tcx_lon) and np.allclose(ele, tcx_ele)
+
+    def test_gpx_routes_are_accepted(self):
+        assert len(parse_track(gpx(CLIMB, route=True))[0]) == 101
+
+    def test_invalid_files_are_rejected(self):
+        with pytest.raises(TrackError):
+            parse_track(io.BytesIO(b"<gpx><trk>"))
+        with pytest.raises(TrackError):
+            parse_track(io.BytesIO(b"<gpx></gpx>"))
+        with pytest.raises(TrackError):
+            parse_track(gpx(CLIMB), max_points=50)
+
+    def test_size_cap_reads_at_most_one_byte_past_the_limit(self):
+        source = gpx(CLIMB)
+        size = len(source.getvalue())
+        assert len(parse_track(source, max_bytes=size)[0]) == len(CLIMB)
+        source.seek(0)
+        with pytest.raises(TrackTooLarge):
+            parse_track(source, max_bytes=size - 100)
+        assert source.tell() <= size - 99
+
+
+class TestProcessing:
+    def test_distance_and_elevation_gain(self):
+        summary = process_track(*parse_track(gpx(CLIMB)))
+        assert summary["distance_km"] == pytest.approx(10.0, abs=0.05)
+        assert summary["elevation_gain"] == pytest.approx(500, abs=15)
+        assert len(summary["profile"]["distance_km"]) == len(summary["profile"]["elevation_m"]) <= 500
+
+    def test_haversine_one_degree_of_latitude(self):
+        assert cumulative_distance(np.array([45.0, 46.0]), np.array([6.0, 6.0]))[-1] == pytest.approx(111195, rel=1e-3)
+
+    def test_douglas_peucker_keeps_corners_only(self):
+        points = np.array([[x, 0.0] for x in range(50)] + [[49.0, y] for y in range(1, 50)])
+        kept = douglas_peucker(points, tolerance=0.5)
+        assert kept.tolist() == [0, 49, 98]
+
+    def test_zoom_levels_are_progressively_detailed(self):
+        angles = np.linspace(0, 2 * math.pi, 20000)
+        lat, lon = 45.9 + 0.05 * np.sin(angles) + 0.0005 * np.sin(60 * angles), 6.87 + 0.07 * np.cos(angles)
+        summary = process_track(lat, lon, np.full(len(lat), np.nan))
+        counts = [summary["polyline_points"][zoom] for zoom in ("8", "11", "14")]
+        assert counts == sorted(counts) and counts[-1] < len(lat) / 10
+        assert summary["elevation_gain"] == 0 and summary["profile"]["distance_km"] == []
+        assert summary["has_elevation"] is False
+        assert process_track(lat, lon, np.full(len(lat), 1000.0))["has_elevation"] is True
+
+    def test_encoded_polyline_reference_example(self):
+        # Example from the polyline algorithm documentation
+        lat, lon = np.array([38.5, 40.7, 43.252]), np.array([-120.2, -120.95, -126.453])
+        assert encode_polyline(lat, lon) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+    def test_downsample_profile(self):
+        profile = {"distance_km": list(np.linspace(0, 10, 500)), "elevation_m": list(np.linspace(100, 600, 500))}
+        small = downsample_profile(profile, 11)
+        assert small["distance_km"][-1] == 10 and small["elevation_m"] == pytest.approx(list(np.linspace(100, 600, 11)))
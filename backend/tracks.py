@@ -0,0 +1,224 @@
+"""
+GPX / TCX course tracks.
+
+parse_track() reads the file with ElementTree.iterparse and clears every
+element once read, so a 50k-point export never lives in memory as a tree.
+Points end up in NumPy arrays; distance (haversine), positive elevation
+gain, the Douglas-Peucker simplification and the elevation profile are all
+computed on those arrays.
+
+The stored track is small: one encoded polyline per map zoom level
+(simplified to about one pixel at that zoom) and a fixed-size elevation
+profile. The raw points are dropped after processing.
+"""
+import math
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from xml.etree.ElementTree import ParseError, iterparse
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+# Map zoom level -> polyline; tolerance is one pixel at that zoom (Web Mercator)
+ZOOM_LEVELS = (8, 11, 14)
+METERS_PER_PIXEL_Z0 = 156543.03
+ELEVATION_STEP_M = 20.0  # elevation is resampled on this distance grid before computing D+
+ELEVATION_SMOOTHING = 5  # moving average window (in steps) against GPS/barometric noise
+PROFILE_POINTS = 500
+
+
+class TrackError(ValueError):
+    """The file is not a usable GPX/TCX track"""
+
+
+class TrackTooLarge(TrackError):
+    """The file is larger than the accepted upload size"""
+
+
+class _BoundedReader:
+    """read() of `source` failing as soon as more than `limit` bytes came out of it"""
+
+    def __init__(self, source: BinaryIO, limit: int):
+        self.source = source
+        self.limit = limit
+        self.total = 0
+
+    def read(self, size: int = -1) -> bytes:
+        # Never ask for more than one byte past the limit, even for read() without a size
+        allowed = self.limit - self.total + 1
+        chunk = self.source.read(allowed if size is None or size < 0 else min(size, allowed))
+        self.total += len(chunk)
+        if self.total > self.limit:
+            raise TrackTooLarge(f"Fichier trop volumineux (plus de {self.limit} octets)")
+        return chunk
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _float(text: Optional[str]) -> float:
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def parse_track(source: BinaryIO, max_points: int = 200000,
+                max_bytes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Stream (lat, lon, ele) arrays out of a GPX (trkpt/rtept) or TCX (Trackpoint) file.
+
+    With max_bytes, at most max_bytes + 1 bytes are read and TrackTooLarge is raised past the limit.
+    """
+    if max_bytes is not None:
+        source = _BoundedReader(source, max_bytes)
+    lats: List[float] = []
+    lons: List[float] = []
+    eles: List[float] = []
+    lat = lon = ele = math.nan
+    try:
+        for _, element in iterparse(source, events=("end",)):
+            tag = _local(element.tag)
+            if tag in ("ele", "AltitudeMeters"):
+                ele = _float(element.text)
+            elif tag == "LatitudeDegrees":
+                lat = _float(element.text)
+            elif tag == "LongitudeDegrees":
+                lon = _float(element.text)
+            elif tag in ("trkpt", "rtept", "Trackpoint"):
+                if tag != "Trackpoint":
+                    lat, lon = _float(element.get("lat")), _float(element.get("lon"))
+                if not (math.isnan(lat) or math.isnan(lon)):
+                    lats.append(lat)
+                    lons.append(lon)
+                    eles.append(ele)
+                    if len(lats) > max_points:
+                        raise TrackError(f"Trace trop détaillée (plus de {max_points} points)")
+                lat = lon = ele = math.nan
+                element.clear()
+            elif tag in ("trkseg", "trk", "rte", "Track", "Lap"):
+                element.clear()
+    except ParseError as e:
+        raise TrackError(f"Fichier GPX/TCX invalide: {e}")
+    if len(lats) < 2:
+        raise TrackError("Aucun point de trace trouvé dans le fichier")
+    return np.array(lats), np.array(lons), np.array(eles)
+
+
+def cumulative_distance(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Distance from the start at every point, in meters (haversine)"""
+    phi, lam = np.radians(lat), np.radians(lon)
+    a = np.sin(np.diff(phi) / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(np.diff(lam) / 2) ** 2
+    steps = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.concatenate([[0.0], np.cumsum(steps)])
+
+
+def _resampled_elevation(distance: np.ndarray, ele: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Elevation on a regular distance grid, smoothed; empty when the file has no elevation"""
+    known = ~np.isnan(ele)
+    if known.sum() < 2:
+        return np.empty(0), np.empty(0)
+    grid = np.arange(0, distance[-1] + ELEVATION_STEP_M, ELEVATION_STEP_M)
+    resampled = np.interp(grid, distance[known], ele[known])
+    if len(resampled) > ELEVATION_SMOOTHING:
+        padded = np.pad(resampled, ELEVATION_SMOOTHING // 2, mode='edge')
+        resampled = np.convolve(padded, np.ones(ELEVATION_SMOOTHING) / ELEVATION_SMOOTHING, mode='valid')
+    return grid, resampled
+
+
+def elevation_gain(grid_elevation: np.ndarray) -> float:
+    if len(grid_elevation) < 2:
+        return 0.0
+    return float(np.clip(np.diff(grid_elevation), 0, None).sum())
+
+
+def _project(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Equirectangular projection around the track, in meters"""
+    scale = math.cos(math.radians(float(np.mean(lat))))
+    return np.column_stack([np.radians(lon) * EARTH_RADIUS_M * scale, np.radians(lat) * EARTH_RADIUS_M])
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points kept (iterative, one vectorized distance pass per segment)"""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        chord = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = math.hypot(*chord)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+    return np.flatnonzero(keep)
+
+
+def encode_polyline(lat: np.ndarray, lon: np.ndarray, precision: int = 5) -> str:
+    """Google encoded polyline algorithm"""
+    factor = 10 ** precision
+    coordinates = np.column_stack([np.round(lat * factor), np.round(lon * factor)]).astype(np.int64)
+    deltas = np.diff(coordinates, axis=0, prepend=[[0, 0]]).ravel()
+    chunks = []
+    for value in ((deltas << 1) ^ (deltas >> 63)).tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def process_track(lat: np.ndarray, lon: np.ndarray, ele: np.ndarray) -> dict:
+    """Derived stats, per-zoom polylines and elevation profile of a parsed track"""
+    distance = cumulative_distance(lat, lon)
+    grid, grid_elevation = _resampled_elevation(distance, ele)
+    projected = _project(lat, lon)
+
+    polylines: Dict[str, str] = {}
+    point_counts: Dict[str, int] = {}
+    scale = math.cos(math.radians(float(np.mean(lat))))
+    for zoom in ZOOM_LEVELS:
+        kept = douglas_peucker(projected, METERS_PER_PIXEL_Z0 * scale / 2 ** zoom)
+        polylines[str(zoom)] = encode_polyline(lat[kept], lon[kept])
+        point_counts[str(zoom)] = len(kept)
+
+    profile = {"distance_km": [], "elevation_m": []}
+    if len(grid):
+        samples = np.linspace(0, distance[-1], min(PROFILE_POINTS, len(grid)))
+        profile = {
+            "distance_km": np.round(samples / 1000, 3).tolist(),
+            "elevation_m": np.round(np.interp(samples, grid, grid_elevation), 1).tolist(),
+        }
+
+    return {
+        "distance_km": round(float(distance[-1]) / 1000, 2),
+        "elevation_gain": int(round(elevation_gain(grid_elevation))),
+        "has_elevation": bool(len(grid)),
+        "points": len(lat),
+        "bounds": [float(lat.min()), float(lon.min()), float(lat.max()), float(lon.max())],
+        "start": [float(lat[0]), float(lon[0])],
+        "polylines": polylines,
+        "polyline_points": point_counts,
+        "profile": profile,
+    }
+
+
+def downsample_profile(profile: dict, points: int) -> dict:
+    """Resample a stored profile to at most `points` evenly spaced samples"""
+    distance = np.asarray(profile.get("distance_km") or [], dtype=float)
+    elevation = np.asarray(profile.get("elevation_m") or [], dtype=float)
+    if len(distance) <= points:
+        return {"distance_km": distance.tolist(), "elevation_m": elevation.tolist()}
+    samples = np.linspace(distance[0], distance[-1], points)
+    return {
+        "distance_km": np.round(samples, 3).tolist(),
+        "elevation_m": np.round(np.interp(samples, distance, elevation), 1).tolist(),
+    }
@@ -1,4 +1,4 @@
-import { useEffect, useRef } from 'react';
+import { useEffect, useMemo, useRef } from 'react';
 import { MapContainer, TileLayer, Marker, Popup, useMap } from 'react-leaflet';
 import L from 'leaflet';
 import 'leaflet/dist/leaflet.css';
@@ -47,8 +47,13 @@ const FitBounds = ({ races }) => {
   return null;
 };
 
-export const RaceMap = ({ races, selectedRace, onRaceSelect, height = '600px' }) => {
+export const RaceMap = ({ races: allRaces, selectedRace, onRaceSelect, height = '600px' }) => {
   const mapRef = useRef(null);
+  // Races whose commune could not be geocoded have no coordinates
+  const races = useMemo(
+    () => allRaces.filter(race => race.latitude != null && race.longitude != null),
+    [allRaces]
+  );
 
   // France center
   const defaultCenter = [46.603354, 1.888334];
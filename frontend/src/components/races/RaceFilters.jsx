@@ -11,10 +11,21 @@ import {
 } from '../ui/select';
 import { Switch } from '../ui/switch';
 import { Label } from '../ui/label';
-import { Search, X, SlidersHorizontal } from 'lucide-react';
-import { filtersAPI } from '../../lib/api';
+import { Search, X, SlidersHorizontal, CalendarPlus } from 'lucide-react';
+import { filtersAPI, calendarAPI } from '../../lib/api';
 import { FRANCE_REGIONS } from '../../lib/utils';
 
+const SORT_OPTIONS = [
+  { value: 'date', label: 'Date' },
+  { value: 'distance', label: 'Distance (croissante)' },
+  { value: '-distance', label: 'Distance (décroissante)' },
+  { value: '-elevation', label: 'Dénivelé (décroissant)' },
+  { value: 'effort', label: 'Km-effort (croissant)' },
+  { value: '-effort', label: 'Km-effort (décroissant)' },
+  { value: 'popularity', label: 'Popularité' },
+  { value: 'proximity', label: 'Proximité' },
+];
+
 export const RaceFilters = ({ filters, onFiltersChange, onSearch }) => {
   const [regions, setRegions] = useState([]);
   const [departments, setDepartments] = useState([]);
@@ -52,12 +63,36 @@ export const RaceFilters = ({ filters, onFiltersChange, onSearch }) => {
     onFiltersChange(newFilters);
   };
 
+  const handleSortChange = (value) => {
+    const newFilters = { ...filters };
+    delete newFilters.lat;
+    delete newFilters.lon;
+    if (value === 'date') {
+      delete newFilters.sort;
+      onFiltersChange(newFilters);
+      return;
+    }
+    if (value !== 'proximity') {
+      onFiltersChange({ ...newFilters, sort: value });
+      return;
+    }
+    navigator.geolocation?.getCurrentPosition(
+      ({ coords }) => onFiltersChange({
+        ...newFilters,
+        sort: value,
+        lat: coords.latitude.toFixed(4),
+        lon: coords.longitude.toFixed(4),
+      }),
+      () => onFiltersChange(newFilters)
+    );
+  };
+
   const clearFilters = () => {
     setSearchValue('');
     onFiltersChange({});
   };
 
-  const activeFiltersCount = Object.keys(filters).filter(k => filters[k] && k !== 'search').length;
+  const activeFiltersCount = Object.keys(filters).filter(k => filters[k] && !['search', 'sort', 'lat', 'lon'].includes(k)).length;
 
   return (
     <div className="space-y-4" data-testid="race-filters">
@@ -171,6 +206,21 @@ export const RaceFilters = ({ filters, onFiltersChange, onSearch }) => {
               </Select>
             </div>
 
+            {/* Sort */}
+            <div className="space-y-2">
+              <Label className="text-xs text-muted-foreground uppercase tracking-wide">Trier par</Label>
+              <Select value={filters.sort || 'date'} onValueChange={handleSortChange}>
+                <SelectTrigger className="h-10 bg-background border-border rounded-lg" data-testid="sort-select">
+                  <SelectValue placeholder="Date" />
+                </SelectTrigger>
+                <SelectContent>
+                  {SORT_OPTIONS.map(option => (
+                    <SelectItem key={option.value} value={option.value}>{option.label}</SelectItem>
+                  ))}
+                </SelectContent>
+              </Select>
+            </div>
+
             {/* Registration status */}
             <div className="space-y-2">
               <Label className="text-xs text-muted-foreground uppercase tracking-wide">Inscriptions</Label>
@@ -199,6 +249,21 @@ export const RaceFilters = ({ filters, onFiltersChange, onSearch }) => {
             <Label htmlFor="utmb-filter" className="text-sm cursor-pointer">
               Courses UTMB uniquement
             </Label>
+            {/* Public .ics feed of the current filters (upcoming races) */}
+            <a
+              href={calendarAPI.webcal(calendarAPI.racesFeedUrl({
+                region: filters.region,
+                department: filters.department,
+                min_distance: filters.min_distance,
+                max_distance: filters.max_distance,
+                is_utmb: filters.is_utmb,
+              }))}
+              className="ml-auto flex items-center gap-1 text-sm text-muted-foreground hover:text-primary"
+              data-testid="races-calendar-link"
+            >
+              <CalendarPlus className="h-4 w-4" />
+              Ajouter à mon agenda
+            </a>
           </div>
         </div>
       )}
@@ -41,7 +41,22 @@ export const authAPI = {
 // Races API
 export const racesAPI = {
   getAll: (params) => api.get('/races', { params }),
+  getPopular: (limit = 10) => api.get('/races/popular', { params: { limit } }),
+  getBatch: (ids) => api.get('/races/batch', { params: { ids: ids.join(',') } }),
   getById: (id) => api.get(`/races/${id}`),
+  getSimilar: (id, { limit = 6, registrationOpen = false } = {}) =>
+    api.get(`/races/${id}/similar`, { params: { limit, registration_open: registrationOpen } }),
+  getAlsoFollowed: (id, limit = 6) => api.get(`/races/${id}/also-followed`, { params: { limit } }),
+  getTrack: (id, zoom) => api.get(`/races/${id}/track`, { params: { zoom } }),
+  getElevationProfile: (id, points = 200) => api.get(`/races/${id}/elevation-profile`, { params: { points } }),
+  // Live status changes (Server-Sent Events): pass { ids: [...] } or { region, department }
+  subscribe: ({ ids, region, department } = {}) => {
+    const params = new URLSearchParams();
+    if (ids?.length) params.set('ids', ids.join(','));
+    if (region) params.set('region', region);
+    if (department) params.set('department', department);
+    return new EventSource(`${API_URL}/api/races/stream?${params}`);
+  },
   create: (data) => api.post('/races', data),
   update: (id, data) => api.put(`/races/${id}`, data),
   delete: (id) => api.delete(`/races/${id}`),
@@ -52,13 +67,28 @@ export const favoritesAPI = {
   getAll: () => api.get('/favorites'),
   add: (raceId, notify = true) => api.post(`/favorites/${raceId}?notify=${notify}`),
   remove: (raceId) => api.delete(`/favorites/${raceId}`),
+  batch: (add = [], remove = [], notify = true) => api.post('/favorites/batch', { add, remove, notify }),
   toggleNotify: (raceId, notify) => api.put(`/favorites/${raceId}/notify?notify=${notify}`),
+  getRecommendations: (limit = 12) => api.get('/recommendations/for-you', { params: { limit } }),
+};
+
+// Tracks API: upload a GPX/TCX file, then send its id as track_id with racesAPI.create/update
+export const tracksAPI = {
+  upload: (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post('/tracks', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+  },
 };
 
 // Admin API
 export const adminAPI = {
   getPending: () => api.get('/admin/pending'),
   moderate: (raceId, action, reason) => api.post(`/admin/moderate/${raceId}`, { action, reason }),
+  moderateBulk: (raceIds, action, reason) => api.post('/admin/moderate/bulk', { race_ids: raceIds, action, reason }),
+  moderateReports: (raceIds, action) => api.post('/admin/reports/bulk', { race_ids: raceIds, action }),
+  getDuplicates: (limit = 100) => api.get('/admin/duplicates', { params: { limit } }),
+  getStats: () => api.get('/admin/stats'),
 };
 
 // Filters API
@@ -67,11 +97,30 @@ export const filtersAPI = {
   getDepartments: (region) => api.get('/filters/departments', { params: { region } }),
 };
 
+// Geocoding API (offline commune gazetteer)
+export const geocodeAPI = {
+  lookup: (location, department) => api.get('/geocode', { params: { location, department: department || undefined } }),
+};
+
 // Seed API
 export const seedAPI = {
   seed: () => api.post('/seed'),
 };
 
+// Calendar API: .ics feeds for calendar apps (webcal:// subscribes in one click)
+export const calendarAPI = {
+  getToken: () => api.get('/calendar/token'),
+  regenerateToken: () => api.post('/calendar/token'),
+  feedUrl: (path) => `${API_URL}${path}`,
+  racesFeedUrl: (filters = {}) => {
+    const params = new URLSearchParams(
+      Object.entries(filters).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    );
+    return `${API_URL}/api/calendar/races.ics${params.toString() ? `?${params}` : ''}`;
+  },
+  webcal: (url) => url.replace(/^https?:\/\//, 'webcal://'),
+};
+
 // User API
 export const userAPI = {
   updateSettings: (emailNotifications) => api.put(`/users/settings?email_notifications=${emailNotifications}`),
@@ -1,7 +1,7 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../lib/auth-context';
-import { racesAPI } from '../lib/api';
+import { racesAPI, tracksAPI, geocodeAPI } from '../lib/api';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
@@ -23,6 +23,9 @@ export default function AddRace() {
   const { user, loading: authLoading } = useAuth();
   const navigate = useNavigate();
   const [loading, setLoading] = useState(false);
+  const [track, setTrack] = useState(null);
+  const [trackUploading, setTrackUploading] = useState(false);
+  const [duplicates, setDuplicates] = useState(null);
   const [formData, setFormData] = useState({
     name: '',
     description: '',
@@ -45,6 +48,46 @@ export default function AddRace() {
     setFormData(prev => ({ ...prev, [field]: value }));
   };
 
+  const handleTrackUpload = async (file) => {
+    if (!file) return;
+    setTrackUploading(true);
+    try {
+      const { data } = await tracksAPI.upload(file);
+      setTrack(data);
+      // Distance and D+ come from the track (D+ only when it has elevation); the start point is a sensible default location
+      setFormData(prev => ({
+        ...prev,
+        distance_km: String(data.distance_km),
+        elevation_gain: data.has_elevation ? String(data.elevation_gain) : prev.elevation_gain,
+        latitude: prev.latitude || String(data.start[0]),
+        longitude: prev.longitude || String(data.start[1]),
+      }));
+      toast.success(data.has_elevation
+        ? `Trace importée : ${data.distance_km} km, ${data.elevation_gain} m D+`
+        : `Trace importée : ${data.distance_km} km, sans altitude (saisissez le D+)`);
+    } catch (err) {
+      setTrack(null);
+      toast.error(err.response?.data?.detail || 'Erreur lors de l\'import de la trace');
+    } finally {
+      setTrackUploading(false);
+    }
+  };
+
+  // Offline gazetteer on the server: prefill coordinates from the commune when still empty
+  const handleLocationBlur = async () => {
+    if (!formData.location || (formData.latitude && formData.longitude)) return;
+    try {
+      const { data } = await geocodeAPI.lookup(formData.location, formData.department);
+      setFormData(prev => ({
+        ...prev,
+        latitude: prev.latitude || String(data.latitude),
+        longitude: prev.longitude || String(data.longitude),
+      }));
+    } catch {
+      // Unknown commune: coordinates stay manual
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -58,13 +101,15 @@ export default function AddRace() {
     try {
       const data = {
         ...formData,
-        latitude: parseFloat(formData.latitude),
-        longitude: parseFloat(formData.longitude),
+        latitude: formData.latitude ? parseFloat(formData.latitude) : null,
+        longitude: formData.longitude ? parseFloat(formData.longitude) : null,
         distance_km: parseFloat(formData.distance_km),
         elevation_gain: parseInt(formData.elevation_gain),
         registration_close_date: formData.registration_close_date || null,
         website_url: formData.website_url || null,
         image_url: formData.image_url || null,
+        track_id: track?.id || null,
+        ignore_duplicates: duplicates !== null,
       };
 
       await racesAPI.create(data);
@@ -76,7 +121,12 @@ export default function AddRace() {
       }
       navigate('/races');
     } catch (err) {
-      toast.error(err.response?.data?.detail || 'Erreur lors de l\'ajout');
+      if (err.response?.status === 409) {
+        // Similar races exist: list them, submitting again confirms
+        setDuplicates(err.response.data.detail.duplicates);
+      } else {
+        toast.error(err.response?.data?.detail || 'Erreur lors de l\'ajout');
+      }
     } finally {
       setLoading(false);
     }
@@ -152,6 +202,26 @@ export default function AddRace() {
                   />
                 </div>
 
+                <div className="md:col-span-2 space-y-2">
+                  <Label htmlFor="track">Trace GPX / TCX</Label>
+                  <Input
+                    id="track"
+                    type="file"
+                    accept=".gpx,.tcx"
+                    onChange={(e) => handleTrackUpload(e.target.files?.[0])}
+                    disabled={trackUploading}
+                    className="h-12 bg-background rounded-xl"
+                    data-testid="race-track-input"
+                  />
+                  <p className="text-xs text-muted-foreground">
+                    {trackUploading
+                      ? 'Analyse de la trace...'
+                      : track
+                        ? `${track.filename} : ${track.points} points, distance et dénivelé calculés depuis la trace`
+                        : 'Optionnel : la distance et le dénivelé seront calculés automatiquement'}
+                  </p>
+                </div>
+
                 <div className="space-y-2">
                   <Label htmlFor="distance_km">Distance (km) *</Label>
                   <Input
@@ -161,6 +231,7 @@ export default function AddRace() {
                     onChange={(e) => handleChange('distance_km', e.target.value)}
                     placeholder="100"
                     required
+                    readOnly={!!track}
                     min="1"
                     className="h-12 bg-background rounded-xl"
                     data-testid="race-distance-input"
@@ -176,6 +247,7 @@ export default function AddRace() {
                     onChange={(e) => handleChange('elevation_gain', e.target.value)}
                     placeholder="5000"
                     required
+                    readOnly={!!track?.has_elevation}
                     min="0"
                     className="h-12 bg-background rounded-xl"
                     data-testid="race-elevation-input"
@@ -210,6 +282,7 @@ export default function AddRace() {
                     id="location"
                     value={formData.location}
                     onChange={(e) => handleChange('location', e.target.value)}
+                    onBlur={handleLocationBlur}
                     placeholder="Chamonix"
                     required
                     className="h-12 bg-background rounded-xl"
@@ -245,30 +318,28 @@ export default function AddRace() {
                 </div>
 
                 <div className="space-y-2">
-                  <Label htmlFor="latitude">Latitude *</Label>
+                  <Label htmlFor="latitude">Latitude</Label>
                   <Input
                     id="latitude"
                     type="number"
                     step="any"
                     value={formData.latitude}
                     onChange={(e) => handleChange('latitude', e.target.value)}
-                    placeholder="45.9237"
-                    required
+                    placeholder="Déduite de la commune"
                     className="h-12 bg-background rounded-xl"
                     data-testid="race-latitude-input"
                   />
                 </div>
 
                 <div className="space-y-2">
-                  <Label htmlFor="longitude">Longitude *</Label>
+                  <Label htmlFor="longitude">Longitude</Label>
                   <Input
                     id="longitude"
                     type="number"
                     step="any"
                     value={formData.longitude}
                     onChange={(e) => handleChange('longitude', e.target.value)}
-                    placeholder="6.8694"
-                    required
+                    placeholder="Déduite de la commune"
                     className="h-12 bg-background rounded-xl"
                     data-testid="race-longitude-input"
                   />
@@ -357,6 +428,22 @@ export default function AddRace() {
               </div>
             </div>
 
+            {duplicates && (
+              <div className="rounded-xl border border-amber-300 bg-amber-50 p-4 text-sm space-y-2" data-testid="race-duplicates">
+                <p className="font-medium">Cette course semble déjà exister :</p>
+                <ul className="list-disc pl-5">
+                  {duplicates.map((duplicate) => (
+                    <li key={duplicate.id}>
+                      <a href={`/races/${duplicate.id}`} target="_blank" rel="noreferrer" className="underline">
+                        {duplicate.name}
+                      </a>
+                    </li>
+                  ))}
+                </ul>
+                <p>S'il s'agit bien d'une autre course, soumettez à nouveau pour confirmer.</p>
+              </div>
+            )}
+
             {/* Submit */}
             <div className="flex gap-4 pt-4">
               <Button
@@ -29,6 +29,7 @@ export default function AdminPanel() {
   const navigate = useNavigate();
   const [pendingRaces, setPendingRaces] = useState([]);
   const [reports, setReports] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [actionLoading, setActionLoading] = useState(null);
   const [rejectDialog, setRejectDialog] = useState({ open: false, raceId: null });
@@ -53,6 +54,7 @@ export default function AdminPanel() {
         fetchReports()
       ]);
       setPendingRaces(racesRes.data);
+      adminAPI.getStats().then(res => setStats(res.data)).catch(() => setStats(null));
     } catch (err) {
       console.error('Error loading data:', err);
     } finally {
@@ -143,6 +145,34 @@ export default function AdminPanel() {
     }
   };
 
+  const handleApproveAll = async () => {
+    setActionLoading('bulk-approve');
+    try {
+      const { data } = await adminAPI.moderateBulk(pendingRaces.map(r => r.id), 'approve');
+      setPendingRaces(pendingRaces.filter(r => data.results[r.id] !== 'approved'));
+      toast.success(`${data.modified} course(s) approuvée(s)`);
+    } catch (err) {
+      toast.error('Erreur lors de l\'approbation');
+    } finally {
+      setActionLoading(null);
+    }
+  };
+
+  const handleReportsBulk = async (action) => {
+    setActionLoading(`bulk-report-${action}`);
+    try {
+      const { data } = await adminAPI.moderateReports(reports.map(r => r.race_id), action);
+      setReports(reports.filter(r => !['validated', 'rejected'].includes(data.results[r.race_id])));
+      toast.success(action === 'validate'
+        ? 'Inscriptions marquées comme fermées'
+        : `${data.reports_modified} signalement(s) rejeté(s)`);
+    } catch (err) {
+      toast.error('Erreur');
+    } finally {
+      setActionLoading(null);
+    }
+  };
+
   if (authLoading || !user) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -201,6 +231,39 @@ export default function AdminPanel() {
           </div>
         </Card>
 
+        {/* Stats */}
+        {stats && (
+          <div className="grid grid-cols-2 sm:grid-cols-4 gap-4 mb-8" data-testid="admin-stats">
+            {[
+              { label: 'Courses publiées', value: stats.races.approved || 0 },
+              { label: 'Inscriptions ouvertes', value: stats.registration.open || 0 },
+              { label: 'Utilisateurs', value: stats.users },
+              { label: 'Favoris', value: stats.favorites },
+            ].map(item => (
+              <Card key={item.label} className="p-4 bg-card border-border rounded-xl">
+                <p className="text-xs text-muted-foreground uppercase tracking-wide">{item.label}</p>
+                <p className="font-heading text-2xl font-bold">{item.value}</p>
+              </Card>
+            ))}
+            <Card className="col-span-2 sm:col-span-4 p-4 bg-card border-border rounded-xl">
+              <p className="text-xs text-muted-foreground uppercase tracking-wide mb-3">Courses soumises par semaine</p>
+              <div className="flex items-end gap-1 h-16">
+                {stats.submissions_per_week.map(({ week, count }) => {
+                  const max = Math.max(1, ...stats.submissions_per_week.map(w => w.count));
+                  return (
+                    <div
+                      key={week}
+                      title={`${week} : ${count}`}
+                      className="flex-1 bg-primary/60 rounded-t"
+                      style={{ height: `${Math.max(4, (count / max) * 100)}%` }}
+                    />
+                  );
+                })}
+              </div>
+            </Card>
+          </div>
+        )}
+
         {/* Tabs */}
         <Tabs defaultValue="reports" className="space-y-6">
           <TabsList className="bg-card border border-border">
@@ -230,6 +293,28 @@ export default function AdminPanel() {
               </Card>
             ) : (
               <div className="space-y-4">
+                <div className="flex justify-end gap-2">
+                  <Button
+                    variant="outline"
+                    size="sm"
+                    onClick={() => handleReportsBulk('reject')}
+                    disabled={actionLoading !== null}
+                    data-testid="bulk-reject-reports-btn"
+                  >
+                    {actionLoading === 'bulk-report-reject' ? <Loader2 className="h-4 w-4 mr-1 animate-spin" /> : <X className="h-4 w-4 mr-1" />}
+                    Tout rejeter
+                  </Button>
+                  <Button
+                    size="sm"
+                    onClick={() => handleReportsBulk('validate')}
+                    disabled={actionLoading !== null}
+                    className="bg-primary text-primary-foreground"
+                    data-testid="bulk-validate-reports-btn"
+                  >
+                    {actionLoading === 'bulk-report-validate' ? <Loader2 className="h-4 w-4 mr-1 animate-spin" /> : <Check className="h-4 w-4 mr-1" />}
+                    Tout valider ({reports.length})
+                  </Button>
+                </div>
                 {reports.map((report, i) => (
                   <Card 
                     key={report.race_id} 
@@ -321,6 +406,18 @@ export default function AdminPanel() {
               </Card>
             ) : (
               <div className="space-y-4">
+                <div className="flex justify-end">
+                  <Button
+                    size="sm"
+                    onClick={handleApproveAll}
+                    disabled={actionLoading !== null}
+                    className="bg-primary text-primary-foreground"
+                    data-testid="bulk-approve-btn"
+                  >
+                    {actionLoading === 'bulk-approve' ? <Loader2 className="h-4 w-4 mr-1 animate-spin" /> : <Check className="h-4 w-4 mr-1" />}
+                    Tout approuver ({pendingRaces.length})
+                  </Button>
+                </div>
                 {pendingRaces.map((race, i) => {
                   const distanceCategory = getDistanceCategory(race.distance_km);
                   
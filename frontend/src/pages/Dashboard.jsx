@@ -1,20 +1,21 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../lib/auth-context';
-import { favoritesAPI } from '../lib/api';
+import { favoritesAPI, calendarAPI } from '../lib/api';
 import { Button } from '../components/ui/button';
 import { Card } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { Switch } from '../components/ui/switch';
 import { RaceCard } from '../components/races/RaceCard';
 import { toast } from 'sonner';
-import { Heart, Bell, Loader2, Trash2 } from 'lucide-react';
+import { Heart, Bell, Loader2, Trash2, CalendarPlus, Copy, RefreshCw } from 'lucide-react';
 
 export default function Dashboard() {
   const { user, loading: authLoading } = useAuth();
   const navigate = useNavigate();
   const [favorites, setFavorites] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [calendarUrl, setCalendarUrl] = useState(null);
 
   useEffect(() => {
     if (!authLoading && !user) {
@@ -28,6 +29,23 @@ export default function Dashboard() {
     }
   }, [user]);
 
+  const handleCalendar = async (regenerate = false) => {
+    try {
+      const res = regenerate ? await calendarAPI.regenerateToken() : await calendarAPI.getToken();
+      setCalendarUrl(calendarAPI.feedUrl(res.data.path));
+      if (regenerate) {
+        toast.success('Nouveau lien généré, l\'ancien ne fonctionne plus');
+      }
+    } catch (err) {
+      toast.error('Erreur lors de la création du calendrier');
+    }
+  };
+
+  const handleCopyCalendar = async () => {
+    await navigator.clipboard.writeText(calendarUrl);
+    toast.success('Lien copié');
+  };
+
   const loadFavorites = async () => {
     try {
       const res = await favoritesAPI.getAll();
@@ -125,6 +143,41 @@ export default function Dashboard() {
           </Card>
         </div>
 
+        {/* Calendar subscription */}
+        <Card className="p-6 bg-card border-border rounded-2xl mb-8" data-testid="calendar-feed">
+          <div className="flex flex-col sm:flex-row sm:items-center gap-4">
+            <CalendarPlus className="h-6 w-6 text-primary shrink-0" />
+            <div className="flex-1 min-w-0">
+              <div className="font-semibold">Mes courses dans mon agenda</div>
+              {calendarUrl ? (
+                <div className="text-sm text-muted-foreground truncate">{calendarUrl}</div>
+              ) : (
+                <div className="text-sm text-muted-foreground">
+                  Dates de course et ouvertures d'inscriptions, mises à jour automatiquement
+                </div>
+              )}
+            </div>
+            {calendarUrl ? (
+              <div className="flex gap-2">
+                <Button asChild size="sm" className="rounded-full">
+                  <a href={calendarAPI.webcal(calendarUrl)}>S'abonner</a>
+                </Button>
+                <Button variant="outline" size="sm" className="rounded-full" onClick={handleCopyCalendar}>
+                  <Copy className="h-4 w-4" />
+                </Button>
+                <Button variant="outline" size="sm" className="rounded-full" onClick={() => handleCalendar(true)}
+                  title="Révoquer le lien actuel">
+                  <RefreshCw className="h-4 w-4" />
+                </Button>
+              </div>
+            ) : (
+              <Button size="sm" className="rounded-full" onClick={() => handleCalendar()} data-testid="calendar-feed-button">
+                Obtenir le lien
+              </Button>
+            )}
+          </div>
+        </Card>
+
         {/* Favorites list */}
         {loading ? (
           <div className="flex justify-center py-20">
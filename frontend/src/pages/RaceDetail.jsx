@@ -7,6 +7,7 @@ import { racesAPI, favoritesAPI } from '../lib/api';
 import { useAuth } from '../lib/auth-context';
 import { formatDate, getDistanceCategory, getRegistrationStatusLabel } from '../lib/utils';
 import { AdBannerSidebar } from '../components/ads/AdBanner';
+import { RaceCard } from '../components/races/RaceCard';
 import { toast } from 'sonner';
 import {
   MapPin, Calendar, Mountain, Clock, Heart, ExternalLink,
@@ -36,6 +37,8 @@ export default function RaceDetail() {
   const [reportDialogOpen, setReportDialogOpen] = useState(false);
   const [reportLoading, setReportLoading] = useState(false);
   const [hasReported, setHasReported] = useState(false);
+  const [similarRaces, setSimilarRaces] = useState([]);
+  const [similarOpenOnly, setSimilarOpenOnly] = useState(false);
 
   useEffect(() => {
     const loadRace = async () => {
@@ -61,6 +64,12 @@ export default function RaceDetail() {
     loadRace();
   }, [id, user, navigate]);
 
+  useEffect(() => {
+    racesAPI.getSimilar(id, { registrationOpen: similarOpenOnly })
+      .then((res) => setSimilarRaces(res.data))
+      .catch(() => setSimilarRaces([]));
+  }, [id, similarOpenOnly]);
+
   const handleFavoriteClick = async () => {
     if (!user) {
       toast.error('Connectez-vous pour ajouter aux favoris');
@@ -345,6 +354,33 @@ export default function RaceDetail() {
             <AdBannerSidebar className="mt-6" />
           </div>
         </div>
+
+        {/* Similar races */}
+        {(similarRaces.length > 0 || similarOpenOnly) && (
+          <div className="mt-16" data-testid="similar-races">
+            <div className="flex items-center justify-between mb-6">
+              <h2 className="font-heading text-2xl font-bold">Courses similaires</h2>
+              <Button
+                variant={similarOpenOnly ? 'default' : 'outline'}
+                size="sm"
+                className="rounded-full"
+                onClick={() => setSimilarOpenOnly(!similarOpenOnly)}
+                data-testid="similar-open-only-btn"
+              >
+                Inscriptions ouvertes
+              </Button>
+            </div>
+            {similarRaces.length > 0 ? (
+              <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                {similarRaces.map((similar) => (
+                  <RaceCard key={similar.id} race={similar} />
+                ))}
+              </div>
+            ) : (
+              <p className="text-muted-foreground">Aucune course similaire avec inscriptions ouvertes.</p>
+            )}
+          </div>
+        )}
       </div>
 
       {/* Report Dialog */}